@@ -1,8 +1,26 @@
 from django.contrib import admin
+from django.core.exceptions import FieldDoesNotExist
 from .models import Asset, User, Category
 
+
+class RelatedListAdmin(admin.ModelAdmin):
+    """Joins the foreign keys in list_display: the change list shows the
+    related rows' __str__, which would otherwise cost a query per row."""
+
+    def get_list_select_related(self, request):
+        related = []
+        for name in self.list_display:
+            try:
+                field = self.model._meta.get_field(name)
+            except (FieldDoesNotExist, TypeError):
+                continue
+            if field.many_to_one:
+                related.append(name)
+        return tuple(related) or False
+
+
 @admin.register(Asset)
-class AssetAdmin(admin.ModelAdmin):
+class AssetAdmin(RelatedListAdmin):
     list_display = ('asset_id', 'asset_name', 'category', 'purchase_cost')
 
 
@@ -34,7 +52,7 @@ class BuyerAdmin(admin.ModelAdmin):
 
 
 @admin.register(Disposal)
-class DisposalAdmin(admin.ModelAdmin):
+class DisposalAdmin(RelatedListAdmin):
     list_display = ('disposal_id', 'asset', 'disposal_date')
 
 
@@ -44,15 +62,15 @@ class MaintenanceStaffAdmin(admin.ModelAdmin):
 
 
 @admin.register(Maintenance)
-class MaintenanceAdmin(admin.ModelAdmin):
+class MaintenanceAdmin(RelatedListAdmin):
     list_display = ('maintenance_id', 'asset', 'maintenance_date')
 
 
 @admin.register(Assignment)
-class AssignmentAdmin(admin.ModelAdmin):
+class AssignmentAdmin(RelatedListAdmin):
     list_display = ('assignment_id', 'asset', 'user')
 
 
 @admin.register(AssetValuation)
-class AssetValuationAdmin(admin.ModelAdmin):
+class AssetValuationAdmin(RelatedListAdmin):
     list_display = ('valuation_id', 'asset', 'valuation_date')
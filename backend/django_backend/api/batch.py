@@ -0,0 +1,307 @@
+"""Resumable, throttled backfills over a table.
+
+A BatchJob walks `get_queryset()` in primary-key order, one keyset chunk
+(`pk > last ORDER BY pk LIMIT chunk_size`) at a time. Each chunk runs in
+its own short transaction:
+
+1. the rows are read (locked with SELECT ... FOR UPDATE if `lock`),
+2. `prepare(rows)` does any lookups the chunk needs in bulk,
+3. `change(row)` returns the new column values per row (or DELETE),
+4. the changes are written set-based: one UPDATE ... WHERE pk IN (...)
+   per distinct set of values, or a single bulk_update() when the values
+   are mostly different, followed by rows_saved() for the side effects,
+5. the job's BatchCheckpoint row is advanced to the chunk's last pk.
+
+Because the checkpoint commits with the chunk, an interrupted run resumes
+after the last chunk it wrote and never applies one twice. A checkpoint is
+only resumed by a run with the same `signature()` (the job's options).
+
+Between chunks the job sleeps `sleep_ratio` times as long as the chunk
+took, and on MySQL also while more than `max_running` threads are
+running, so a long backfill leaves room for the application's queries.
+Without `commit` the job only computes and reports its changes.
+"""
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .changes import TRACKED_MODELS
+from .models import BatchCheckpoint
+from .signals import PREVIOUS_FIELDS, muted, rows_deleted, rows_saved, snapshot
+
+
+BATCH_CHUNK_SIZE = getattr(settings, 'BATCH_CHUNK_SIZE', 1000)
+BATCH_SLEEP_RATIO = getattr(settings, 'BATCH_SLEEP_RATIO', 0.25)
+# Pause while MySQL's Threads_running is above this (0: do not check)
+BATCH_MAX_RUNNING = getattr(settings, 'BATCH_MAX_RUNNING', 0)
+BATCH_LOG_INTERVAL = getattr(settings, 'BATCH_LOG_INTERVAL', 10)
+
+# Returned by change() to delete the row
+DELETE = object()
+
+
+class BatchError(Exception):
+    pass
+
+
+class BatchJob:
+    name = None
+    model = None
+    # Columns to read (default: all); the pk is always read
+    fields = None
+    # Lock each chunk's rows while it is computed and written
+    lock = False
+
+    def __init__(self, commit=True, restart=False, chunk_size=None, sleep_ratio=None,
+                 max_running=None, checkpoint=True, log=print):
+        self.commit = commit
+        self.restart = restart
+        self.chunk_size = max(1, chunk_size or BATCH_CHUNK_SIZE)
+        self.sleep_ratio = BATCH_SLEEP_RATIO if sleep_ratio is None else max(0.0, sleep_ratio)
+        self.max_running = BATCH_MAX_RUNNING if max_running is None else max_running
+        self.checkpoint = checkpoint and commit
+        self.log = log
+        self.last_pk = 0
+        self.scanned = 0
+        self.changed = 0
+        self.position = 0
+        self.resumed = False
+        self.elapsed = 0.0
+
+    # Hooks
+
+    def get_queryset(self):
+        return self.model._default_manager.all()
+
+    def options(self):
+        """The options that decide the job's changes; a checkpoint is only
+        resumed by a run with the same options."""
+        return {}
+
+    def setup(self):
+        """Called once before the first chunk. On a resumed run
+        `self.last_pk` is already the last row done by the earlier run."""
+
+    def prepare(self, rows):
+        """Called per chunk before change(), for lookups done in bulk."""
+
+    def change(self, row):
+        """Return {field: new value} for `row`, DELETE, or None to skip it.
+
+        `self.position` is the row's index in the whole scan.
+        """
+        raise NotImplementedError
+
+    def on_changes(self, changes):
+        """Called per chunk with [(row, values)] before they are written
+        (and in dry runs); the rows still hold their old values."""
+
+    # Running
+
+    def signature(self):
+        return json.dumps(self.options(), sort_keys=True, default=str)[:255]
+
+    def run(self):
+        if self.model is None or not self.name:
+            raise BatchError(f'{type(self).__name__} needs a model and a name')
+        if self.checkpoint:
+            self._start()
+        self.setup()
+        started = time.monotonic()
+        logged = started
+        while True:
+            chunk_started = time.monotonic()
+            with transaction.atomic():
+                count = self._chunk()
+            now = time.monotonic()
+            if now - logged >= BATCH_LOG_INTERVAL:
+                logged = now
+                self.log(self._progress(now - started))
+            if count < self.chunk_size:
+                break
+            self._throttle(now - chunk_started)
+        self.elapsed = time.monotonic() - started
+        if self.checkpoint:
+            now = timezone.now()
+            BatchCheckpoint.objects.filter(job=self.name).update(finished_at=now, updated_at=now)
+        self.log(self._progress(self.elapsed))
+        return self.changed
+
+    def _start(self):
+        signature = self.signature()
+        cp, created = BatchCheckpoint.objects.get_or_create(
+            job=self.name, defaults={'signature': signature, 'started_at': timezone.now()},
+        )
+        if created or self.restart or cp.finished_at is not None:
+            BatchCheckpoint.objects.filter(job=self.name).update(
+                signature=signature, last_pk=0, rows_scanned=0, rows_changed=0,
+                started_at=timezone.now(), updated_at=timezone.now(), finished_at=None,
+            )
+            return
+        if cp.signature != signature:
+            raise BatchError(
+                f'{self.name} has an unfinished run with other options ({cp.signature}); '
+                f'rerun with those options to resume it, or restart it'
+            )
+        self.last_pk, self.scanned, self.changed = cp.last_pk, cp.rows_scanned, cp.rows_changed
+        self.resumed = True
+        self.log(f'{self.name}: resuming after pk {self.last_pk} ({self.scanned} rows done)')
+
+    def _chunk(self):
+        if self.checkpoint:
+            # Locking the checkpoint first also keeps a second run of the
+            # same job from interleaving with this one.
+            stored = BatchCheckpoint.objects.select_for_update().filter(job=self.name).values_list('last_pk', flat=True).first()
+            if stored != self.last_pk:
+                raise BatchError(f'{self.name}: the checkpoint moved under this run; is another run active?')
+        pk_name = self.model._meta.pk.name
+        qs = self.get_queryset().filter(pk__gt=self.last_pk).order_by(pk_name)
+        if self.fields:
+            # The side effects of written rows read their PREVIOUS_FIELDS;
+            # deferred, each would be fetched with a query per row
+            qs = qs.only(pk_name, *self.fields, *PREVIOUS_FIELDS.get(self.model, ()))
+        if self.lock and self.commit:
+            qs = qs.select_for_update()
+        rows = list(qs[:self.chunk_size])
+        if not rows:
+            return 0
+
+        self.prepare(rows)
+        changes = []
+        for offset, row in enumerate(rows):
+            self.position = self.scanned + offset
+            values = self.change(row)
+            if values is DELETE or values:
+                changes.append((row, values))
+        if changes:
+            self.on_changes(changes)
+            if self.commit:
+                self._write(changes)
+
+        self.last_pk = rows[-1].pk
+        self.scanned += len(rows)
+        self.changed += len(changes)
+        if self.checkpoint:
+            BatchCheckpoint.objects.filter(job=self.name).update(
+                last_pk=self.last_pk, rows_scanned=self.scanned, rows_changed=self.changed,
+                # update() skips auto_now
+                updated_at=timezone.now(),
+            )
+        return len(rows)
+
+    def _write(self, changes):
+        manager = self.model._base_manager
+        tracked = self.model in TRACKED_MODELS
+        deleted = [row for row, values in changes if values is DELETE]
+        updated = [(row, values) for row, values in changes if values is not DELETE]
+        if deleted:
+            with muted():
+                manager.filter(pk__in=[row.pk for row in deleted]).delete()
+            if tracked:
+                rows_deleted(self.model, deleted)
+        if not updated:
+            return
+
+        instances = [row for row, _values in updated]
+        previous = snapshot(self.model, instances)
+        groups = {}
+        for row, values in updated:
+            for field, value in values.items():
+                setattr(row, field, value)
+            groups.setdefault(tuple(sorted(values.items())), []).append(row.pk)
+        if len(groups) * 4 <= len(updated):
+            for values, pks in groups.items():
+                manager.filter(pk__in=pks).update(**dict(values))
+        else:
+            fields = sorted({field for _row, values in updated for field in values})
+            manager.bulk_update(instances, fields, batch_size=self.chunk_size)
+        if tracked:
+            rows_saved(self.model, instances, previous=previous)
+
+    def _throttle(self, chunk_seconds):
+        if self.sleep_ratio:
+            time.sleep(chunk_seconds * self.sleep_ratio)
+        if self.max_running and connection.vendor == 'mysql':
+            waited = False
+            while threads_running() > self.max_running:
+                if not waited:
+                    self.log(f'{self.name}: server busy, waiting for Threads_running <= {self.max_running}')
+                    waited = True
+                time.sleep(1)
+
+    def _progress(self, seconds):
+        rate = self.scanned / seconds if seconds > 0 else 0
+        verb = 'changed' if self.commit else 'to change'
+        return f'{self.name}: {self.scanned} rows scanned, {self.changed} {verb}, {rate:.0f} rows/s (at pk {self.last_pk})'
+
+
+def threads_running():
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Threads_running'")
+        row = cursor.fetchone()
+    return int(row[1]) if row else 0
+
+
+def unique_values(model, field, wanted, variant, claimed, key=None):
+    """Resolve `wanted` ({pk: value}) to values of `field` no other row uses.
+
+    A taken value is replaced by variant(value, 1), variant(value, 2), ...;
+    every round checks all pending candidates with one IN query. `claimed`
+    ({key: pk}) holds values handed out earlier in the run and is updated.
+    `key` normalizes values for comparison (e.g. str.lower).
+    """
+    key = key or (lambda value: value)
+    result = {}
+    attempt = dict.fromkeys(wanted, 0)
+    while attempt:
+        candidates = {pk: wanted[pk] if n == 0 else variant(wanted[pk], n) for pk, n in attempt.items()}
+        holders = {}
+        rows = model._base_manager.filter(**{f'{field}__in': set(candidates.values())}).values_list('pk', field)
+        for pk, value in rows:
+            holders.setdefault(key(value), set()).add(pk)
+        for pk in sorted(candidates):
+            k = key(candidates[pk])
+            if claimed.get(k, pk) != pk or holders.get(k, set()) - {pk}:
+                attempt[pk] += 1
+                continue
+            claimed[k] = pk
+            result[pk] = candidates[pk]
+            del attempt[pk]
+    return result
+
+
+def add_batch_arguments(parser, chunk_size=BATCH_CHUNK_SIZE):
+    parser.add_argument('--chunk-size', '--batch-size', dest='chunk_size', type=int, default=chunk_size,
+                        help=f'Rows per chunk and transaction (default: {chunk_size})')
+    parser.add_argument('--sleep-ratio', type=float, default=BATCH_SLEEP_RATIO,
+                        help=f'Sleep this many times the duration of each chunk between chunks (default: {BATCH_SLEEP_RATIO})')
+    parser.add_argument('--max-running', type=int, default=BATCH_MAX_RUNNING,
+                        help='MySQL: pause while Threads_running is above this (default: off)')
+    parser.add_argument('--restart', action='store_true', help='Ignore an unfinished run and start from the first row')
+
+
+def batch_options(options):
+    """BatchJob keyword arguments from parsed add_batch_arguments() options."""
+    return {key: options[key] for key in ('chunk_size', 'sleep_ratio', 'max_running', 'restart')}
+
+
+class BatchCommand(BaseCommand):
+    """A management command running a BatchJob; dry-run unless --commit."""
+    chunk_size = BATCH_CHUNK_SIZE
+
+    def add_arguments(self, parser):
+        parser.add_argument('--commit', action='store_true', help='Persist changes. Without this flag the command runs as a dry-run.')
+        add_batch_arguments(parser, self.chunk_size)
+
+    def run_job(self, job_class, options, **kwargs):
+        kwargs.setdefault('commit', options.get('commit', False))
+        job = job_class(log=self.stdout.write, **batch_options(options), **kwargs)
+        try:
+            job.run()
+        except BatchError as e:
+            raise CommandError(str(e))
+        return job
@@ -0,0 +1,272 @@
+"""Endpoint benchmarks with per-endpoint budgets (see the bench_endpoints
+command).
+
+Every API route is requested through Django's test client against a
+seeded dataset: for each viewset the list (plain and paginated), detail,
+export and bulk routes plus a create/update/delete cycle that leaves the
+data as it found it, and each report, report export and metrics view. The live events stream
+(/api/events/) never ends and is left out.
+Each request is measured for wall time, DB queries, rows read (MySQL
+Handler_read_* counters, so a new correlated subquery or lost index shows
+up even when the query count does not change) and response bytes.
+
+Results are compared with a stored baseline (JSON). Query counts must
+not grow at all by default; time, rows read and bytes may grow by a
+ratio. Both can be overridden per endpoint in the baseline's "budgets".
+"""
+import json
+import statistics
+import time
+from urllib.parse import urlencode
+
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from backend_django.utils.metrics import QueryCounter
+
+from .caching import bump_table_versions
+from .changes import TRACKED_MODELS
+from .histograms import FIELDS as HISTOGRAM_FIELDS
+from .search import SEARCH_MAX_LIMIT
+from .urls import router
+from .views import REPORT_EXPORTS
+
+
+BASELINE_FORMAT = 1
+
+# Allowed growth over the baseline: extra queries, and ratios for the rest
+DEFAULT_BUDGETS = {'queries': 0, 'ms': 1.5, 'rows_read': 1.2, 'bytes': 1.1}
+# Time differences below this are noise, whatever the ratio
+MIN_MS_DELTA = 5.0
+
+BULK_ITEMS = 20
+PAGE_SIZE = 100
+
+# Short (field prefix on the B-tree indexes) and longer (FULLTEXT on
+# MySQL) word prefixes, a mix of both, and a serial number prefix, all
+# occurring in generate_dataset's data. Each also runs at the largest
+# ?limit=, where a scan instead of an index range costs the most rows read.
+SEARCH_QUERIES = ('la', 'ka', 'laptop', 'john ka', 'SYN0')
+
+REPORT_ROUTES = ('assets-by-category', 'valuation-histogram', 'reports-sales', 'reports-dashboard', 'reports-kpis')
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Endpoint:
+    """One benchmarked request.
+
+    `path` and `data` may be callables taking the shared state dict, for
+    requests that depend on an earlier one (update/delete of the row the
+    create step made). `after(response, state)` records such results.
+    With `cold`, the report caches are invalidated before each request.
+    `group` is what `--only` selects on (the route's basename or name), so
+    dependent requests are always selected together.
+    """
+
+    def __init__(self, group, name, method, path, data=None, after=None, cold=False):
+        self.group = group
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.after = after
+        self.cold = cold
+
+    def request(self, client, state):
+        path = self.path(state) if callable(self.path) else self.path
+        data = self.data(state) if callable(self.data) else self.data
+        if self.method == 'get':
+            return client.get(path)
+        return getattr(client, self.method)(path, json.dumps(data), content_type='application/json')
+
+
+def _median_pk(model):
+    count = model._default_manager.count()
+    if not count:
+        return None
+    return model._default_manager.order_by('pk').values_list('pk', flat=True)[count // 2]
+
+
+def _viewset_endpoints(client, basename, model):
+    pk_name = model._meta.pk.attname
+    list_url = reverse(f'{basename}-list')
+    detail_url = reverse(f'{basename}-detail', args=[0]).replace('/0/', '/{}/')
+    bulk_url = reverse(f'{basename}-bulk')
+    endpoints = [
+        Endpoint(basename, f'GET {basename}-list', 'get', list_url),
+        Endpoint(basename, f'GET {basename}-list?page_size={PAGE_SIZE}', 'get', f'{list_url}?page_size={PAGE_SIZE}'),
+        Endpoint(basename, f'GET {basename}-export', 'get', f"{reverse(f'{basename}-export')}?format=csv"),
+    ]
+    pk = _median_pk(model)
+    if pk is None:
+        return endpoints
+    payload = client.get(detail_url.format(pk)).json()
+    payload.pop(pk_name, None)
+
+    def created(response, state):
+        state[basename] = response.json()[pk_name]
+
+    def bulk_created(response, state):
+        state[f'{basename}-bulk'] = [r['data'][pk_name] for r in response.json()['results']]
+
+    endpoints += [
+        Endpoint(basename, f'GET {basename}-detail', 'get', detail_url.format(pk)),
+        Endpoint(basename, f'POST {basename}-list', 'post', list_url, payload, after=created),
+        Endpoint(basename, f'PATCH {basename}-detail', 'patch', lambda s: detail_url.format(s[basename]), payload),
+        Endpoint(basename, f'DELETE {basename}-detail', 'delete', lambda s: detail_url.format(s[basename])),
+        Endpoint(basename, f'POST {basename}-bulk', 'post', bulk_url, [payload] * BULK_ITEMS, after=bulk_created),
+        Endpoint(basename, f'DELETE {basename}-bulk', 'delete', bulk_url, lambda s: s[f'{basename}-bulk']),
+    ]
+    return endpoints
+
+
+def endpoints(client):
+    """Return the Endpoints to benchmark against the current data."""
+    result = []
+    for _prefix, viewset, basename in router.registry:
+        result += _viewset_endpoints(client, basename, viewset.queryset.model)
+    for name in REPORT_ROUTES:
+        result.append(Endpoint(name, f'GET {name}', 'get', reverse(name), cold=True))
+    for field in HISTOGRAM_FIELDS:
+        result.append(Endpoint('reports-histogram', f'GET reports-histogram {field}', 'get', reverse('reports-histogram', args=[field]), cold=True))
+    for name in REPORT_EXPORTS:
+        result.append(Endpoint('report-export', f'GET report-export {name}', 'get', reverse('report-export', args=[name]), cold=True))
+    for query in SEARCH_QUERIES:
+        result.append(Endpoint('search', f'GET search {query}', 'get', f"{reverse('search')}?{urlencode({'q': query})}"))
+        result.append(Endpoint(
+            'search', f'GET search {query}?limit={SEARCH_MAX_LIMIT}', 'get',
+            f"{reverse('search')}?{urlencode({'q': query, 'limit': SEARCH_MAX_LIMIT})}",
+        ))
+    result += [
+        Endpoint('report-cache-stats', 'GET report-cache-stats', 'get', reverse('report-cache-stats')),
+        Endpoint('metrics', 'GET metrics', 'get', reverse('metrics')),
+        Endpoint('query-findings', 'GET query-findings', 'get', reverse('query-findings')),
+    ]
+    return result
+
+
+def rows_read():
+    """Return the session's MySQL Handler_read_* total, or None elsewhere."""
+    if connection.vendor != 'mysql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW SESSION STATUS LIKE 'Handler_read%'")
+        return sum(int(value) for _name, value in cursor.fetchall())
+
+
+def _status_overhead():
+    # Rows the SHOW STATUS statement itself reads
+    first = rows_read()
+    if first is None:
+        return 0
+    return rows_read() - first
+
+
+def measure(endpoint, client, state, overhead=0):
+    """Run `endpoint` once; returns (sample dict, response)."""
+    if endpoint.cold:
+        bump_table_versions(*TRACKED_MODELS)
+    counter = QueryCounter()
+    before = rows_read()
+    started = time.perf_counter()
+    with connection.execute_wrapper(counter):
+        response = endpoint.request(client, state)
+        if response.streaming:
+            size = sum(len(piece) for piece in response.streaming_content)
+        else:
+            size = len(response.content)
+    elapsed = time.perf_counter() - started
+    after = rows_read()
+    sample = {
+        'status': response.status_code,
+        'ms': elapsed * 1000.0,
+        'queries': counter.count,
+        'rows_read': None if before is None else max(0, after - before - overhead),
+        'bytes': size,
+    }
+    return sample, response
+
+
+def run(repeat=5, only=None, log=print):
+    """Benchmark every endpoint `repeat` times (after one warm-up run).
+
+    Returns {endpoint name: result}; time is the median, the other
+    figures the maximum over the runs.
+    """
+    client = Client()
+    overhead = _status_overhead()
+    selected = [e for e in endpoints(client) if not only or e.group in only]
+    samples = {e.name: [] for e in selected}
+    state = {}
+    for iteration in range(repeat + 1):
+        # Endpoints run in catalogue order each time, so each update/delete
+        # follows the create that made its row
+        for endpoint in selected:
+            sample, response = measure(endpoint, client, state, overhead)
+            if response.status_code >= 400:
+                raise BenchmarkError(f'{endpoint.name}: HTTP {response.status_code}: {response.content[:300]!r}')
+            if endpoint.after:
+                endpoint.after(response, state)
+            if iteration:
+                samples[endpoint.name].append(sample)
+    results = {}
+    for name, runs in samples.items():
+        rows = [r['rows_read'] for r in runs if r['rows_read'] is not None]
+        results[name] = {
+            'ms': round(statistics.median(r['ms'] for r in runs), 3),
+            'queries': max(r['queries'] for r in runs),
+            'rows_read': max(rows) if rows else None,
+            'bytes': max(r['bytes'] for r in runs),
+        }
+        log(format_result(name, results[name]))
+    return results
+
+
+def format_result(name, result):
+    rows = '-' if result['rows_read'] is None else result['rows_read']
+    return f"  {name:<48} {result['ms']:>9.1f} ms {result['queries']:>5} queries {rows:>9} rows {result['bytes']:>10} bytes"
+
+
+def load_baseline(path):
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get('format') != BASELINE_FORMAT:
+        raise BenchmarkError(f"{path}: unsupported baseline format {baseline.get('format')!r}")
+    return baseline
+
+
+def new_baseline(results, previous=None):
+    """Return a baseline holding `results` ({size: {endpoint: result}}),
+    keeping the budgets of `previous`."""
+    previous = previous or {}
+    return {
+        'format': BASELINE_FORMAT,
+        'vendor': connection.vendor,
+        'default_budgets': previous.get('default_budgets', DEFAULT_BUDGETS),
+        'budgets': previous.get('budgets', {}),
+        'results': {str(size): by_endpoint for size, by_endpoint in results.items()},
+    }
+
+
+def compare(baseline, size, results):
+    """Return a list of budget violations of `results` for dataset `size`."""
+    expected = baseline['results'].get(str(size), {})
+    defaults = {**DEFAULT_BUDGETS, **baseline.get('default_budgets', {})}
+    violations = []
+    for name, result in results.items():
+        base = expected.get(name)
+        if base is None:
+            continue
+        budget = {**defaults, **baseline.get('budgets', {}).get(name, {})}
+        if result['queries'] > base['queries'] + budget['queries']:
+            violations.append(f"{name}: {result['queries']} queries, baseline {base['queries']} (+{budget['queries']} allowed)")
+        if result['ms'] > base['ms'] * budget['ms'] and result['ms'] - base['ms'] > MIN_MS_DELTA:
+            violations.append(f"{name}: {result['ms']:.1f} ms, baseline {base['ms']:.1f} ms (x{budget['ms']} allowed)")
+        for key in ('rows_read', 'bytes'):
+            if result[key] is not None and base.get(key) is not None and result[key] > base[key] * budget[key]:
+                violations.append(f"{name}: {result[key]} {key.replace('_', ' ')}, baseline {base[key]} (x{budget[key]} allowed)")
+    return violations
@@ -0,0 +1,78 @@
+"""Batched inserts and updates that keep the write side effects.
+
+bulk_create/bulk_update skip the model signals, so these helpers call
+api.signals.rows_saved() once for the whole batch instead.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from .signals import muted, rows_saved
+
+
+BULK_BATCH_SIZE = getattr(settings, 'BULK_BATCH_SIZE', 500)
+
+
+def consecutive_key_step():
+    """On MySQL, the step between the keys of one multi-row INSERT if they
+    are consecutive (innodb_autoinc_lock_mode 0 or 1), else None.
+
+    With lock mode 2 (interleaved, MySQL 8's default) concurrent inserts may
+    take keys from the middle of a statement's range.
+    """
+    if not hasattr(connection, '_bulk_key_step'):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT @@innodb_autoinc_lock_mode, @@auto_increment_increment')
+            mode, increment = cursor.fetchone()
+        connection._bulk_key_step = int(increment) if int(mode) <= 1 else None
+    return connection._bulk_key_step
+
+
+def _insert_recovering_keys(model, instances, batch_size, step):
+    # One INSERT per batch; LAST_INSERT_ID() is the key of its first row
+    manager = model._default_manager
+    for start in range(0, len(instances), batch_size):
+        batch = instances[start:start + batch_size]
+        manager.bulk_create(batch, batch_size=len(batch))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT LAST_INSERT_ID()')
+            first = cursor.fetchone()[0]
+        for offset, instance in enumerate(batch):
+            instance.pk = first + offset * step
+
+
+def insert_rows(model, instances, batch_size=None):
+    """Insert unsaved `instances` of `model`, setting their primary keys."""
+    batch_size = batch_size or BULK_BATCH_SIZE
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            model._default_manager.bulk_create(instances, batch_size=batch_size)
+        elif (
+            connection.vendor == 'mysql' and all(i.pk is None for i in instances)
+            and consecutive_key_step() is not None
+        ):
+            _insert_recovering_keys(model, instances, batch_size, consecutive_key_step())
+        else:
+            # The keys of a multi-row INSERT cannot be told, and the side
+            # effects need them: insert row by row, still in one
+            # transaction and with the side effects batched.
+            with muted():
+                for instance in instances:
+                    instance.save(force_insert=True)
+        rows_saved(model, instances, created=True)
+    return instances
+
+
+def update_rows(model, instances, fields, previous=None, batch_size=None):
+    """Write `fields` of already-modified `instances` with bulk_update.
+
+    `previous` is api.signals.snapshot() of the instances taken before they
+    were modified; it is needed for models listed in PREVIOUS_FIELDS.
+    """
+    fields = [f for f in fields if f != model._meta.pk.name]
+    if not instances or not fields:
+        return instances
+    with transaction.atomic():
+        model._default_manager.bulk_update(instances, fields, batch_size=batch_size or BULK_BATCH_SIZE)
+        rows_saved(model, instances, previous=previous)
+    return instances
+
@@ -0,0 +1,236 @@
+"""Per-table version tokens, conditional-GET validators and a
+write-invalidated cache for report views.
+
+Every model in this app has a version token stored in the shared Django
+cache. The signal handlers in api/signals.py replace a table's token after
+each committed write. Report results are cached under a key that embeds the
+tokens of every table the report reads, so a write to any of those tables
+makes the old entries unreachable without having to find and delete them.
+The same tokens give each GET response its ETag and Last-Modified.
+Reports that also depend on the current date (`dated=True`) add it to
+their key and ETag, so they are recomputed each day.
+"""
+import datetime
+import functools
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework.response import Response
+
+
+VERSION_KEY = 'tblver:{label}'
+STATS_KEY = 'reportcache:{name}:{stat}'
+STATS = ('hits', 'misses', 'waits')
+
+REPORT_CACHE_TTL = getattr(settings, 'REPORT_CACHE_TTL', 300)
+# How long a recomputation may hold the single-flight lock, and how long
+# other requests wait for it before computing the report themselves.
+REPORT_LOCK_TTL = getattr(settings, 'REPORT_CACHE_LOCK_TTL', 30)
+REPORT_LOCK_WAIT = getattr(settings, 'REPORT_CACHE_LOCK_WAIT', 10)
+
+# name -> models the report reads; filled in by @cached_report
+REPORTS = {}
+# names of the reports whose result depends on today's date
+DATED_REPORTS = set()
+
+
+def _new_token():
+    # "<microseconds since epoch, hex>-<random>": unique per write, and the
+    # timestamp part doubles as the table's Last-Modified time.
+    return f'{time.time_ns() // 1000:x}-{uuid.uuid4().hex[:6]}'
+
+
+def token_timestamp(token):
+    """Return the write time (epoch seconds) encoded in a version token."""
+    try:
+        return int(token.split('-', 1)[0], 16) / 1_000_000
+    except (AttributeError, ValueError):
+        return None
+
+
+def table_version(model):
+    """Return the current version token of `model`'s table."""
+    key = VERSION_KEY.format(label=model._meta.label_lower)
+    token = cache.get(key)
+    if token is None:
+        # First use or evicted: any fresh token is fine, but let concurrent
+        # readers agree on a single one.
+        cache.add(key, _new_token(), timeout=None)
+        token = cache.get(key)
+    return token
+
+
+def table_versions(models):
+    return [table_version(m) for m in models]
+
+
+def bump_table_versions(*models):
+    """Give each model's table a new version token once the write commits."""
+    def bump():
+        cache.set_many(
+            {VERSION_KEY.format(label=m._meta.label_lower): _new_token() for m in models},
+            timeout=None,
+        )
+    transaction.on_commit(bump)
+
+
+def _with_date(versions):
+    return [*versions, datetime.date.today().isoformat()]
+
+
+def get_validators(request, models, dated=False):
+    """Return (versions, ETag, Last-Modified timestamp) for a GET request.
+
+    The ETag is derived from the request path/query and the version tokens
+    of the tables the response is built from, so computing it never touches
+    the database or the response body. With `dated`, today's date counts as
+    one more version, last modified at midnight.
+    """
+    versions = table_versions(models)
+    stamps = [t for t in map(token_timestamp, versions) if t is not None]
+    if dated:
+        versions = _with_date(versions)
+        stamps.append(time.mktime(datetime.date.today().timetuple()))
+    raw = '|'.join([request.get_full_path(), *versions])
+    etag = quote_etag(hashlib.sha1(raw.encode('utf-8')).hexdigest())
+    return versions, etag, (max(stamps) if stamps else None)
+
+
+def not_modified(request, etag, last_modified):
+    """True if the request's validators show the client copy is current."""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+    if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+    if if_modified_since and last_modified is not None:
+        since = parse_http_date_safe(if_modified_since)
+        return since is not None and int(last_modified) <= since
+    return False
+
+
+def _settled(last_modified):
+    """True once the second of the last write is over.
+
+    HTTP dates have one-second resolution, so until then another write
+    could land in the same second and still match If-Modified-Since.
+    """
+    return time.time() >= int(last_modified) + 1
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    # Clients that only revalidate by date get no date to revalidate with
+    # until it is safe; they refetch until then
+    if last_modified is not None and _settled(last_modified):
+        response['Last-Modified'] = http_date(last_modified)
+    # Let browsers keep the body but revalidate it on every poll
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _count(name, stat):
+    key = STATS_KEY.format(name=name, stat=stat)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+
+
+def report_cache_stats():
+    keys = {(name, stat): STATS_KEY.format(name=name, stat=stat) for name in REPORTS for stat in STATS}
+    values = cache.get_many(list(keys.values()))
+    return {
+        name: {stat: values.get(keys[(name, stat)], 0) for stat in STATS}
+        for name in REPORTS
+    }
+
+
+def _cache_key(name, versions, params):
+    raw = '&'.join(f'{k}={v}' for k, v in sorted(params.lists()))
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+    return f"report:{name}:{'.'.join(versions)}:{digest}"
+
+
+def warm_report(name, params, compute):
+    """Store `compute(params)` under the key a request for report `name`
+    with query `params` (a QueryDict) would use, unless it is there.
+
+    Returns True if the report was computed.
+    """
+    versions = table_versions(REPORTS[name])
+    if name in DATED_REPORTS:
+        versions = _with_date(versions)
+    key = _cache_key(name, versions, params)
+    if cache.get(key) is not None:
+        return False
+    cache.set(key, compute(params), timeout=REPORT_CACHE_TTL)
+    return True
+
+
+def cached_report(name, *models, dated=False):
+    """Cache a report view's 200 responses until one of `models` is written,
+    or with `dated`, until one is written or the date changes.
+
+    Apply below @api_view. Conditional GETs are answered with a 304 before
+    the cache is consulted. Concurrent misses for the same key are
+    collapsed: one request recomputes under a cache lock while the others
+    wait for its result.
+    """
+    REPORTS[name] = models
+    if dated:
+        DATED_REPORTS.add(name)
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            versions, etag, last_modified = get_validators(request, models, dated)
+            if not_modified(request, etag, last_modified):
+                return set_validators(Response(status=304), etag, last_modified)
+
+            response = _cached_response(request, versions, *args, **kwargs)
+            if response.status_code == 200:
+                set_validators(response, etag, last_modified)
+            return response
+
+        def _cached_response(request, versions, *args, **kwargs):
+            key = _cache_key(name, versions, request.query_params)
+            data = cache.get(key)
+            if data is not None:
+                _count(name, 'hits')
+                return Response(data)
+
+            lock_key = f'{key}:lock'
+            locked = cache.add(lock_key, 1, timeout=REPORT_LOCK_TTL)
+            if not locked:
+                _count(name, 'waits')
+                deadline = time.monotonic() + REPORT_LOCK_WAIT
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    data = cache.get(key)
+                    if data is not None:
+                        _count(name, 'hits')
+                        return Response(data)
+                    if cache.get(lock_key) is None:
+                        break
+
+            _count(name, 'misses')
+            try:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, response.data, timeout=REPORT_CACHE_TTL)
+                return response
+            finally:
+                if locked:
+                    cache.delete(lock_key)
+
+        return wrapper
+    return decorator
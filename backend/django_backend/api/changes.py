@@ -0,0 +1,111 @@
+"""Change recording for delta sync.
+
+Every write to a tracked model goes through `record_changes`, which appends
+to ChangeLog inside the writer's transaction and bumps the table's version
+token. The ORM signal handlers in api/signals.py call it for save/delete;
+code that writes with `QuerySet.update()` or bulk operations must call it
+itself.
+
+Clients sync by ChangeLog `position`, not `change_id`. change_ids are taken
+at insert, so a long transaction (a bulk request, a batch job chunk, a
+snapshot load) commits its low change_ids after later ones are visible; a
+client already past them would never see them. `sequence_changes()` gives
+committed rows their position under the ChangeSequence row lock, so a
+position only becomes visible after every lower one has: a row that
+commits late gets a position above everything handed out before.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+
+from .caching import bump_table_versions
+from .models import (
+    Asset, AssetValuation, Assignment, Buyer, Category, ChangeLog, ChangeSequence,
+    Disposal, Location, Maintenance, MaintenanceStaff, Supplier, User,
+)
+
+
+TRACKED_MODELS = (
+    Category, User, Asset, Supplier, Location, Buyer, Disposal,
+    MaintenanceStaff, Maintenance, Assignment, AssetValuation,
+)
+
+SYNC_BATCH_SIZE = getattr(settings, 'SYNC_BATCH_SIZE', 1000)
+# Rows given positions per sequence_changes() call
+SYNC_SEQUENCE_BATCH = getattr(settings, 'SYNC_SEQUENCE_BATCH', 5000)
+
+
+def record_changes(model, pks, action=ChangeLog.UPSERT):
+    pks = [pk for pk in pks if pk is not None]
+    if not pks:
+        return
+    ChangeLog.objects.bulk_create(
+        [ChangeLog(table_name=model._meta.model_name, object_id=pk, action=action) for pk in pks],
+        batch_size=1000,
+    )
+    bump_table_versions(model)
+
+
+def sequence_changes():
+    """Give committed ChangeLog rows without a position the next positions,
+    in change_id order. Returns True if rows were left for another call.
+
+    Rows of transactions still open are neither visible nor waited on here;
+    they get their positions on a later call, above all earlier ones.
+    """
+    if not ChangeLog.objects.filter(position__isnull=True).exists():
+        return False
+    with transaction.atomic():
+        sequence, _ = ChangeSequence.objects.select_for_update().get_or_create(pk=1)
+        # Read again under the lock: another caller may have just done it
+        pending = list(
+            ChangeLog.objects.filter(position__isnull=True).order_by('change_id')
+            .values_list('change_id', flat=True)[:SYNC_SEQUENCE_BATCH]
+        )
+        if not pending:
+            return False
+        # Keeps the change_id order (and gaps) within the batch
+        offset = sequence.last_position + 1 - pending[0]
+        ChangeLog.objects.filter(change_id__in=pending).update(position=F('change_id') + offset)
+        sequence.last_position = pending[-1] + offset
+        sequence.save(update_fields=['last_position'])
+    return len(pending) == SYNC_SEQUENCE_BATCH
+
+
+def latest_position(model=None):
+    """Return the newest position of `model`'s changes (of all, without one)."""
+    sequence_changes()
+    changes = ChangeLog.objects.all()
+    if model is not None:
+        changes = changes.filter(table_name=model._meta.model_name)
+    return changes.aggregate(newest=Max('position'))['newest'] or 0
+
+
+def pruned_through():
+    """Return the highest position prune_changelog has deleted."""
+    return ChangeSequence.objects.filter(pk=1).values_list('pruned_through', flat=True).first() or 0
+
+
+def changes_since(model, since, limit=SYNC_BATCH_SIZE):
+    """Return (upserted ids, deleted ids, next position, more) after `since`.
+
+    Only the last action per object inside the window counts.
+    """
+    unsequenced = sequence_changes()
+    rows = list(
+        ChangeLog.objects.filter(table_name=model._meta.model_name, position__gt=since)
+        .order_by('position')
+        .values_list('position', 'object_id', 'action')[:limit + 1]
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    position = rows[-1][0] if rows else since
+    last_action = {}
+    for _position, object_id, action in rows:
+        last_action[object_id] = action
+    upserted = [oid for oid, action in last_action.items() if action == ChangeLog.UPSERT]
+    deleted = [oid for oid, action in last_action.items() if action == ChangeLog.DELETE]
+    # Calling again right away only helps if the position moved
+    more = (more or unsequenced) and position != since
+    return upserted, deleted, position, more
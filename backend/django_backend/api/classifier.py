@@ -0,0 +1,127 @@
+"""Keyword classification of asset names into categories.
+
+The rules are an ordered list of (category names, keywords). All keywords
+of all rules are compiled into one case-insensitive alternation regex, so
+classifying a name is a single scan instead of one search per keyword.
+A keyword matches whole words (an optional plural "s" is allowed); when
+several rules match, the earliest rule wins. So product types and product
+lines come first and bare brands last: "HP LaserJet Printer" is a printer,
+and "hp" alone only decides names that say nothing else.
+
+A rule's category names are tried in order against the existing
+categories, first by exact (case-insensitive) name and then as a
+substring, e.g. ("Laptops", "Laptop") also finds "Computers & Laptops".
+
+The rules come from the CATEGORY_RULES setting (default below) or a JSON
+file of `[{"categories": [...], "keywords": [...]}, ...]`.
+"""
+import json
+import re
+
+from django.conf import settings
+
+from .batch import BatchJob
+from .models import Asset
+
+
+DEFAULT_CATEGORY_RULES = (
+    # Product types and product lines
+    (('Mobile Devices', 'Phone'), ('phone', 'smartphone', 'iphone', 'galaxy', 'pixel', 'redmi', 'ipad', 'tablet')),
+    (('Laptops', 'Laptop'), ('laptop', 'notebook', 'thinkpad', 'macbook', 'inspiron', 'latitude', 'pavilion', 'elitebook', 'aspire')),
+    (('Monitors', 'Monitor'), ('monitor', 'screen', 'display', 'ultrasharp', 'ultrawide', 'curved')),
+    (('Printers & Scanners', 'Printer'), ('printer', 'scanner', 'laserjet', 'officejet', 'deskjet', 'imagerunner', 'mfc')),
+    (('Network Equipment', 'Network'), ('server', 'switch', 'router', 'access point', 'poweredge', 'proliant')),
+    (('Office Furniture', 'Furniture'), ('chair', 'desk', 'table', 'cabinet')),
+    (('Vehicles', 'Vehicle'), ('vehicle', 'car', 'truck', 'van')),
+    # Brands, for names that name no product type
+    (('Mobile Devices', 'Phone'), ('samsung', 'nokia', 'xiaomi')),
+    (('Laptops', 'Laptop'), ('lenovo', 'dell', 'hp', 'acer')),
+    (('Printers & Scanners', 'Printer'), ('canon', 'epson', 'brother')),
+)
+CATEGORY_RULES = getattr(settings, 'CATEGORY_RULES', DEFAULT_CATEGORY_RULES)
+
+CLASSIFY_CHUNK_SIZE = getattr(settings, 'CLASSIFY_CHUNK_SIZE', 5000)
+
+
+def load_rules(path):
+    """Read rules from a JSON file."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    try:
+        return tuple((tuple(rule['categories']), tuple(rule['keywords'])) for rule in data)
+    except (KeyError, TypeError):
+        raise ValueError(f'{path}: expected a list of {{"categories": [...], "keywords": [...]}} objects')
+
+
+class KeywordClassifier:
+    def __init__(self, rules=None):
+        self.rules = tuple(rules if rules is not None else CATEGORY_RULES)
+        groups = []
+        for index, (_names, keywords) in enumerate(self.rules):
+            if keywords:
+                # Longest first, so "iphone" is not cut short by "phone"
+                alternation = '|'.join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+                groups.append(f'(?P<r{index}>{alternation})')
+        self.pattern = re.compile(r'\b(?:' + '|'.join(groups) + r')s?\b', re.IGNORECASE) if groups else None
+
+    def rule_index(self, text):
+        """Return the index of the first rule matching `text`, or None."""
+        if not text or self.pattern is None:
+            return None
+        best = None
+        for match in self.pattern.finditer(text):
+            index = int(match.lastgroup[1:])
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return best
+
+    def targets(self, categories):
+        """Return, per rule, the pk of the first category its names
+        resolve to among `categories` ({pk: name}), or None."""
+        lowered = [(pk, name.lower()) for pk, name in categories.items()]
+        result = []
+        for names, _keywords in self.rules:
+            wanted = [n.lower() for n in names]
+            found = next((pk for w in wanted for pk, name in lowered if name == w), None)
+            if found is None:
+                found = next((pk for w in wanted for pk, name in lowered if w in name), None)
+            result.append(found)
+        return result
+
+
+class CategoryJob(BatchJob):
+    """Set each asset's category to `choose(asset_name, category_id)`.
+
+    `report(changes)` sees every chunk's [(asset, {'category_id': new})]
+    before it is written. The new ids usually repeat, so a chunk is
+    written as one UPDATE per target category.
+    """
+    model = Asset
+    fields = ('asset_name', 'category_id')
+
+    def __init__(self, name, choose, queryset=None, report=None, params=None, **kwargs):
+        kwargs.setdefault('chunk_size', CLASSIFY_CHUNK_SIZE)
+        super().__init__(**kwargs)
+        self.name = name
+        self.choose = choose
+        self.queryset = queryset
+        self.report = report
+        self.params = params or {}
+
+    def get_queryset(self):
+        return self.queryset if self.queryset is not None else super().get_queryset()
+
+    def options(self):
+        return self.params
+
+    def change(self, asset):
+        new = self.choose(asset.asset_name, asset.category_id)
+        if new is not None and new != asset.category_id:
+            return {'category_id': new}
+        return None
+
+    def on_changes(self, changes):
+        if self.report:
+            self.report(changes)
@@ -0,0 +1,253 @@
+"""Server-Sent Events fan-out of table and report changes.
+
+Each worker process runs one broadcaster thread. Every EVENTS_POLL_INTERVAL
+it reads the table version tokens from the shared cache (one get_many). Only
+when a token changed does it read the new ChangeLog rows and push the
+resulting events to the streams connected to that process. The cost
+therefore follows the write rate, not the number of open tabs, and events
+reach every worker because both the tokens and the ChangeLog are shared.
+
+Event ids are ChangeLog positions (commit-ordered, see api/changes.py), so
+a reconnecting client that sends `Last-Event-ID` is replayed from the
+ChangeLog, including changes that committed late.
+
+Each open stream holds a worker thread. A worker serves at most
+EVENTS_MAX_STREAMS of them, fewer than its threads, so open tabs cannot
+starve ordinary requests; streams over the cap are told to retry later.
+"""
+import collections
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+
+from .caching import REPORTS, VERSION_KEY
+from .changes import TRACKED_MODELS, latest_position, sequence_changes
+from .models import ChangeLog
+
+
+EVENTS_POLL_INTERVAL = getattr(settings, 'EVENTS_POLL_INTERVAL', 1.0)
+EVENTS_HEARTBEAT = getattr(settings, 'EVENTS_HEARTBEAT', 15)
+# Events buffered per connected client before it is considered too slow and
+# sent a `reset` instead.
+EVENTS_CLIENT_BUFFER = getattr(settings, 'EVENTS_CLIENT_BUFFER', 256)
+EVENTS_REPLAY_LIMIT = getattr(settings, 'EVENTS_REPLAY_LIMIT', 1000)
+# Streams are closed after this long; clients reconnect with Last-Event-ID.
+# This keeps a worker thread from being pinned by one tab forever.
+EVENTS_MAX_STREAM_SECONDS = getattr(settings, 'EVENTS_MAX_STREAM_SECONDS', 300)
+# Open streams per worker process; keep it below gunicorn's --threads
+EVENTS_MAX_STREAMS = getattr(settings, 'EVENTS_MAX_STREAMS', 8)
+# How long a client turned away by the cap waits before reconnecting
+EVENTS_BUSY_RETRY_MS = getattr(settings, 'EVENTS_BUSY_RETRY_MS', 30000)
+
+Event = collections.namedtuple('Event', 'id type data')
+
+
+def build_events(rows):
+    """Turn ChangeLog rows into one `table` event per table followed by one
+    `report` event per report that reads any of those tables.
+
+    All events of a batch carry the batch's last position as id; the stream
+    sends it only with the batch's last event, so a client cut off halfway
+    resumes from before the batch rather than skipping part of it.
+    """
+    tables = {}
+    through = 0
+    for position, table_name, object_id, action in rows:
+        through = max(through, position)
+        entry = tables.setdefault(table_name, {'first': position, 'upserted': [], 'deleted': []})
+        key = 'deleted' if action == ChangeLog.DELETE else 'upserted'
+        if object_id not in entry[key]:
+            entry[key].append(object_id)
+
+    events = []
+    for table_name, entry in sorted(tables.items(), key=lambda item: item[1]['first']):
+        events.append(Event(through, 'table', {
+            'table': table_name, 'upserted': entry['upserted'], 'deleted': entry['deleted'],
+        }))
+    if events:
+        for report, models in REPORTS.items():
+            if any(m._meta.model_name in tables for m in models):
+                events.append(Event(through, 'report', {'report': report}))
+    return events
+
+
+def _rows_after(position, limit):
+    return list(
+        ChangeLog.objects.filter(position__gt=position).order_by('position')
+        .values_list('position', 'table_name', 'object_id', 'action')[:limit]
+    )
+
+
+def replay_events(after):
+    """Return (events after ChangeLog position `after`, complete?)."""
+    sequence_changes()
+    rows = _rows_after(after, EVENTS_REPLAY_LIMIT + 1)
+    complete = len(rows) <= EVENTS_REPLAY_LIMIT
+    return build_events(rows[:EVENTS_REPLAY_LIMIT]), complete
+
+
+class Subscription:
+    def __init__(self):
+        self._events = collections.deque()
+        self._cond = threading.Condition()
+        # Position of the newest event dropped on overflow, or None
+        self._dropped_through = None
+
+    def push(self, events):
+        with self._cond:
+            if self._dropped_through is not None or len(self._events) + len(events) > EVENTS_CLIENT_BUFFER:
+                dropped = [e.id for e in self._events] + [e.id for e in events]
+                self._dropped_through = max([self._dropped_through or 0, *dropped])
+                self._events.clear()
+            else:
+                self._events.extend(events)
+            self._cond.notify()
+
+    def wait(self, timeout):
+        """Return (buffered events, dropped-through position or None) once
+        there is something to send or `timeout` seconds passed."""
+        with self._cond:
+            if not self._events and self._dropped_through is None:
+                self._cond.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            dropped_through, self._dropped_through = self._dropped_through, None
+            return events, dropped_through
+
+
+class Broadcaster:
+    def __init__(self, max_streams=EVENTS_MAX_STREAMS):
+        self.max_streams = max_streams
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._keys = [VERSION_KEY.format(label=m._meta.label_lower) for m in TRACKED_MODELS]
+
+    def subscribe(self):
+        """Return a new Subscription, or None if this process already
+        serves `max_streams` streams."""
+        sub = Subscription()
+        with self._lock:
+            if len(self._subscribers) >= self.max_streams:
+                return None
+            self._subscribers.add(sub)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='sse-broadcaster', daemon=True)
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def _run(self):
+        versions = None
+        position = None
+        while True:
+            time.sleep(EVENTS_POLL_INTERVAL)
+            with self._lock:
+                subscribers = list(self._subscribers)
+            if not subscribers:
+                # Nobody listening: start again from the head next time.
+                versions, position = None, None
+                continue
+            try:
+                current = cache.get_many(self._keys)
+                if current == versions and position is not None:
+                    continue
+                versions = current
+                if position is None:
+                    position = latest_position()
+                    continue
+                position, events, pending = self._read(position)
+                if pending:
+                    # More rows than one read, or rows not numbered yet: look
+                    # again on the next tick even if no write bumps a version.
+                    versions = None
+            except Exception:
+                # Keep the broadcaster alive through DB/cache hiccups; the
+                # next version change retries from the same position.
+                versions = None
+                continue
+            finally:
+                close_old_connections()
+            if events:
+                for sub in subscribers:
+                    sub.push(events)
+
+    def _read(self, position):
+        unsequenced = sequence_changes()
+        rows = _rows_after(position, EVENTS_REPLAY_LIMIT)
+        if rows:
+            position = rows[-1][0]
+        pending = unsequenced or len(rows) == EVENTS_REPLAY_LIMIT
+        return position, build_events(rows), pending
+
+
+broadcaster = Broadcaster()
+
+
+def format_event(event, with_id=True):
+    head = f'id: {event.id}\n' if with_id else ''
+    return f'{head}event: {event.type}\ndata: {json.dumps(event.data)}\n\n'
+
+
+def format_events(events):
+    # The id goes with the last event of each batch only (see build_events)
+    for i, event in enumerate(events):
+        last = i + 1 == len(events) or events[i + 1].id != event.id
+        yield format_event(event, with_id=last)
+
+
+def reset_event(position):
+    # Tells the client to refetch its data; resuming from `position`
+    # afterwards is then safe.
+    return format_event(Event(position, 'reset', {}))
+
+
+def event_stream(last_event_id=None):
+    """Yield the SSE stream for one client."""
+    # Subscribe before replaying so nothing falls between the two.
+    sub = broadcaster.subscribe()
+    if sub is None:
+        # This worker's stream slots are taken: have the browser come back
+        # later instead of holding a thread other requests need
+        yield f'retry: {EVENTS_BUSY_RETRY_MS}\n: busy\n\n'
+        return
+    try:
+        yield 'retry: 3000\n\n'
+        replayed = last_event_id or 0
+        if last_event_id is not None:
+            try:
+                events, complete = replay_events(last_event_id)
+                if not complete:
+                    head = latest_position()
+            finally:
+                # Don't hold a DB connection for the life of the stream
+                connection.close()
+            if complete:
+                for event in events:
+                    replayed = max(replayed, event.id)
+                yield from format_events(events)
+            else:
+                replayed = head
+                yield reset_event(replayed)
+
+        deadline = time.monotonic() + EVENTS_MAX_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            events, dropped_through = sub.wait(EVENTS_HEARTBEAT)
+            if dropped_through is not None:
+                # Client fell behind; tell it to refetch instead of queueing
+                replayed = max(replayed, dropped_through)
+                yield reset_event(replayed)
+            elif not events:
+                yield ': ping\n\n'
+            # Positions are commit-ordered, so a batch through a position the
+            # replay already reached has nothing the replay did not send
+            yield from format_events([event for event in events if event.id > replayed])
+    finally:
+        broadcaster.unsubscribe(sub)
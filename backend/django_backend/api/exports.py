@@ -0,0 +1,146 @@
+"""Streaming CSV / NDJSON exports of tables and reports.
+
+Rows are read in primary-key order, one keyset query of EXPORT_CHUNK_SIZE
+rows at a time (`pk > last` ... `LIMIT n`), and each chunk is encoded and
+sent before the next is read. QuerySet.iterator() would not bound memory
+here: the MySQL drivers buffer the whole result set on the client. The
+header (CSV) goes out before the first query runs.
+"""
+import csv
+import io
+import json
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+from .serializers import split_field_names
+
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class _ExportRenderer(BaseRenderer):
+    """Lets DRF accept `?format=csv|ndjson` on the export actions.
+
+    The export itself is a StreamingHttpResponse that bypasses rendering;
+    only 304s and errors pass through here.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8')
+
+
+class CSVRenderer(_ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(_ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+def export_format(params):
+    """Return the requested export format, or None if it is not supported."""
+    fmt = params.get('format') or 'csv'
+    return fmt if fmt in EXPORT_FORMATS else None
+
+
+def table_columns(model, params):
+    """Return the column names (attnames) to export for `model`.
+
+    `?fields=` / `?omit=` select columns by field name or column name; the
+    primary key is always included.
+    """
+    wanted = split_field_names(params.get('fields'))
+    omitted = split_field_names(params.get('omit'))
+    pk = model._meta.pk
+    columns = [pk.attname]
+    for field in model._meta.concrete_fields:
+        if field is pk:
+            continue
+        names = {field.name, field.attname}
+        if (wanted and not names & wanted) or names & omitted:
+            continue
+        columns.append(field.attname)
+    return columns
+
+
+def table_chunks(queryset, columns, chunk_size=None, after=None):
+    """Yield lists of `columns` tuples in primary-key order.
+
+    `columns[0]` must be the primary key; it is the keyset cursor. With
+    `after`, start with the rows whose primary key is greater.
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    pk_name = queryset.model._meta.pk.name
+    queryset = queryset.order_by(pk_name)
+    last = after
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        rows = list(page.values_list(*columns)[:chunk_size])
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][0]
+
+
+def encode(fmt, columns, chunks):
+    """Yield text pieces: the header (CSV), then one piece per chunk."""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+        for rows in chunks:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+    else:
+        encoder = DjangoJSONEncoder()
+        for rows in chunks:
+            yield ''.join(encoder.encode(dict(zip(columns, row))) + '\n' for row in rows)
+
+
+def gzip_stream(pieces):
+    """Gzip text pieces on the fly, flushing after each so the client
+    receives data as soon as it is read."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for piece in pieces:
+        data = compressor.compress(piece.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(request, name, fmt, columns, chunks):
+    """Return a StreamingHttpResponse downloading `chunks` as `name`.<fmt>.
+
+    With `?gzip=1` the body is gzipped on the fly (`.gz` download).
+    """
+    params = getattr(request, 'query_params', request.GET)
+    body = encode(fmt, columns, chunks)
+    filename = f"{name}-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"
+    if params.get('gzip') in ('1', 'true', 'yes'):
+        response = StreamingHttpResponse(gzip_stream(body), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse((piece.encode('utf-8') for piece in body), content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Stop nginx and similar proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,198 @@
+"""Bounded histograms of numeric columns.
+
+A histogram reads the column's min and max, picks the buckets, then counts
+all rows with one GROUP BY on the bucket index, computed in SQL as
+FLOOR((value - start) / width) or, on a log scale,
+FLOOR((LN(value) - LN(start)) / step). It never has more than
+HISTOGRAM_MAX_BUCKETS buckets, whatever the parameters ask for.
+
+Parameters (query params of the histogram reports):
+- `buckets`: wanted bucket count (default HISTOGRAM_DEFAULT_BUCKETS);
+- `scale`: `linear`, `log` or `auto` (default). Auto uses a log scale
+  when all values are positive and max/min is at least LOG_SCALE_RATIO;
+- `bucket`: a fixed linear bucket width, as the valuation histogram always
+  accepted. It is widened if it would exceed the bucket limit;
+- `latest=1` (valuations only): count only each asset's latest valuation.
+
+Linear widths are rounded to 1, 2, 2.5 or 5 times a power of ten. Log
+buckets split each decade into equal steps; their edges are reported to
+four significant digits.
+"""
+import datetime
+import math
+
+from django.conf import settings
+from django.db.models import Count, F, FloatField, IntegerField, Max, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Floor, Ln
+
+from .models import Asset, AssetValuation, Disposal, Maintenance
+
+
+HISTOGRAM_MAX_BUCKETS = getattr(settings, 'HISTOGRAM_MAX_BUCKETS', 100)
+HISTOGRAM_DEFAULT_BUCKETS = getattr(settings, 'HISTOGRAM_DEFAULT_BUCKETS', 20)
+LOG_SCALE_RATIO = getattr(settings, 'HISTOGRAM_LOG_SCALE_RATIO', 1000)
+
+NICE_STEPS = (1, 2, 2.5, 5, 10)
+
+
+def latest_valuations(queryset):
+    """Restrict valuations to the latest one of each asset."""
+    newest = (
+        AssetValuation.objects.filter(asset_id=OuterRef('asset_id'))
+        .order_by('-valuation_date', '-valuation_id').values('valuation_id')[:1]
+    )
+    return queryset.filter(valuation_id=Subquery(newest))
+
+
+def asset_age():
+    # Whole years, from the stored purchase_year column
+    return Value(datetime.date.today().year) - F('purchase_year')
+
+
+class HistogramField:
+    def __init__(self, model, value, integer=False, latest=None, dated=False):
+        self.model = model
+        # A column name, or a callable returning an expression
+        self.value = value
+        self.integer = integer
+        self.latest = latest
+        # The value depends on today's date, so its cached reports must too
+        self.dated = dated
+
+    def expression(self):
+        return self.value() if callable(self.value) else F(self.value)
+
+
+FIELDS = {
+    'valuation': HistogramField(AssetValuation, 'current_value', latest=latest_valuations),
+    'purchase-cost': HistogramField(Asset, 'purchase_cost'),
+    'maintenance-cost': HistogramField(Maintenance, 'cost'),
+    'disposal-value': HistogramField(Disposal, 'disposal_value'),
+    'asset-age': HistogramField(Asset, asset_age, integer=True, dated=True),
+}
+
+# Parameter sets precomputed by the warm_reports command, per field
+PRESETS = {
+    'valuation': ({}, {'latest': '1'}),
+}
+DEFAULT_PRESETS = ({},)
+
+
+def _positive_int(params, name):
+    try:
+        value = int(params.get(name))
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def nice_width(raw):
+    """The smallest 1/2/2.5/5 x 10^k that is >= raw."""
+    if raw <= 0:
+        return 1.0
+    magnitude = 10 ** math.floor(math.log10(raw))
+    return next(step * magnitude for step in NICE_STEPS if step * magnitude >= raw * (1 - 1e-9))
+
+
+class BucketPlan:
+    """`count` buckets from `start`: linear of `width`, or log with
+    `per_decade` buckets per power of ten."""
+
+    def __init__(self, scale, start, count, width=None, per_decade=None):
+        self.scale = scale
+        self.start = start
+        self.count = count
+        self.width = width
+        self.per_decade = per_decade
+
+    def edge(self, i):
+        if self.scale == 'log':
+            return 10 ** (math.log10(self.start) + i / self.per_decade)
+        return self.start + i * self.width
+
+    def index(self, value):
+        """SQL expression of a value's bucket number (not yet clamped)."""
+        value = Cast(value, FloatField())
+        if self.scale == 'log':
+            step = math.log(10) / self.per_decade
+            return Floor((Ln(value) - Value(math.log(self.start))) / Value(step))
+        return Floor((value - Value(float(self.start))) / Value(float(self.width)))
+
+
+def plan_buckets(low, high, params, integer=False):
+    low, high = float(low), float(high)
+    wanted = min(_positive_int(params, 'buckets') or HISTOGRAM_DEFAULT_BUCKETS, HISTOGRAM_MAX_BUCKETS)
+    width = _positive_int(params, 'bucket')
+    scale = params.get('scale', 'auto')
+    if scale not in ('linear', 'log'):
+        scale = 'log' if width is None and low > 0 and high / low >= LOG_SCALE_RATIO else 'linear'
+    if scale == 'log' and (low <= 0 or width is not None):
+        scale = 'linear'
+
+    if scale == 'log':
+        # Edges at 10^(k / per_decade) for whole k, from the one below `low`
+        decades = math.log10(high) - math.log10(low)
+        per_decade = max(1, math.floor(wanted / decades)) if decades > 0 else 1
+        while True:
+            first = math.floor(math.log10(low) * per_decade)
+            count = math.floor(math.log10(high) * per_decade) - first + 1
+            if count <= HISTOGRAM_MAX_BUCKETS or per_decade == 1:
+                break
+            per_decade -= 1
+        return BucketPlan('log', 10 ** (first / per_decade), min(count, HISTOGRAM_MAX_BUCKETS), per_decade=per_decade)
+
+    if width is None:
+        width = nice_width((high - low) / wanted) if high > low else 1
+    # Never more than the limit, however narrow the requested width
+    while math.floor(high / width) - math.floor(low / width) + 1 > HISTOGRAM_MAX_BUCKETS:
+        width = nice_width(width * 1.01)
+    if integer:
+        width = max(1, math.ceil(width))
+    start = math.floor(low / width) * width
+    count = max(1, math.floor((high - start) / width) + 1)
+    return BucketPlan('linear', start, min(count, HISTOGRAM_MAX_BUCKETS), width=width)
+
+
+def _values(name, params):
+    spec = FIELDS[name]
+    queryset = spec.model._default_manager.all()
+    if spec.latest and params.get('latest') in ('1', 'true', 'yes'):
+        queryset = spec.latest(queryset)
+    return spec, queryset.annotate(hist_value=spec.expression()).filter(hist_value__isnull=False)
+
+
+def histogram_queryset(name, params):
+    """Return (BucketPlan, grouped queryset of bucket/count), or (None, None)
+    when the field has no values."""
+    spec, values = _values(name, params)
+    bounds = values.aggregate(low=Min('hist_value'), high=Max('hist_value'))
+    if bounds['low'] is None:
+        return None, None
+    plan = plan_buckets(bounds['low'], bounds['high'], params, spec.integer)
+    grouped = (
+        values.annotate(hist_bucket=Cast(plan.index(F('hist_value')), IntegerField()))
+        .values('hist_bucket').annotate(count=Count('*')).order_by('hist_bucket')
+    )
+    return plan, grouped
+
+
+def _number(x, scale):
+    # Log edges are irrational apart from the powers of ten
+    x = float(f'{x:.4g}') if scale == 'log' else round(x, 6)
+    return int(x) if x == int(x) else x
+
+
+def histogram(name, params):
+    """Return [{'bucket': lower edge, 'upper': upper edge, 'count': n}] for
+    every bucket of field `name` (a FIELDS key)."""
+    plan, grouped = histogram_queryset(name, params)
+    if plan is None:
+        return []
+    counts = [0] * plan.count
+    for row in grouped:
+        # Float rounding can push the maximum one bucket past the end
+        counts[min(max(row['hist_bucket'], 0), plan.count - 1)] += row['count']
+    return [
+        {'bucket': _number(plan.edge(i), plan.scale), 'upper': _number(plan.edge(i + 1), plan.scale), 'count': count}
+        for i, count in enumerate(counts)
+    ]
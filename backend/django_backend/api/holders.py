@@ -0,0 +1,66 @@
+"""Maintenance of the denormalized "current holder" columns on Asset.
+
+An asset's current holder is its latest Assignment ordered by
+`-assigned_date, -assignment_id`, the same ordering the asset list used to
+compute with correlated subqueries on every request.
+"""
+from django.db import transaction
+
+from .changes import record_changes
+from .models import Asset, Assignment
+
+
+EMPTY_HOLDER = {
+    'current_holder_id': None,
+    'current_holder_name': None,
+    'current_assignment_status': None,
+    'current_assignment_date': None,
+}
+
+
+def latest_holders(asset_ids):
+    """Return {asset_id: holder values} for the given assets in one query.
+
+    Assets without assignments map to EMPTY_HOLDER.
+    """
+    asset_ids = list(asset_ids)
+    holders = {aid: dict(EMPTY_HOLDER) for aid in asset_ids}
+    if not asset_ids:
+        return holders
+    rows = (
+        Assignment.objects.filter(asset_id__in=asset_ids)
+        .order_by('asset_id', '-assigned_date', '-assignment_id')
+        .values_list('asset_id', 'user_id', 'user__name', 'status', 'assigned_date')
+    )
+    seen = set()
+    for asset_id, user_id, user_name, status, assigned_date in rows.iterator(chunk_size=2000):
+        if asset_id in seen:
+            continue
+        seen.add(asset_id)
+        holders[asset_id] = {
+            'current_holder_id': user_id,
+            'current_holder_name': user_name,
+            'current_assignment_status': status,
+            'current_assignment_date': assigned_date,
+        }
+    return holders
+
+
+def refresh_current_holders(asset_ids):
+    """Recompute and store the holder columns for the given assets."""
+    asset_ids = {aid for aid in asset_ids if aid is not None}
+    if not asset_ids:
+        return
+    with transaction.atomic():
+        for asset_id, values in latest_holders(asset_ids).items():
+            Asset.objects.filter(pk=asset_id).update(**values)
+        record_changes(Asset, asset_ids)
+
+
+def stale_holders(assets):
+    """Yield (asset, expected values) for assets whose stored holder is wrong."""
+    expected = latest_holders(a.asset_id for a in assets)
+    for asset in assets:
+        values = expected[asset.asset_id]
+        if any(getattr(asset, field) != value for field, value in values.items()):
+            yield asset, values
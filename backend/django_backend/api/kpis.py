@@ -0,0 +1,215 @@
+"""Headline KPI counters behind `/api/reports/kpis/`.
+
+KpiCounter holds a running total per KPI, so the KPI report and the
+dashboard cards read a few dozen rows however large the tables grow. Writes
+to Asset, Maintenance, Disposal, Assignment and User fold their delta into
+the counters through api/signals.py,
+in the writer's transaction, with UPDATE ... SET value = value + %s:
+
+- a created row adds its contribution and a deleted row subtracts it;
+- an update subtracts the old contribution (from the PREVIOUS_FIELDS
+  snapshot) and adds the new one, so an edit that does not touch a
+  counted column writes no counter at all.
+
+Every KPI is split over KPI_COUNTER_SLOTS rows, and each thread always
+writes the same slot, so concurrent writers rarely wait on one row lock.
+A KPI's value is the sum of its slots.
+
+Writes that bypass the signals (raw SQL, QuerySet.update(), snapshot
+loads) leave the counters behind until `reconcile_kpis()` (the
+`reconcile_kpis` command) recounts the tables and corrects them.
+"""
+import os
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Value
+
+from .caching import bump_table_versions
+from .models import Asset, Assignment, Disposal, KpiCounter, Maintenance, User
+
+
+KPI_COUNTER_SLOTS = max(1, getattr(settings, 'KPI_COUNTER_SLOTS', 8))
+
+# Asset.status values (matched case-insensitively) counted per status
+ASSET_STATUS_KPIS = {
+    'active': 'active_assets',
+    'maintenance': 'assets_in_maintenance',
+    'disposed': 'disposed_assets',
+}
+# Assignment.status values (matched case-insensitively) not counted as open
+CLOSED_ASSIGNMENT_STATUSES = ('returned', 'returned_on', 'completed')
+
+
+def _asset(get):
+    kpis = {'total_assets': 1, 'total_purchase_value': get('purchase_cost') or 0}
+    status = ASSET_STATUS_KPIS.get((get('status') or '').lower())
+    if status:
+        kpis[status] = 1
+    return kpis
+
+
+def _maintenance(get):
+    return {'total_maintenance_spend': get('cost') or 0, 'maintenance_records': 1}
+
+
+def _disposal(get):
+    return {'disposal_revenue': get('disposal_value') or 0}
+
+
+def _assignment(get):
+    status = (get('status') or '').lower()
+    return {
+        'active_assignments': 1 if get('return_date') is None else 0,
+        'open_assignments': 0 if status in CLOSED_ASSIGNMENT_STATUSES else 1,
+        'overdue_assignments': 1 if status == 'overdue' else 0,
+    }
+
+
+def _user(get):
+    return {'active_users': 1 if (get('status') or '').lower() == 'active' else 0}
+
+
+# model -> function(field getter) -> {kpi: what one row adds}
+CONTRIBUTIONS = {
+    Asset: _asset,
+    Maintenance: _maintenance,
+    Disposal: _disposal,
+    Assignment: _assignment,
+    User: _user,
+}
+
+
+def _closed_assignment():
+    closed = Q()
+    for status in CLOSED_ASSIGNMENT_STATUSES:
+        closed |= Q(status__iexact=status)
+    return closed
+
+# model -> {kpi: aggregate over the table}, for reconciling. Must agree
+# with CONTRIBUTIONS.
+AGGREGATES = {
+    Asset: {
+        'total_assets': Count('pk'),
+        **{kpi: Count('pk', filter=Q(status__iexact=status)) for status, kpi in ASSET_STATUS_KPIS.items()},
+        'total_purchase_value': Sum('purchase_cost'),
+    },
+    Maintenance: {'total_maintenance_spend': Sum('cost'), 'maintenance_records': Count('pk')},
+    Disposal: {'disposal_revenue': Sum('disposal_value')},
+    Assignment: {
+        'active_assignments': Count('pk', filter=Q(return_date__isnull=True)),
+        'open_assignments': Count('pk', filter=~_closed_assignment() | Q(status__isnull=True)),
+        'overdue_assignments': Count('pk', filter=Q(status__iexact='overdue')),
+    },
+    User: {'active_users': Count('pk', filter=Q(status__iexact='active'))},
+}
+
+# All KPIs in report order; the counts are reported as integers
+KPIS = tuple(kpi for aggregates in AGGREGATES.values() for kpi in aggregates)
+COUNT_KPIS = frozenset(kpi for aggregates in AGGREGATES.values() for kpi, agg in aggregates.items() if isinstance(agg, Count))
+
+
+def _add(totals, kpis, sign):
+    for kpi, value in kpis.items():
+        # Unsaved-looking values (e.g. '12.50' from create()) count too
+        totals[kpi] = totals.get(kpi, 0) + sign * Decimal(str(value))
+
+
+def saved_deltas(model, instances, created=False, previous=None):
+    """Return {kpi: delta} of creating/updating `instances`.
+
+    `previous` maps pk -> PREVIOUS_FIELDS values before an update; updated
+    rows without one are skipped (reconciling catches them up).
+    """
+    contribution = CONTRIBUTIONS[model]
+    previous = previous or {}
+    totals = {}
+    for instance in instances:
+        old = previous.get(instance.pk)
+        if created or old:
+            _add(totals, contribution(lambda field: getattr(instance, field)), 1)
+        if old and not created:
+            _add(totals, contribution(old.get), -1)
+    return totals
+
+
+def deleted_deltas(model, instances):
+    totals = {}
+    for instance in instances:
+        _add(totals, CONTRIBUTIONS[model](lambda field: getattr(instance, field)), -1)
+    return totals
+
+
+def _slot():
+    # Fixed per thread: one transaction never locks two slots of a KPI
+    return hash((os.getpid(), threading.get_ident())) % KPI_COUNTER_SLOTS
+
+
+def apply_deltas(deltas):
+    """Add {kpi: delta} to the counters."""
+    deltas = {kpi: delta for kpi, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    slot = _slot()
+    with transaction.atomic():
+        # In KPI order, so concurrent writers lock the rows in the same order
+        for kpi, delta in sorted(deltas.items()):
+            rows = KpiCounter.objects.filter(name=kpi, slot=slot)
+            if not rows.update(value=F('value') + Value(Decimal(delta))):
+                KpiCounter.objects.bulk_create([KpiCounter(name=kpi, slot=slot)], ignore_conflicts=True)
+                rows.update(value=F('value') + Value(Decimal(delta)))
+
+
+def _number(kpi, value):
+    return int(value) if kpi in COUNT_KPIS else round(float(value), 2)
+
+
+def stored_kpis(kpis=KPIS):
+    """Return {kpi: value} summed from the counter slots."""
+    rows = KpiCounter.objects.filter(name__in=kpis).values('name').annotate(total=Sum('value')).order_by()
+    totals = {row['name']: row['total'] for row in rows}
+    return {kpi: totals.get(kpi) or Decimal(0) for kpi in kpis}
+
+
+def counted_kpis(model):
+    """Return {kpi: value} of `model`'s KPIs aggregated from its table."""
+    counted = model._default_manager.aggregate(**AGGREGATES[model])
+    return {kpi: Decimal(value or 0) for kpi, value in counted.items()}
+
+
+def kpi_values(kpis=KPIS):
+    """Return {kpi: value} of `kpis` (default all), read from the counters."""
+    return {kpi: _number(kpi, value) for kpi, value in stored_kpis(kpis).items()}
+
+
+def reconcile_kpis(commit=True):
+    """Recount the KPIs from their tables and correct counters that drifted.
+
+    Returns {kpi: (stored, counted)} of the KPIs that had drifted. Each
+    table's counter rows are locked before the table is counted, so a
+    writer the count did not see waits on the lock and adds its delta to
+    the corrected value afterwards.
+    """
+    drifted = {}
+    for model, aggregates in AGGREGATES.items():
+        kpis = sorted(aggregates)
+        with transaction.atomic():
+            if commit:
+                KpiCounter.objects.bulk_create(
+                    [KpiCounter(name=kpi, slot=slot) for kpi in kpis for slot in range(KPI_COUNTER_SLOTS)],
+                    ignore_conflicts=True,
+                )
+                list(KpiCounter.objects.select_for_update().filter(name__in=kpis).order_by('name', 'slot'))
+            stored, counted = stored_kpis(kpis), counted_kpis(model)
+            wrong = [kpi for kpi in kpis if stored[kpi] != counted[kpi]]
+            for kpi in wrong:
+                drifted[kpi] = (stored[kpi], counted[kpi])
+                if commit:
+                    KpiCounter.objects.filter(name=kpi).exclude(slot=0).update(value=0)
+                    KpiCounter.objects.filter(name=kpi, slot=0).update(value=counted[kpi])
+            if commit and wrong:
+                # The KPI report is cached on the tables' version tokens
+                bump_table_versions(model)
+    return drifted
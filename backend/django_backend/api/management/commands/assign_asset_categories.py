@@ -1,77 +1,75 @@
-from django.core.management.base import BaseCommand
-import re
 import random
 
+from django.core.management.base import CommandError
+
+from api.batch import BatchCommand
+from api.classifier import CLASSIFY_CHUNK_SIZE, CategoryJob, KeywordClassifier, load_rules
 from api.models import Asset, Category
 
 
-class Command(BaseCommand):
-    help = "Assign categories to existing assets using simple name-based heuristics or random fallback"
+# Proposals printed at normal verbosity; -v 2 prints all of them
+SHOWN_CHANGES = 20
+
+
+class Command(BatchCommand):
+    help = "Assign categories to un-categorized assets using name keywords (see api/classifier.py), with a fallback"
+    chunk_size = CLASSIFY_CHUNK_SIZE
 
     def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--rules", help="JSON rules file instead of the CATEGORY_RULES setting")
         parser.add_argument(
-            "--commit",
-            action="store_true",
-            help="Persist changes. Without this flag the command runs as a dry-run.",
+            "--fallback", choices=("random", "others", "none"), default="random",
+            help='For names no rule matches: a random category (default), the "Others" category, or leave empty',
         )
 
     def handle(self, *args, **options):
         commit = options.get("commit", False)
+        try:
+            classifier = KeywordClassifier(load_rules(options["rules"]) if options["rules"] else None)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
 
-        # Very small heuristic map: keyword -> preferred category label
-        patterns = {
-            "Phone": [r"phone", r"iphone", r"samsung", r"galaxy", r"nokia", r"xiaomi"],
-            "Laptop": [r"laptop", r"lenovo", r"dell", r"hp", r"macbook", r"acer"],
-            "Monitor": [r"monitor", r"screen", r"display"],
-            "Printer": [r"printer", r"canon", r"epson", r"brother"],
-            "Furniture": [r"chair", r"desk", r"table", r"cabinet"],
-        }
-
-        # Lowercased map of existing categories
-        categories = {c.category_name.lower(): c for c in Category.objects.all()}
-
+        categories = dict(Category.objects.values_list("category_id", "category_name"))
         if not categories:
             self.stdout.write(self.style.ERROR("No categories found. Create some categories first."))
             return
-
-        fallback_categories = list(categories.values())
+        targets = classifier.targets(categories)
+
+        fallback = None
+        if options["fallback"] == "others":
+            fallback = next((pk for pk, name in categories.items() if name.lower() == "others"), None)
+            if fallback is None:
+                raise CommandError('No "Others" category; run ensure_others_category --commit first')
+        fallback_choices = list(categories) if options["fallback"] == "random" else None
+
+        def choose(name, _old):
+            index = classifier.rule_index(name)
+            chosen = targets[index] if index is not None else None
+            if chosen is None:
+                chosen = random.choice(fallback_choices) if fallback_choices else fallback
+            return chosen
 
         qs = Asset.objects.filter(category__isnull=True)
-        total = qs.count()
-        self.stdout.write(f"Found {total} un-categorized assets")
+        self.stdout.write(f"Found {qs.count()} un-categorized assets")
 
-        assigned_count = 0
+        shown = 0
 
-        for asset in qs.iterator():
-            name = (asset.asset_name or "").lower()
-            chosen = None
-
-            # try to match patterns -> prefer category whose name contains the pattern key
-            for human_cat, pats in patterns.items():
-                for p in pats:
-                    if re.search(r"\b" + re.escape(p) + r"\b", name):
-                        # find a real Category object that contains the human_cat word
-                        for key, cat in categories.items():
-                            if human_cat.lower() in key:
-                                chosen = cat
-                                break
-                        if chosen:
-                            break
-                if chosen:
-                    break
-
-            if not chosen:
-                # fallback: pick a random existing category
-                chosen = random.choice(fallback_categories)
-
-            self.stdout.write(f"{asset.asset_id}: \"{asset.asset_name}\" -> {chosen.category_name}")
-
-            if commit:
-                asset.category = chosen
-                asset.save(update_fields=["category"]) 
-                assigned_count += 1
+        def report(changes):
+            nonlocal shown
+            for asset, values in changes:
+                if shown < SHOWN_CHANGES or options["verbosity"] > 1:
+                    self.stdout.write(f"{asset.asset_id}: \"{asset.asset_name}\" -> {categories[values['category_id']]}")
+                    shown += 1
 
+        job = self.run_job(
+            CategoryJob, options, name="assign_asset_categories", choose=choose, queryset=qs, report=report,
+            params={"rules": options["rules"], "fallback": options["fallback"]},
+        )
+        assigned_count = job.changed
+        if assigned_count > shown:
+            self.stdout.write(f"... and {assigned_count - shown} more (-v 2 lists all)")
         if commit:
             self.stdout.write(self.style.SUCCESS(f"Assigned {assigned_count} assets"))
         else:
-            self.stdout.write(self.style.WARNING("Dry-run complete. Rerun with --commit to persist changes."))
+            self.stdout.write(self.style.WARNING(f"Dry-run complete ({assigned_count} assets). Rerun with --commit to persist changes."))
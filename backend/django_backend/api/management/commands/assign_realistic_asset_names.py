@@ -1,12 +1,15 @@
-from django.core.management.base import BaseCommand
-from django.db import transaction
-import re
-
-from api.models import Asset, Category
 import csv
 import os
+import re
 from datetime import datetime
 
+from api.batch import BatchCommand, BatchJob
+from api.models import Asset, Category
+
+
+# Proposals printed at normal verbosity; -v 2 prints all of them
+SHOWN_CHANGES = 20
+
 
 COMMON_PHONE_MODELS = [
     "Samsung Galaxy S{n}",
@@ -56,83 +59,91 @@ def pick_template_for_category(cat_name_lower, index):
     return tmpl.replace('{n}', str(num))
 
 
-class Command(BaseCommand):
+class RenameJob(BatchJob):
+    name = 'assign_realistic_asset_names'
+    model = Asset
+    fields = ('asset_name', 'category_id')
+
+    def __init__(self, prefix, report=None, **kwargs):
+        super().__init__(**kwargs)
+        self.prefix = prefix
+        self.report = report
+        self.pattern = re.compile(rf"^{re.escape(prefix)}\b", flags=re.IGNORECASE)
+
+    def options(self):
+        return {'match_prefix': self.prefix}
+
+    def setup(self):
+        # Build a mapping of category id -> lowercased name for heuristics
+        # Note: this project uses `category_id` as the PK field name.
+        self.categories = {pk: name.lower() for pk, name in Category.objects.values_list('category_id', 'category_name')}
+
+    def change(self, asset):
+        name = (asset.asset_name or '').strip()
+        # Match patterns like "Assigned Asset 1 (Test User 1)" or other placeholders
+        if name and not self.pattern.match(name):
+            return None
+        # heuristics based on category; without one, a mixed template.
+        # The template varies with the asset's position among all assets.
+        cat_name = self.categories.get(asset.category_id) if asset.category_id else None
+        new_name = pick_template_for_category(cat_name or '', self.position)
+        return {'asset_name': new_name} if new_name != asset.asset_name else None
+
+    def on_changes(self, changes):
+        if self.report:
+            self.report(changes)
+
+
+class Command(BatchCommand):
     help = 'Replace placeholder/generic asset names with more realistic model-like names. Dry-run by default.'
 
     def add_arguments(self, parser):
-        parser.add_argument('--commit', action='store_true', help='Persist changes')
+        super().add_arguments(parser)
         parser.add_argument('--match-prefix', type=str, default='Assigned Asset', help='Prefix to match generic assets (default: "Assigned Asset")')
 
     def handle(self, *args, **options):
         commit = options.get('commit', False)
-        prefix = options.get('match_prefix')
-
-        assets_qs = Asset.objects.all().order_by('asset_id')
-
-        changed = []
 
-        # Build a mapping of category id -> lowercased name for heuristics
-        # Note: this project uses `category_id` as the PK field name.
-        categories = {c.category_id: c.category_name.lower() for c in Category.objects.all()}
-
-        idx = 0
-        for asset in assets_qs:
-            name = (asset.asset_name or '').strip()
-            # Match patterns like "Assigned Asset 1 (Test User 1)" or other placeholders
-            if not name:
-                should_replace = True
-            else:
-                should_replace = bool(re.match(rf"^{re.escape(prefix)}\b", name, flags=re.IGNORECASE))
-
-            if not should_replace:
-                idx += 1
-                continue
-
-            # heuristics based on category
-            cat_name = categories.get(asset.category_id) if asset.category_id else None
-            if cat_name:
-                new_name = pick_template_for_category(cat_name, idx)
-            else:
-                # if no category, fallback to a mixed template
-                new_name = pick_template_for_category('', idx)
-
-            changed.append((asset.asset_id, name, new_name))
-            idx += 1
-
-        if not changed:
+        backup_path = backup = writer = None
+        if commit:
+            # The old names of each chunk are written to the backup just
+            # before the chunk is updated
+            ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+            backup_path = f'asset_name_backup_{ts}.csv'
+            backup = open(backup_path, 'w', newline='', encoding='utf-8')
+            writer = csv.writer(backup)
+            writer.writerow(['asset_id', 'asset_name'])
+
+        shown = 0
+
+        def report(changes):
+            nonlocal shown
+            for asset, values in changes:
+                if not shown:
+                    self.stdout.write('Proposed renames:')
+                if shown < SHOWN_CHANGES or options['verbosity'] > 1:
+                    self.stdout.write(f'{asset.asset_id}: "{(asset.asset_name or "").strip()}" -> "{values["asset_name"]}"')
+                    shown += 1
+                if writer:
+                    writer.writerow([asset.asset_id, asset.asset_name])
+            if backup:
+                backup.flush()
+
+        try:
+            job = self.run_job(RenameJob, options, prefix=options['match_prefix'], report=report)
+        finally:
+            if backup:
+                backup.close()
+
+        if not job.changed:
+            if backup_path:
+                os.remove(backup_path)
             self.stdout.write(self.style.SUCCESS('No matching generic assets found.'))
             return
-
-        self.stdout.write('Proposed renames:')
-        for aid, old, new in changed:
-            self.stdout.write(f'{aid}: "{old}" -> "{new}"')
+        if job.changed > shown:
+            self.stdout.write(f'... and {job.changed - shown} more (-v 2 lists all)')
 
         if commit:
-            self.stdout.write('Persisting changes...')
-            # create a backup CSV of current asset names before updating
-            ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '..', '..', '..')
-            # fallback to current working directory if path resolution is odd
-            try:
-                backup_dir = os.path.abspath(backup_dir)
-            except Exception:
-                backup_dir = os.getcwd()
-            backup_file = os.path.join(backup_dir, f'asset_name_backup_{ts}.csv')
-            try:
-                with open(backup_file, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(['asset_id', 'asset_name'])
-                    for aid, old, new in changed:
-                        # fetch the current name from DB to be safe
-                        a = Asset.objects.filter(asset_id=aid).first()
-                        writer.writerow([aid, a.asset_name if a else old])
-                self.stdout.write(self.style.SUCCESS(f'Backup written to {backup_file}'))
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Failed to write backup: {e}'))
-
-            with transaction.atomic():
-                for aid, old, new in changed:
-                    Asset.objects.filter(asset_id=aid).update(asset_name=new)
-            self.stdout.write(self.style.SUCCESS(f'Updated {len(changed)} assets'))
+            self.stdout.write(self.style.SUCCESS(f'Updated {job.changed} assets. Backup written to {backup_path}'))
         else:
             self.stdout.write(self.style.WARNING('Dry-run: no changes were persisted. Rerun with --commit to apply.'))
@@ -0,0 +1,89 @@
+import datetime
+import json
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from api import benchmarks
+from api.synthetic import DatasetGenerator, parse_count
+
+
+# Fixed, so every run benchmarks the same rows
+DATASET_AS_OF = datetime.date(2026, 1, 1)
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every API route through the test client on seeded datasets of several sizes, '
+        'recording time, queries, rows read and response bytes, and fail if a result is over its '
+        'budget relative to the stored baseline. Runs in the test database, never the configured one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', default=['1k', '10k'], help='Dataset sizes in assets (default: 1k 10k)')
+        parser.add_argument('--seed', type=int, default=0, help='Dataset seed (default: 0)')
+        parser.add_argument('--repeat', type=int, default=5, help='Measured runs per endpoint, after one warm-up (default: 5)')
+        parser.add_argument('--only', nargs='+', metavar='ROUTE', help='Only these routes (basenames such as asset, or report names)')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file (default: benchmarks/baseline.json)')
+        parser.add_argument('--write-baseline', action='store_true', help='Store these results as the new baseline instead of comparing')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs (skips migrating it)')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [parse_count(size) for size in options['sizes']]
+        except ValueError:
+            raise CommandError(f"Invalid --sizes {options['sizes']}")
+        baseline = None
+        if os.path.exists(options['baseline']):
+            try:
+                baseline = benchmarks.load_baseline(options['baseline'])
+            except (ValueError, benchmarks.BenchmarkError) as e:
+                raise CommandError(str(e))
+        elif not options['write_baseline']:
+            # Nothing to compare against would otherwise pass every run
+            raise CommandError(f"No baseline at {options['baseline']}; rerun with --write-baseline to store one.")
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            # Keep the benchmark's requests out of the real request metrics
+            # and report cache
+            middleware = [m for m in settings.MIDDLEWARE if not m.endswith('RequestTimingMiddleware')]
+            caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench'}}
+            with override_settings(MIDDLEWARE=middleware, CACHES=caches):
+                results = self._run(sizes, options)
+        except benchmarks.BenchmarkError as e:
+            raise CommandError(str(e))
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        if options['write_baseline']:
+            os.makedirs(os.path.dirname(os.path.abspath(options['baseline'])), exist_ok=True)
+            with open(options['baseline'], 'w') as f:
+                json.dump(benchmarks.new_baseline(results, baseline), f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}"))
+            return
+        if baseline.get('vendor') != benchmarks.connection.vendor:
+            raise CommandError(f"The baseline was recorded on {baseline.get('vendor')}, not {benchmarks.connection.vendor}")
+
+        violations = []
+        for size, by_endpoint in results.items():
+            violations += [f'[{size} assets] {v}' for v in benchmarks.compare(baseline, size, by_endpoint)]
+        if violations:
+            raise CommandError('Over budget:\n  ' + '\n  '.join(violations))
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget.'))
+
+    def _run(self, sizes, options):
+        results = {}
+        for size in sizes:
+            call_command('flush', interactive=False, verbosity=0)
+            DatasetGenerator(size, seed=options['seed'], as_of=DATASET_AS_OF, record=False, log=lambda message: None).run()
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{size} assets'))
+            results[size] = benchmarks.run(repeat=max(1, options['repeat']), only=options['only'], log=self.stdout.write)
+        return results
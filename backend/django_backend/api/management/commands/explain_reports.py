@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractQuarter, ExtractYear
+
+from api.histograms import histogram_queryset
+from api.models import Asset, AssetValuation, Assignment, Disposal, DisposalMonthlyRollup
+
+
+def report_queries():
+    """Yield (label, before queryset, after queryset) for each report query.
+
+    "before" is the shape the query had without the stored year/quarter
+    columns and the disposal rollup; "after" is what the views run now. Queries whose SQL did not
+    change (they only gained an index) have no "after"; compare those by
+    running the command before and after `migrate`.
+    """
+    disposals = Disposal.objects.filter(disposal_value__isnull=False)
+    # Both periods are summed from the monthly rollup (api/rollups.py)
+    rollup = DisposalMonthlyRollup.objects.filter(disposal_count__gt=0).order_by('year', 'month').values_list('year', 'month', 'total')
+    yield (
+        'sales_report: yearly',
+        disposals.annotate(year=ExtractYear('disposal_date')).values('year').annotate(total=Sum('disposal_value')).order_by('year'),
+        rollup,
+    )
+    yield (
+        'sales_report: quarterly',
+        disposals.annotate(year=ExtractYear('disposal_date'), quarter=ExtractQuarter('disposal_date'))
+        .values('year', 'quarter').annotate(total=Sum('disposal_value')).order_by('year', 'quarter'),
+        rollup,
+    )
+    assets = Asset.objects.filter(purchase_cost__isnull=False)
+    yield (
+        'purchases by quarter',
+        assets.annotate(year=ExtractYear('purchase_date'), quarter=ExtractQuarter('purchase_date'))
+        .values('year', 'quarter').annotate(total=Sum('purchase_cost')).order_by('year', 'quarter'),
+        assets.filter(purchase_year__isnull=False).values('purchase_year', 'purchase_quarter')
+        .annotate(total=Sum('purchase_cost')).order_by('purchase_year', 'purchase_quarter'),
+    )
+    latest = Assignment.objects.filter(asset_id=1).order_by('-assigned_date', '-assignment_id')[:1]
+    yield ('latest assignment for an asset', latest, None)
+    values = AssetValuation.objects.filter(current_value__isnull=False).values('current_value').annotate(cnt=Count('valuation_id'))
+    # The bucket queries need values to plan their buckets
+    _plan, buckets = histogram_queryset('valuation', {})
+    yield ('valuation_histogram', values, buckets)
+    _plan, latest = histogram_queryset('valuation', {'latest': '1'})
+    if latest is not None:
+        yield ('valuation_histogram: latest per asset', latest, None)
+    yield ('serial number lookup', Asset.objects.filter(serial_number='SN-0001'), None)
+
+
+class Command(BaseCommand):
+    help = 'Print the EXPLAIN plan of each report query before and after the report indexes/generated columns.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', default=None, help='EXPLAIN output format passed to the database, e.g. "json" or "tree" on MySQL')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            self.stdout.write(self.style.WARNING(f'Connected to {connection.vendor}; plans below are not MySQL plans.'))
+        explain_opts = {'format': options['format']} if options['format'] else {}
+
+        for label, before, after in report_queries():
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write('  before:' if after is not None else '  plan:')
+            self.stdout.write(self._explain(before, explain_opts))
+            if after is not None:
+                self.stdout.write('  after:')
+                self.stdout.write(self._explain(after, explain_opts))
+            self.stdout.write('')
+
+    def _explain(self, queryset, explain_opts):
+        try:
+            plan = queryset.explain(**explain_opts)
+        except DatabaseError as e:
+            # e.g. the generated columns do not exist yet before `migrate`
+            return f'    (not available: {e})'
+        return '\n'.join(f'    {line}' for line in str(plan).splitlines())
@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from api.batch import DELETE, BatchCommand, BatchJob, add_batch_arguments
+from api.models import ChangeLog, ChangeSequence
+
+
+class PruneJob(BatchJob):
+    name = 'prune_changelog'
+    model = ChangeLog
+    fields = ('change_id', 'position')
+
+    def __init__(self, cutoff, **kwargs):
+        super().__init__(**kwargs)
+        self.cutoff = cutoff
+
+    def get_queryset(self):
+        # Rows without a position have not been synced to anyone yet
+        return ChangeLog.objects.filter(changed_at__lt=self.cutoff, position__isnull=False)
+
+    def change(self, entry):
+        return DELETE
+
+    def on_changes(self, changes):
+        # Written with the chunk: tokens before this position get a reset
+        if self.commit:
+            pruned = max(entry.position for entry, _values in changes)
+            ChangeSequence.objects.get_or_create(pk=1)
+            ChangeSequence.objects.filter(pk=1).update(pruned_through=Greatest('pruned_through', pruned))
+
+
+class Command(BatchCommand):
+    help = 'Delete ChangeLog entries older than --days. Clients holding older sync tokens get a full resync.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Keep this many days of changes (default: 30)')
+        add_batch_arguments(parser, chunk_size=10000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        job = self.run_job(PruneJob, options, commit=True, cutoff=cutoff)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {job.changed} change log entries older than {cutoff:%Y-%m-%d %H:%M}'))
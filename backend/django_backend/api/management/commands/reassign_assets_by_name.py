@@ -1,72 +1,84 @@
 import csv
+import os
 from datetime import datetime
-from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
 
-from api.models import Asset, Category
+from api.batch import BatchCommand
+from api.classifier import CLASSIFY_CHUNK_SIZE, CategoryJob, KeywordClassifier, load_rules
+from api.models import Category
 
 
-KEYWORD_TO_CATEGORY = {
-    'nokia': 'Mobile Devices',
-    'iphone': 'Mobile Devices',
-    'samsung': 'Mobile Devices',
-    'ipad': 'Mobile Devices',
-    'lenovo': 'Laptops',
-    'thinkpad': 'Laptops',
-    'dell': 'Laptops',
-    'monitor': 'Monitors',
-    'printer': 'Printers & Scanners',
-    'scanner': 'Printers & Scanners',
-    'chair': 'Office Furniture',
-    'desk': 'Office Furniture',
-    'vehicle': 'Vehicles',
-    'car': 'Vehicles',
-    'truck': 'Vehicles',
-}
+# Proposals printed at normal verbosity; -v 2 prints all of them
+SHOWN_CHANGES = 20
 
 
-class Command(BaseCommand):
-    help = 'Propose or apply category reassignments for assets based on asset_name heuristics.'
+class Command(BatchCommand):
+    help = 'Propose or apply category reassignments for assets based on asset_name keywords (see api/classifier.py).'
+    chunk_size = CLASSIFY_CHUNK_SIZE
 
     def add_arguments(self, parser):
-        parser.add_argument('--commit', action='store_true', help='Apply changes')
-
-    def find_category(self, name):
-        if not name: return None
-        n = name.lower()
-        for k, cat_name in KEYWORD_TO_CATEGORY.items():
-            if k in n:
-                return Category.objects.filter(category_name__iexact=cat_name).first()
-        return None
+        super().add_arguments(parser)
+        parser.add_argument('--rules', help='JSON rules file instead of the CATEGORY_RULES setting')
 
     def handle(self, *args, **options):
-        assets = Asset.objects.all()
-        proposals = []
-        for a in assets:
-            cat = self.find_category(a.asset_name)
-            if cat and (a.category is None or a.category.category_id != cat.category_id):
-                proposals.append((a, cat))
+        try:
+            classifier = KeywordClassifier(load_rules(options['rules']) if options['rules'] else None)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        categories = dict(Category.objects.values_list('category_id', 'category_name'))
+        targets = classifier.targets(categories)
 
-        if not proposals:
-            self.stdout.write('No proposals found based on heuristics.')
-            return
+        def choose(name, _old):
+            index = classifier.rule_index(name)
+            return targets[index] if index is not None else None
+
+        commit = options.get('commit')
+        backup_path = None
+        backup = writer = None
+        if commit:
+            # commit changes with backup, written as each batch is applied
+            ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+            backup_path = f'asset_category_backup_{ts}.csv'
+            backup = open(backup_path, 'w', newline='', encoding='utf-8')
+            writer = csv.writer(backup)
+            writer.writerow(['asset_id', 'asset_name', 'old_category_id', 'old_category_name', 'new_category_id', 'new_category_name'])
 
-        self.stdout.write('Proposed reassignments:')
-        for a, cat in proposals:
-            self.stdout.write(f'{a.asset_id}: "{a.asset_name}" -> {cat.category_name} (was: {a.category.category_name if a.category else "None"})')
+        shown = 0
 
-        if not options.get('commit'):
-            self.stdout.write('\nRun with --commit to apply these changes.\n')
+        def report(changes):
+            nonlocal shown
+            for asset, values in changes:
+                asset_id, name, old, new = asset.asset_id, asset.asset_name, asset.category_id, values['category_id']
+                if not shown:
+                    self.stdout.write('Proposed reassignments:')
+                if shown < SHOWN_CHANGES or options['verbosity'] > 1:
+                    self.stdout.write(f'{asset_id}: "{name}" -> {categories[new]} (was: {categories.get(old, "None")})')
+                    shown += 1
+                if writer:
+                    writer.writerow([asset_id, name, old or '', categories.get(old, ''), new, categories[new]])
+            if backup:
+                backup.flush()
+
+        try:
+            job = self.run_job(
+                CategoryJob, options, name='reassign_assets_by_name', choose=choose, report=report,
+                params={'rules': options['rules']},
+            )
+        finally:
+            if backup:
+                backup.close()
+        total = job.changed
+
+        if not total:
+            if backup_path:
+                os.remove(backup_path)
+            self.stdout.write('No proposals found based on heuristics.')
             return
+        if total > shown:
+            self.stdout.write(f'... and {total - shown} more (-v 2 lists all)')
 
-        # commit changes with backup
-        ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_path = f'asset_category_backup_{ts}.csv'
-        with open(backup_path, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(['asset_id', 'asset_name', 'old_category_id', 'old_category_name', 'new_category_id', 'new_category_name'])
-            for a, cat in proposals:
-                writer.writerow([a.asset_id, a.asset_name, a.category.category_id if a.category else '', a.category.category_name if a.category else '', cat.category_id, cat.category_name])
-                a.category = cat
-                a.save()
+        if not commit:
+            self.stdout.write(f'\nRun with --commit to apply these {total} changes.\n')
+            return
 
-        self.stdout.write(self.style.SUCCESS(f'Applied {len(proposals)} changes. Backup written to {backup_path}'))
+        self.stdout.write(self.style.SUCCESS(f'Applied {total} changes. Backup written to {backup_path}'))
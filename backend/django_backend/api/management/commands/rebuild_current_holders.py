@@ -0,0 +1,52 @@
+from api.batch import BatchCommand, BatchJob, add_batch_arguments
+from api.holders import latest_holders
+from api.models import Asset
+
+
+class HolderJob(BatchJob):
+    name = 'rebuild_current_holders'
+    model = Asset
+    fields = Asset.CURRENT_HOLDER_FIELDS
+    # Lock the chunk so a concurrent Assignment write waits and then
+    # recomputes on top of what is stored here.
+    lock = True
+
+    def __init__(self, report=None, **kwargs):
+        super().__init__(**kwargs)
+        self.report = report
+
+    def prepare(self, assets):
+        self.expected = latest_holders(a.asset_id for a in assets)
+
+    def change(self, asset):
+        values = self.expected[asset.asset_id]
+        if any(getattr(asset, field) != value for field, value in values.items()):
+            return values
+        return None
+
+    def on_changes(self, changes):
+        if self.report:
+            self.report(changes)
+
+
+class Command(BatchCommand):
+    help = 'Rebuild the denormalized Asset.current_* holder columns from Assignment, in PK batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Only report assets whose stored holder is wrong; do not write')
+        add_batch_arguments(parser)
+
+    def handle(self, *args, **options):
+        verify = options['verify']
+        fields = list(Asset.CURRENT_HOLDER_FIELDS)
+
+        def report(changes):
+            for asset, values in changes:
+                self.stdout.write(f'{asset.asset_id}: stored {[getattr(asset, f) for f in fields]} expected {list(values.values())}')
+
+        job = self.run_job(HolderJob, options, commit=not verify, report=report if verify else None)
+        if verify:
+            style = self.style.SUCCESS if not job.changed else self.style.WARNING
+            self.stdout.write(style(f'Checked {job.scanned} assets, {job.changed} out of date'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Checked {job.scanned} assets, rebuilt {job.changed}'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.rollups import computed_rollup, rebuild_disposal_rollup, stored_rollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly disposal rollup behind the sales report from the Disposal table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Only report months whose stored rollup is wrong; do not write')
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            months = rebuild_disposal_rollup()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt the disposal rollup: {months} months'))
+            return
+
+        computed, stored = computed_rollup(), stored_rollup()
+        wrong = sorted(key for key in computed.keys() | stored.keys() if computed.get(key) != stored.get(key))
+        for year, month in wrong:
+            self.stdout.write(f'{year}-{month:02d}: stored {stored.get((year, month))} expected {computed.get((year, month))}')
+        style = self.style.SUCCESS if not wrong else self.style.WARNING
+        self.stdout.write(style(f'Checked {len(computed)} months, {len(wrong)} out of date'))
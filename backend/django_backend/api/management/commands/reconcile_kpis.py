@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.kpis import reconcile_kpis
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount the KPIs behind /api/reports/kpis/ from their tables and correct the counters that drifted '
+        '(e.g. after raw SQL or QuerySet.update() writes). With --interval it keeps doing so.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Only report KPIs whose counters are wrong; do not write')
+        parser.add_argument('--interval', type=float, help='Repeat every this many seconds')
+
+    def handle(self, *args, **options):
+        commit = not options['verify']
+        while True:
+            started = time.monotonic()
+            drifted = reconcile_kpis(commit=commit)
+            for kpi, (stored, counted) in sorted(drifted.items()):
+                self.stdout.write(f'{kpi}: stored {stored} counted {counted}')
+            verb = 'corrected' if commit else 'out of date'
+            style = self.style.SUCCESS if commit or not drifted else self.style.WARNING
+            self.stdout.write(style(f'Reconciled the KPI counters in {time.monotonic() - started:.2f}s: {len(drifted)} {verb}'))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from api.caching import REPORT_CACHE_TTL, warm_report
+from api.histograms import DEFAULT_PRESETS, PRESETS
+from api.views import REPORT_DATA
+
+
+# The frontend's dashboard and statistics pages ask for 1000-wide buckets
+DASHBOARD_PRESETS = ({}, {'bucket': '1000'})
+
+
+def presets(name):
+    """The query parameter sets precomputed for report `name`."""
+    if name == 'valuation-histogram':
+        return PRESETS['valuation']
+    if name == 'dashboard':
+        return DASHBOARD_PRESETS
+    if name.startswith('histogram-'):
+        return PRESETS.get(name[len('histogram-'):], DEFAULT_PRESETS)
+    return DEFAULT_PRESETS
+
+
+class Command(BaseCommand):
+    help = (
+        'Precompute the reports for their common parameters into the report cache, so requests for them '
+        'are hits. Entries stay valid until a write to the tables they read; with --interval the command '
+        'keeps recomputing what writes or expiry invalidated.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', metavar='REPORT', help=f'Only these reports ({", ".join(REPORT_DATA)})')
+        parser.add_argument('--interval', type=float, help=f'Repeat every this many seconds (keep it below REPORT_CACHE_TTL, {REPORT_CACHE_TTL}s)')
+
+    def handle(self, *args, **options):
+        names = options['only'] or list(REPORT_DATA)
+        unknown = [name for name in names if name not in REPORT_DATA]
+        if unknown:
+            raise CommandError(f'Unknown reports: {", ".join(unknown)}')
+        while True:
+            started = time.monotonic()
+            computed = 0
+            for name in names:
+                for params in presets(name):
+                    query = QueryDict(mutable=True)
+                    query.update(params)
+                    if warm_report(name, query, REPORT_DATA[name]):
+                        computed += 1
+                        self.stdout.write(f'{name} {query.urlencode() or "(defaults)"}: computed')
+            self.stdout.write(self.style.SUCCESS(f'Warmed reports: {computed} computed in {time.monotonic() - started:.2f}s'))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
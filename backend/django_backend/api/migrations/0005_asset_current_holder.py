@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:20
+
+from django.db import migrations, models
+
+
+def fill_current_holders(apps, schema_editor):
+    # Each asset's latest assignment (by assigned_date, then id), as
+    # api/holders.py keeps it from here on
+    Asset = apps.get_model('api', 'Asset')
+    Assignment = apps.get_model('api', 'Assignment')
+    rows = (
+        Assignment.objects.order_by('asset_id', '-assigned_date', '-assignment_id')
+        .values_list('asset_id', 'user_id', 'user__name', 'status', 'assigned_date')
+    )
+    fields = ['current_holder_id', 'current_holder_name', 'current_assignment_status', 'current_assignment_date']
+    batch, last_asset = [], None
+    for asset_id, user_id, user_name, status, assigned_date in rows.iterator(chunk_size=2000):
+        if asset_id == last_asset:
+            continue
+        last_asset = asset_id
+        batch.append(Asset(
+            asset_id=asset_id, current_holder_id=user_id, current_holder_name=user_name,
+            current_assignment_status=status, current_assignment_date=assigned_date,
+        ))
+        if len(batch) >= 1000:
+            Asset.objects.bulk_update(batch, fields)
+            batch = []
+    Asset.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_user_role'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='current_assignment_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='current_assignment_status',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='current_holder_id',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='current_holder_name',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.RunPython(fill_current_holders, migrations.RunPython.noop),
+    ]
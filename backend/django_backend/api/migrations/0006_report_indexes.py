@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:20
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_asset_current_holder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='purchase_quarter',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.datetime.ExtractQuarter('purchase_date'), output_field=models.IntegerField(null=True)),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='purchase_year',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.datetime.ExtractYear('purchase_date'), output_field=models.IntegerField(null=True)),
+        ),
+        migrations.AddField(
+            model_name='disposal',
+            name='disposal_quarter',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.datetime.ExtractQuarter('disposal_date'), output_field=models.IntegerField(null=True)),
+        ),
+        migrations.AddField(
+            model_name='disposal',
+            name='disposal_year',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.datetime.ExtractYear('disposal_date'), output_field=models.IntegerField(null=True)),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['serial_number'], name='asset_serial_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['purchase_year', 'purchase_quarter', 'purchase_cost'], name='asset_purchase_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assetvaluation',
+            index=models.Index(fields=['current_value'], name='valuation_current_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['asset', '-assigned_date', '-assignment_id'], name='assignment_asset_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disposal',
+            index=models.Index(fields=['disposal_date'], name='disposal_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disposal',
+            index=models.Index(fields=['disposal_year', 'disposal_quarter', 'disposal_value'], name='disposal_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email'], name='user_email_idx'),
+        ),
+    ]
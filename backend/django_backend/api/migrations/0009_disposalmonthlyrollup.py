@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:01
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def fill_rollup(apps, schema_editor):
+    Disposal = apps.get_model('api', 'Disposal')
+    DisposalMonthlyRollup = apps.get_model('api', 'DisposalMonthlyRollup')
+    rows = (
+        Disposal.objects.filter(disposal_date__isnull=False, disposal_value__isnull=False)
+        .annotate(year=ExtractYear('disposal_date'), month=ExtractMonth('disposal_date'))
+        .values('year', 'month')
+        .annotate(total=Sum('disposal_value'), count=Count('disposal_id'), low=Min('disposal_value'), high=Max('disposal_value'))
+        .order_by()
+    )
+    DisposalMonthlyRollup.objects.bulk_create([
+        DisposalMonthlyRollup(
+            year=r['year'], month=r['month'], total=r['total'], disposal_count=r['count'],
+            min_value=r['low'], max_value=r['high'],
+        )
+        for r in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_batchcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DisposalMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('disposal_count', models.IntegerField(default=0)),
+                ('min_value', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('max_value', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('year', 'month'), name='disposal_rollup_month_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_disposalmonthlyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assetvaluation',
+            index=models.Index(fields=['asset', '-valuation_date', '-valuation_id'], name='valuation_asset_latest_idx'),
+        ),
+    ]
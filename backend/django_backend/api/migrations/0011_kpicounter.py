@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:09
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+# The KPIs of api/kpis.py as they were when this migration was written
+KPI_AGGREGATES = {
+    'Asset': {
+        'total_assets': Count('pk'),
+        'active_assets': Count('pk', filter=Q(status__iexact='active')),
+        'assets_in_maintenance': Count('pk', filter=Q(status__iexact='maintenance')),
+        'disposed_assets': Count('pk', filter=Q(status__iexact='disposed')),
+        'total_purchase_value': Sum('purchase_cost'),
+    },
+    'Maintenance': {'total_maintenance_spend': Sum('cost')},
+    'Disposal': {'disposal_revenue': Sum('disposal_value')},
+    'Assignment': {'active_assignments': Count('pk', filter=Q(return_date__isnull=True))},
+}
+
+
+def fill_counters(apps, schema_editor):
+    KpiCounter = apps.get_model('api', 'KpiCounter')
+    counters = []
+    for model_name, aggregates in KPI_AGGREGATES.items():
+        counted = apps.get_model('api', model_name).objects.aggregate(**aggregates)
+        counters += [KpiCounter(name=name, slot=0, value=value or 0) for name, value in counted.items()]
+    KpiCounter.objects.bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_valuation_latest_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KpiCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('slot', models.PositiveSmallIntegerField(default=0)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('name', 'slot'), name='kpi_counter_slot_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
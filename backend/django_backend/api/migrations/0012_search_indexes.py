@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:11
+
+from django.db import migrations, models
+
+
+# FULLTEXT indexes of /api/search/; api/search.py MATCHes exactly these
+# column lists. MySQL only: elsewhere search falls back to LIKE.
+FULLTEXT_INDEXES = (
+    ('api_asset', 'asset_search_ft', ('asset_name', 'current_holder_name')),
+    ('api_user', 'user_search_ft', ('name',)),
+    ('api_supplier', 'supplier_search_ft', ('name',)),
+    ('api_buyer', 'buyer_search_ft', ('name',)),
+    ('api_category', 'category_search_ft', ('category_name',)),
+)
+
+
+def add_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    quote = schema_editor.quote_name
+    for table, name, columns in FULLTEXT_INDEXES:
+        schema_editor.execute(
+            f'CREATE FULLTEXT INDEX {quote(name)} ON {quote(table)} ({", ".join(quote(c) for c in columns)})'
+        )
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    quote = schema_editor.quote_name
+    for table, name, _columns in FULLTEXT_INDEXES:
+        schema_editor.execute(f'DROP INDEX {quote(name)} ON {quote(table)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_kpicounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='buyer',
+            index=models.Index(fields=['tin'], name='buyer_tin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['nin'], name='user_nin_idx'),
+        ),
+        migrations.RunPython(add_fulltext_indexes, drop_fulltext_indexes),
+    ]
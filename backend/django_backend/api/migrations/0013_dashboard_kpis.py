@@ -0,0 +1,49 @@
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+CLOSED_ASSIGNMENT_STATUSES = ('returned', 'returned_on', 'completed')
+
+
+def _closed():
+    closed = Q()
+    for status in CLOSED_ASSIGNMENT_STATUSES:
+        closed |= Q(status__iexact=status)
+    return closed
+
+
+# The KPIs added for the dashboard cards, as they were when this migration
+# was written
+KPI_AGGREGATES = {
+    'Maintenance': {'maintenance_records': Count('pk')},
+    'Assignment': {
+        'open_assignments': Count('pk', filter=~_closed() | Q(status__isnull=True)),
+        'overdue_assignments': Count('pk', filter=Q(status__iexact='overdue')),
+    },
+    'User': {'active_users': Count('pk', filter=Q(status__iexact='active'))},
+}
+
+
+def fill_counters(apps, schema_editor):
+    KpiCounter = apps.get_model('api', 'KpiCounter')
+    counters = []
+    for model_name, aggregates in KPI_AGGREGATES.items():
+        counted = apps.get_model('api', model_name).objects.aggregate(**aggregates)
+        counters += [KpiCounter(name=name, slot=0, value=value or 0) for name, value in counted.items()]
+    KpiCounter.objects.bulk_create(counters)
+
+
+def drop_counters(apps, schema_editor):
+    names = [name for aggregates in KPI_AGGREGATES.values() for name in aggregates]
+    apps.get_model('api', 'KpiCounter').objects.filter(name__in=names).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_counters, drop_counters),
+    ]
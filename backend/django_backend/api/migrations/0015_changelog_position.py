@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:31
+
+from django.db import migrations, models
+from django.db.models import F, Max, Min
+
+
+def fill_positions(apps, schema_editor):
+    # Rows written so far keep their change_id as position, so sync tokens
+    # handed out before this migration stay valid
+    ChangeLog = apps.get_model('api', 'ChangeLog')
+    ChangeLog.objects.update(position=F('change_id'))
+    bounds = ChangeLog.objects.aggregate(oldest=Min('change_id'), newest=Max('change_id'))
+    apps.get_model('api', 'ChangeSequence').objects.create(
+        pk=1,
+        last_position=bounds['newest'] or 0,
+        pruned_through=(bounds['oldest'] or 1) - 1,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_search_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_position', models.BigIntegerField(default=0)),
+                ('pruned_through', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='changelog',
+            name='changelog_table_idx',
+        ),
+        migrations.AddField(
+            model_name='changelog',
+            name='position',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_positions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['table_name', 'position'], name='changelog_table_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['position'], name='changelog_position_idx'),
+        ),
+    ]
@@ -0,0 +1,327 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .bulk import insert_rows, update_rows
+from .caching import get_validators, not_modified, set_validators
+from .changes import changes_since, latest_position, pruned_through
+from .exports import CSVRenderer, NDJSONRenderer, export_format, export_response, table_chunks, table_columns
+from .resolvers import ForeignKeyResolver, resolver_for
+from .signals import snapshot
+
+
+BULK_MAX_ITEMS = getattr(settings, 'BULK_MAX_ITEMS', 5000)
+
+
+class ConditionalGetMixin:
+    """Answer list/detail GETs with ETag/Last-Modified validators.
+
+    Validators come from the version tokens of `etag_models` (defaults to the
+    viewset's model), so a matching If-None-Match/If-Modified-Since is
+    answered with a 304 before the queryset is built or evaluated.
+
+    Delta sync requests (`?since=`) are not conditional: their token can
+    advance without a write to the table (e.g. paging with `more`), and a
+    304 would keep the client on its old token.
+    """
+    etag_models = None
+
+    def get_etag_models(self):
+        return self.etag_models or (self.queryset.model,)
+
+    def list(self, request, *args, **kwargs):
+        if 'since' in request.query_params:
+            return super().list(request, *args, **kwargs)
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        _, etag, last_modified = get_validators(request, self.get_etag_models())
+        if not_modified(request, etag, last_modified):
+            return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_validators(response, etag, last_modified)
+        return response
+
+
+class SparseQuerysetMixin:
+    """Restrict the SQL columns of read requests to the serialized fields.
+
+    With `?fields=`/`?omit=` the serializer (see SparseFieldsMixin) drops
+    fields; this loads only the columns behind the remaining ones with
+    `only()`, and keeps a select_related join only if a remaining field
+    reads through it.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return queryset
+        params = self.request.query_params
+        if not (params.get('fields') or params.get('omit')):
+            return queryset
+
+        model = queryset.model
+        concrete = {f.name for f in model._meta.concrete_fields}
+        columns = {model._meta.pk.name}
+        related = set()
+        for field in self.get_serializer().fields.values():
+            if field.write_only:
+                continue
+            parts = field.source.split('.')
+            if len(parts) > 1 and parts[0] in concrete:
+                related.add(parts[0])
+                columns.add('__'.join(parts))
+            elif parts[0] in concrete:
+                columns.add(parts[0])
+            else:
+                # Computed or custom source: cannot tell which columns it needs
+                return queryset
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+
+class ExportMixin:
+    """`GET <list>/export/?format=csv|ndjson` streams the whole table.
+
+    Columns are the table's own (foreign keys as `<name>_id`); `?fields=` /
+    `?omit=` pick them and `?gzip=1` compresses on the fly. See
+    api/exports.py. Carries the same validators as the list endpoint.
+    """
+
+    def perform_content_negotiation(self, request, force=False):
+        # `?format=` names the export format here; answer unknown values
+        # with our 400 rather than DRF's format-suffix 404
+        return super().perform_content_negotiation(request, force=force or self.action == 'export')
+
+    @action(detail=False, methods=['get'], url_path='export', renderer_classes=[JSONRenderer, CSVRenderer, NDJSONRenderer])
+    def export(self, request, *args, **kwargs):
+        fmt = export_format(request.query_params)
+        if fmt is None:
+            return Response({'format': ['Expected "csv" or "ndjson".']}, status=status.HTTP_400_BAD_REQUEST)
+        _, etag, last_modified = get_validators(request, self.get_etag_models())
+        if not_modified(request, etag, last_modified):
+            return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+        queryset = self.queryset.all()
+        columns = table_columns(queryset.model, request.query_params)
+        response = export_response(request, self.basename, fmt, columns, table_chunks(queryset, columns))
+        return set_validators(response, etag, last_modified)
+
+
+def encode_sync_token(position):
+    return base64.urlsafe_b64encode(f'c{position}'.encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_sync_token(token):
+    """Return the ChangeLog position in `token`, 0 for an empty token."""
+    if not token:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('ascii')
+        if raw[:1] == 'c':
+            return int(raw[1:])
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        pass
+    raise ValueError('invalid sync token')
+
+
+class DeltaSyncMixin:
+    """Serve `GET <list>?since=<token>` as a delta against the ChangeLog.
+
+    `?since=` (empty) returns every row plus a token; later calls with that
+    token return only rows created/updated since then under `changed` and
+    deleted primary keys under `deleted`, plus the next token. When `more`
+    is true the client should call again right away with the new token.
+    If the token predates the retained change log, a full snapshot is sent
+    with `reset: true`.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if 'since' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        try:
+            since = decode_sync_token(request.query_params['since'])
+        except ValueError as e:
+            return Response({'since': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.queryset.model if self.queryset is not None else self.get_queryset().model
+        queryset = self.filter_queryset(self.get_queryset())
+        if since == 0 or since < pruned_through():
+            # Take the position before reading rows so that anything written
+            # during the read is sent again next time.
+            position = latest_position(model)
+            serializer = self.get_serializer(queryset, many=True)
+            return Response({
+                'token': encode_sync_token(position),
+                'reset': True,
+                'more': False,
+                'changed': serializer.data,
+                'deleted': [],
+            })
+
+        upserted, deleted, position, more = changes_since(model, since)
+        changed = queryset.filter(pk__in=upserted) if upserted else queryset.none()
+        serializer = self.get_serializer(changed, many=True)
+        return Response({
+            'token': encode_sync_token(position),
+            'reset': False,
+            'more': more,
+            'changed': serializer.data,
+            'deleted': deleted,
+        })
+
+
+class BulkMixin:
+    """`<list>/bulk/` endpoint taking a JSON array of rows.
+
+    POST creates rows, PATCH partially updates them (each item carries its
+    primary key) and DELETE removes them (an array of primary keys). Each
+    item is validated on its own and the valid ones are written together
+    in one transaction with bulk_create/bulk_update. Foreign keys of the
+    whole batch are prefetched into the request's resolver with one query
+    per related model.
+
+    The response has one result per item, in request order, e.g.
+    `{"index": 0, "status": 201, "data": {...}}` or
+    `{"index": 1, "status": 400, "errors": {...}}`. Its own status is
+    201/200 when every item succeeded, 400 when none did and 207 otherwise.
+    """
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'detail': 'Expected a list of items.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > BULK_MAX_ITEMS:
+            return Response(
+                {'detail': f'At most {BULK_MAX_ITEMS} items per request.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        model = self.queryset.model
+        with transaction.atomic():
+            if request.method == 'DELETE':
+                return self._bulk_delete(model, items)
+            self._prefetch_related(model, items)
+            if request.method == 'POST':
+                return self._bulk_create(model, items)
+            return self._bulk_update(model, items)
+
+    def _prefetch_related(self, model, items):
+        resolver = resolver_for(self.request)
+        rows = [item for item in items if isinstance(item, dict)]
+        for field in model._meta.concrete_fields:
+            if not field.is_relation:
+                continue
+            keys = (field.name, field.attname)
+            values = [row[key] for row in rows for key in keys if key in row]
+            resolver.prefetch(field.related_model, values)
+
+    def _validated_attrs(self, serializer):
+        """Return (model attribute values, None) or (None, errors)."""
+        if not serializer.is_valid():
+            return None, serializer.errors
+        try:
+            return serializer.prepare_write_data(dict(serializer.validated_data)), None
+        except ValidationError as e:
+            return None, e.detail
+
+    def _bulk_create(self, model, items):
+        results, written = {}, []
+        for index, item in enumerate(items):
+            attrs, errors = self._validated_attrs(self.get_serializer(data=item))
+            if errors is not None:
+                results[index] = {'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': errors}
+                continue
+            written.append((index, model(**attrs)))
+        insert_rows(model, [instance for _, instance in written])
+        return self._bulk_response(len(items), results, written, status.HTTP_201_CREATED)
+
+    def _bulk_update(self, model, items):
+        pk_name = model._meta.pk.name
+        pks = {}
+        for index, item in enumerate(items):
+            if isinstance(item, dict):
+                pks[index] = ForeignKeyResolver.to_pk(model, item.get(pk_name, item.get('pk')))
+        instances = model._default_manager.select_for_update().in_bulk(
+            [pk for pk in pks.values() if pk is not None]
+        )
+        previous = snapshot(model, instances.values())
+
+        results, written, fields, seen = {}, [], set(), set()
+        for index, item in enumerate(items):
+            pk = pks.get(index)
+            if pk is None:
+                errors = {pk_name: ['A primary key is required.']}
+            elif pk in seen:
+                errors = {pk_name: ['Duplicate primary key in request.']}
+            elif pk not in instances:
+                results[index] = {'index': index, 'status': status.HTTP_404_NOT_FOUND, 'errors': {'detail': 'Not found.'}}
+                continue
+            else:
+                seen.add(pk)
+                instance = instances[pk]
+                attrs, errors = self._validated_attrs(self.get_serializer(instance, data=item, partial=True))
+            if errors is not None:
+                results[index] = {'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': errors}
+                continue
+            for name, value in attrs.items():
+                setattr(instance, name, value)
+            fields.update(attrs)
+            written.append((index, instance))
+
+        updated = [instance for _, instance in written]
+        update_rows(model, updated, fields, previous={i.pk: previous[i.pk] for i in updated if i.pk in previous})
+        return self._bulk_response(len(items), results, written, status.HTTP_200_OK)
+
+    def _bulk_delete(self, model, items):
+        pk_name = model._meta.pk.name
+        pks = [
+            ForeignKeyResolver.to_pk(model, item.get(pk_name, item.get('pk')) if isinstance(item, dict) else item)
+            for item in items
+        ]
+        existing = set(model._default_manager.filter(pk__in=[pk for pk in pks if pk is not None]).values_list('pk', flat=True))
+        results = []
+        for index, pk in enumerate(pks):
+            if pk is None:
+                results.append({'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': {pk_name: ['A valid primary key is required.']}})
+            elif pk not in existing:
+                results.append({'index': index, 'status': status.HTTP_404_NOT_FOUND, 'errors': {'detail': 'Not found.'}})
+            else:
+                results.append({'index': index, 'status': status.HTTP_204_NO_CONTENT, 'id': pk})
+        if existing:
+            # A plain queryset delete: the per-row signals record the
+            # deletions, including rows removed by ON DELETE CASCADE.
+            model._default_manager.filter(pk__in=existing).delete()
+        return self._summary(results, status.HTTP_200_OK)
+
+    def _bulk_response(self, count, results, written, success_status):
+        if written:
+            # Re-read through the viewset queryset so the response carries
+            # database-computed columns and select_related fields.
+            rows = self.get_queryset().in_bulk([instance.pk for _, instance in written])
+            data = self.get_serializer([rows.get(i.pk, i) for _, i in written], many=True).data
+            for (index, instance), item in zip(written, data):
+                results[index] = {'index': index, 'status': success_status, 'data': item}
+        return self._summary([results[index] for index in range(count)], success_status)
+
+    def _summary(self, results, success_status):
+        succeeded = sum(1 for r in results if r['status'] < 300)
+        if succeeded == len(results):
+            code = success_status
+        elif succeeded == 0:
+            code = status.HTTP_400_BAD_REQUEST
+        else:
+            code = status.HTTP_207_MULTI_STATUS
+        return Response({'succeeded': succeeded, 'failed': len(results) - succeeded, 'results': results}, status=code)
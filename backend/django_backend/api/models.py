@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import ExtractQuarter, ExtractYear
 
 
 class Category(models.Model):
@@ -6,6 +7,12 @@ class Category(models.Model):
     category_name = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # prefix lookups of /api/search/ (api/search.py)
+            models.Index(fields=['category_name'], name='category_name_idx'),
+        ]
+
     def __str__(self):
         return self.category_name
 
@@ -26,6 +33,15 @@ class User(models.Model):
     )
     role = models.CharField(max_length=30, choices=ROLE_CHOICES, default='staff')
 
+    class Meta:
+        indexes = [
+            # get_or_create / lookup key used by the data scripts
+            models.Index(fields=['email'], name='user_email_idx'),
+            # prefix lookups of /api/search/ (api/search.py)
+            models.Index(fields=['nin'], name='user_nin_idx'),
+            models.Index(fields=['name'], name='user_name_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -41,6 +57,47 @@ class Asset(models.Model):
     warranty_expiry = models.DateField(null=True, blank=True)
     supplier_id = models.IntegerField(null=True, blank=True)
     serial_number = models.CharField(max_length=255, null=True, blank=True)
+    # Denormalized copy of the latest assignment (by assigned_date, then id).
+    # Maintained by the Assignment/User signal handlers in api/signals.py and
+    # rebuilt by the `rebuild_current_holders` management command.
+    current_holder_id = models.IntegerField(null=True, blank=True, db_index=True)
+    current_holder_name = models.CharField(max_length=255, null=True, blank=True)
+    current_assignment_status = models.CharField(max_length=100, null=True, blank=True)
+    current_assignment_date = models.DateField(null=True, blank=True)
+    # Stored generated columns so purchase reports can group on an index
+    # instead of evaluating EXTRACT() for every row.
+    purchase_year = models.GeneratedField(
+        expression=ExtractYear('purchase_date'), output_field=models.IntegerField(null=True), db_persist=True,
+    )
+    purchase_quarter = models.GeneratedField(
+        expression=ExtractQuarter('purchase_date'), output_field=models.IntegerField(null=True), db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            # idempotency key used by populate_sample_data.py
+            models.Index(fields=['serial_number'], name='asset_serial_number_idx'),
+            # covering index for purchases grouped by year/quarter
+            models.Index(fields=['purchase_year', 'purchase_quarter', 'purchase_cost'], name='asset_purchase_period_idx'),
+            # prefix lookups of /api/search/ (api/search.py)
+            models.Index(fields=['asset_name'], name='asset_name_idx'),
+            models.Index(fields=['current_holder_name'], name='asset_holder_name_idx'),
+        ]
+
+    CURRENT_HOLDER_FIELDS = (
+        'current_holder_id', 'current_holder_name',
+        'current_assignment_status', 'current_assignment_date',
+    )
+
+    def save(self, *args, **kwargs):
+        # Never write back the denormalized holder columns from a stale
+        # in-memory instance; only the signal handlers own them.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and not f.generated and f.name not in self.CURRENT_HOLDER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.asset_name
@@ -53,6 +110,12 @@ class Supplier(models.Model):
     email = models.CharField(max_length=255, null=True, blank=True)
     address = models.TextField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # prefix lookups of /api/search/ (api/search.py)
+            models.Index(fields=['name'], name='supplier_name_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -75,6 +138,13 @@ class Buyer(models.Model):
     address = models.TextField(null=True, blank=True)
     tin = models.CharField(max_length=100, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # prefix lookups of /api/search/ (api/search.py)
+            models.Index(fields=['tin'], name='buyer_tin_idx'),
+            models.Index(fields=['name'], name='buyer_name_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -86,11 +156,68 @@ class Disposal(models.Model):
     disposal_value = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     buyer = models.ForeignKey(Buyer, null=True, blank=True, on_delete=models.SET_NULL, related_name='disposals')
     reason = models.TextField(null=True, blank=True)
+    # Stored generated columns backing the sales report's year/quarter grouping
+    disposal_year = models.GeneratedField(
+        expression=ExtractYear('disposal_date'), output_field=models.IntegerField(null=True), db_persist=True,
+    )
+    disposal_quarter = models.GeneratedField(
+        expression=ExtractQuarter('disposal_date'), output_field=models.IntegerField(null=True), db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['disposal_date'], name='disposal_date_idx'),
+            # covering index for the sales report (GROUP BY year, quarter; SUM(value))
+            models.Index(fields=['disposal_year', 'disposal_quarter', 'disposal_value'], name='disposal_period_idx'),
+        ]
 
     def __str__(self):
         return f"Disposal {self.disposal_id} for {self.asset}"
 
 
+class DisposalMonthlyRollup(models.Model):
+    """Disposal values summed per calendar month of `disposal_date`.
+
+    Maintained in the same transaction as every Disposal write (see
+    api/rollups.py), so the sales report reads at most 12 rows per year
+    instead of aggregating the whole disposal history. Disposals without
+    a date or value are not counted.
+    """
+    year = models.IntegerField()
+    month = models.PositiveSmallIntegerField()
+    total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    disposal_count = models.IntegerField(default=0)
+    min_value = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    max_value = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month'], name='disposal_rollup_month_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Disposals {self.year}-{self.month:02d}: {self.disposal_count}"
+
+
+class KpiCounter(models.Model):
+    """One slot of a running KPI total (see api/kpis.py).
+
+    A KPI's value is the sum of its slots; writers spread over the slots so
+    they do not all queue on one row lock.
+    """
+    name = models.CharField(max_length=50)
+    slot = models.PositiveSmallIntegerField(default=0)
+    value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'slot'], name='kpi_counter_slot_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.name}[{self.slot}]: {self.value}"
+
+
 class MaintenanceStaff(models.Model):
     m_staff_id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=255)
@@ -125,6 +252,18 @@ class Assignment(models.Model):
     description = models.TextField(null=True, blank=True)
     approved_by = models.CharField(max_length=255, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # latest assignment per asset: WHERE asset_id = ? ORDER BY assigned_date DESC, assignment_id DESC
+            models.Index(fields=['asset', '-assigned_date', '-assignment_id'], name='assignment_asset_latest_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Keep the write and the Asset.current_* refresh done by the
+        # post_save handler in one transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Assignment {self.assignment_id} - {self.asset} to {self.user}"
 
@@ -137,5 +276,77 @@ class AssetValuation(models.Model):
     initial_value = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     current_value = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # valuation histogram scans/groups on current_value only
+            models.Index(fields=['current_value'], name='valuation_current_value_idx'),
+            # latest valuation per asset (histogram `latest=1`)
+            models.Index(fields=['asset', '-valuation_date', '-valuation_id'], name='valuation_asset_latest_idx'),
+        ]
+
     def __str__(self):
         return f"Valuation {self.valuation_id} for {self.asset}"
+
+
+class ChangeLog(models.Model):
+    """Append-only log of row writes, used for delta sync (`?since=`).
+
+    Written in the same transaction as the change it records (see
+    api/changes.py). `position` is the sync position handed to clients. It
+    is given to rows once they are committed, in commit order, whereas
+    `change_id` follows insertion order.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = (
+        (UPSERT, 'Created or updated'),
+        (DELETE, 'Deleted'),
+    )
+
+    change_id = models.BigAutoField(primary_key=True)
+    table_name = models.CharField(max_length=64)
+    object_id = models.IntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
+    position = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['table_name', 'position'], name='changelog_table_position_idx'),
+            models.Index(fields=['position'], name='changelog_position_idx'),
+        ]
+
+    def __str__(self):
+        return f"Change {self.change_id}: {self.action} {self.table_name} {self.object_id}"
+
+
+class ChangeSequence(models.Model):
+    """The last ChangeLog position handed out, and the highest one pruned.
+
+    One row, locked while positions are given out (see api/changes.py).
+    """
+    last_position = models.BigIntegerField(default=0)
+    pruned_through = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Change positions through {self.last_position}"
+
+
+class BatchCheckpoint(models.Model):
+    """Progress of a resumable batch job (see api/batch.py).
+
+    Updated in the same transaction as each chunk the job writes, so
+    `last_pk` is always the last row whose change is committed.
+    """
+    job = models.CharField(max_length=100, primary_key=True)
+    signature = models.CharField(max_length=255, blank=True, default='')
+    last_pk = models.BigIntegerField(default=0)
+    rows_scanned = models.BigIntegerField(default=0)
+    rows_changed = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        state = 'finished' if self.finished_at else f'at pk {self.last_pk}'
+        return f"Batch job {self.job}: {state}"
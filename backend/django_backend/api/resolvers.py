@@ -0,0 +1,78 @@
+"""Request-scoped, batched primary-key resolution for related objects.
+
+A ForeignKeyResolver caches related rows by model and primary key, so each
+referenced row is fetched at most once. One resolver is attached to every
+request (see resolver_for()); serializers find it through their context.
+Callers that know a batch of ids up front (bulk endpoints) call
+`prefetch()` to load them with one `in_bulk` query per related model.
+
+The hit/miss/query counters are logged per request by
+backend_django.utils.request_timer.RequestTimingMiddleware.
+"""
+from django.core.exceptions import ValidationError
+
+
+class ForeignKeyResolver:
+    def __init__(self):
+        self._cache = {}
+        # lookups answered from the cache / that needed a query, and the
+        # number of queries run
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+
+    @staticmethod
+    def to_pk(model, value):
+        """Return `value` converted to `model`'s pk type, or None if invalid."""
+        if value in (None, '') or isinstance(value, bool):
+            return None
+        try:
+            return model._meta.pk.to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            return None
+
+    def prefetch(self, model, values):
+        cache = self._cache.setdefault(model, {})
+        wanted = {pk for pk in (self.to_pk(model, v) for v in values) if pk is not None and pk not in cache}
+        if wanted:
+            found = model._default_manager.in_bulk(wanted)
+            self.queries += 1
+            for pk in wanted:
+                cache[pk] = found.get(pk)
+
+    def get(self, model, value):
+        """Return the `model` row with pk `value`, or None if there is none."""
+        pk = self.to_pk(model, value)
+        if pk is None:
+            return None
+        cache = self._cache.setdefault(model, {})
+        if pk in cache:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.prefetch(model, [pk])
+        return cache[pk]
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'queries': self.queries}
+
+
+def resolver_for(request):
+    """Return the ForeignKeyResolver of `request`, creating it on first use.
+
+    Accepts a DRF Request or a Django HttpRequest; the resolver is stored on
+    the underlying HttpRequest so middleware can read it.
+    """
+    request = getattr(request, '_request', request)
+    resolver = getattr(request, 'fk_resolver', None)
+    if resolver is None:
+        resolver = request.fk_resolver = ForeignKeyResolver()
+    return resolver
+
+
+def context_resolver(context):
+    """Return the resolver for a serializer context, or None outside a request."""
+    resolver = context.get('fk_resolver')
+    if resolver is None and context.get('request') is not None:
+        resolver = resolver_for(context['request'])
+    return resolver
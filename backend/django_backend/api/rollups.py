@@ -0,0 +1,168 @@
+"""The monthly disposal rollup behind the sales report.
+
+DisposalMonthlyRollup holds total, count, min and max of `disposal_value`
+per (year, month) of `disposal_date`. Disposal writes fold into it through
+api/signals.py in the writer's transaction:
+
+- total and count change by the delta, with one UPDATE ... SET total =
+  total + %s per month, so concurrent writers never overwrite each other;
+- an added value lowers min / raises max in the same UPDATE;
+- only when a removed (deleted or changed) value was the month's min or
+  max is that month's min/max read again from Disposal, an index range
+  over `disposal_date`.
+
+Writes that bypass the signals (raw SQL, snapshot loads) must be followed
+by `rebuild_disposal_rollup()` (the `rebuild_disposal_rollup` command).
+"""
+import datetime
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear, Greatest, Least
+
+from .caching import bump_table_versions
+from .models import Disposal, DisposalMonthlyRollup
+
+
+def month_range(year, month):
+    """Return the [start, end) dates of a month."""
+    start = datetime.date(year, month, 1)
+    end = datetime.date(year + 1, 1, 1) if month == 12 else datetime.date(year, month + 1, 1)
+    return start, end
+
+
+def contributions(disposals):
+    """Return the ((year, month), value) each disposal adds to the rollup."""
+    return [
+        ((d.disposal_date.year, d.disposal_date.month), d.disposal_value)
+        for d in disposals if d.disposal_date is not None and d.disposal_value is not None
+    ]
+
+
+def previous_contributions(previous):
+    """contributions() of PREVIOUS_FIELDS snapshots ({pk: {field: value}})."""
+    return [
+        ((p['disposal_date'].year, p['disposal_date'].month), p['disposal_value'])
+        for p in previous.values() if p and p.get('disposal_date') is not None and p.get('disposal_value') is not None
+    ]
+
+
+def apply_changes(added=(), removed=()):
+    """Fold added and removed ((year, month), value) pairs into the rollup."""
+    added, removed = Counter(added), Counter(removed)
+    # An update that kept its month and value changes nothing
+    common = added & removed
+    added, removed = added - common, removed - common
+    if not added and not removed:
+        return
+
+    deltas = {}
+    for sign, pairs in ((1, added), (-1, removed)):
+        for (key, value), times in pairs.items():
+            delta = deltas.setdefault(key, {'total': Decimal(0), 'count': 0, 'added': [], 'removed': []})
+            delta['total'] += sign * times * Decimal(value)
+            delta['count'] += sign * times
+            delta['added' if sign > 0 else 'removed'].append(value)
+
+    with transaction.atomic():
+        DisposalMonthlyRollup.objects.bulk_create(
+            [DisposalMonthlyRollup(year=year, month=month) for year, month in deltas], ignore_conflicts=True,
+        )
+        # In key order, so concurrent writers lock the rows in the same order
+        for (year, month), delta in sorted(deltas.items()):
+            updates = {
+                'total': F('total') + Value(delta['total']),
+                'disposal_count': F('disposal_count') + delta['count'],
+            }
+            if delta['added']:
+                low, high = Value(min(delta['added'])), Value(max(delta['added']))
+                updates['min_value'] = Least(Coalesce('min_value', low), low)
+                updates['max_value'] = Greatest(Coalesce('max_value', high), high)
+            DisposalMonthlyRollup.objects.filter(year=year, month=month).update(**updates)
+
+        shrunk = {key: delta['removed'] for key, delta in deltas.items() if delta['removed']}
+        if shrunk:
+            _recheck_bounds(shrunk)
+
+
+def _recheck_bounds(removed):
+    """Drop emptied months, and re-read min/max where a removed value was one."""
+    for (year, month), values in sorted(removed.items()):
+        row = DisposalMonthlyRollup.objects.filter(year=year, month=month).first()
+        if row is None:
+            continue
+        if row.disposal_count <= 0:
+            row.delete()
+            continue
+        if any(row.min_value is None or value <= row.min_value or value >= row.max_value for value in values):
+            start, end = month_range(year, month)
+            bounds = Disposal.objects.filter(
+                disposal_date__gte=start, disposal_date__lt=end, disposal_value__isnull=False,
+            ).aggregate(low=Min('disposal_value'), high=Max('disposal_value'))
+            DisposalMonthlyRollup.objects.filter(pk=row.pk).update(min_value=bounds['low'], max_value=bounds['high'])
+
+
+def computed_rollup():
+    """Return {(year, month): (total, count, min, max)} aggregated from Disposal."""
+    rows = (
+        Disposal.objects.filter(disposal_date__isnull=False, disposal_value__isnull=False)
+        .annotate(year=ExtractYear('disposal_date'), month=ExtractMonth('disposal_date'))
+        .values('year', 'month')
+        .annotate(total=Sum('disposal_value'), count=Count('disposal_id'), low=Min('disposal_value'), high=Max('disposal_value'))
+        .order_by()
+    )
+    return {(r['year'], r['month']): (r['total'], r['count'], r['low'], r['high']) for r in rows}
+
+
+def stored_rollup():
+    rows = DisposalMonthlyRollup.objects.values_list('year', 'month', 'total', 'disposal_count', 'min_value', 'max_value')
+    return {(year, month): (total, count, low, high) for year, month, total, count, low, high in rows}
+
+
+def rebuild_disposal_rollup():
+    """Correct the rollup to one aggregated from Disposal; returns the month count.
+
+    The rollup rows are locked before Disposal is aggregated, in the same
+    transaction, so a writer the aggregate did not see waits on its month's
+    row and applies its delta to the corrected value afterwards, as with
+    reconcile_kpis(). A month first written during the rebuild keeps that
+    writer's row.
+    """
+    fields = ['total', 'disposal_count', 'min_value', 'max_value']
+    with transaction.atomic():
+        # In key order, as apply_changes() locks them
+        stored = {
+            (row.year, row.month): row
+            for row in DisposalMonthlyRollup.objects.select_for_update().order_by('year', 'month')
+        }
+        computed = computed_rollup()
+        emptied = [row.pk for key, row in stored.items() if key not in computed]
+        if emptied:
+            DisposalMonthlyRollup.objects.filter(pk__in=emptied).delete()
+        changed, missing = [], []
+        for (year, month), values in sorted(computed.items()):
+            row = stored.get((year, month))
+            if row is None:
+                missing.append(DisposalMonthlyRollup(year=year, month=month, **dict(zip(fields, values))))
+            elif tuple(getattr(row, field) for field in fields) != values:
+                for field, value in zip(fields, values):
+                    setattr(row, field, value)
+                changed.append(row)
+        DisposalMonthlyRollup.objects.bulk_update(changed, fields, batch_size=1000)
+        DisposalMonthlyRollup.objects.bulk_create(missing, batch_size=1000, ignore_conflicts=True)
+        # The sales report is cached on Disposal's version token
+        bump_table_versions(Disposal)
+    return len(computed)
+
+
+def period_totals():
+    """Return ({year: total}, {(year, quarter): total}) from the rollup."""
+    yearly, quarterly = {}, {}
+    rows = DisposalMonthlyRollup.objects.filter(disposal_count__gt=0).order_by('year', 'month').values_list('year', 'month', 'total')
+    for year, month, total in rows:
+        quarter = (month - 1) // 3 + 1
+        yearly[year] = yearly.get(year, 0) + total
+        quarterly[year, quarter] = quarterly.get((year, quarter), 0) + total
+    return yearly, quarterly
@@ -0,0 +1,155 @@
+"""Global search behind `/api/search/?q=`.
+
+Each SearchSource is one result type. A query matches a row through
+either kind of field:
+
+- `keys`, identifiers such as serial numbers and emails, match when they
+  start with the whole query. This is a LIKE 'q%' range scan on the
+  column's B-tree index;
+- `text`, names, match when every word of the query starts a word of one
+  of the fields. On MySQL this is MATCH ... AGAINST ('+word* ...' IN
+  BOOLEAN MODE) on the table's FULLTEXT index (migration 0012; the
+  columns must be exactly the index's), ranked by its relevance. InnoDB
+  does not index words shorter than innodb_ft_min_token_size, so shorter
+  words are left out of it. A query with no longer word, and any query on
+  other databases, matches only fields that start with the whole query,
+  LIKE 'q%' on the fields' B-tree indexes (migration 0014): finding a word
+  inside a field would take LIKE '% q%', a scan of the whole table.
+
+Every source runs at most two queries, each with a LIMIT. Identifier
+matches rank above name matches, exact ones first. No index has to be
+kept in sync by hand: InnoDB updates the FULLTEXT indexes with each write.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+
+from .models import Asset, Buyer, Category, Supplier, User
+
+
+SEARCH_MIN_LENGTH = getattr(settings, 'SEARCH_MIN_LENGTH', 2)
+SEARCH_DEFAULT_LIMIT = getattr(settings, 'SEARCH_DEFAULT_LIMIT', 10)
+SEARCH_MAX_LIMIT = getattr(settings, 'SEARCH_MAX_LIMIT', 50)
+# innodb_ft_min_token_size of the server (MySQL's default is 3)
+FULLTEXT_MIN_WORD = getattr(settings, 'SEARCH_FULLTEXT_MIN_WORD', 3)
+
+# Scores of identifier matches; FULLTEXT relevance and the prefix
+# fallback's 2-3 stay below them
+EXACT_KEY_SCORE = 1000.0
+KEY_PREFIX_SCORE = 500.0
+
+WORD_RE = re.compile(r'\w+')
+
+
+class SearchSource:
+    def __init__(self, type, model, route, label, text=(), keys=(), detail=()):
+        self.type = type
+        self.model = model
+        # URL name of the row's detail route
+        self.route = route
+        self.label = label
+        self.text = text
+        self.keys = keys
+        # Columns shown under the label
+        self.detail = detail
+
+    def columns(self):
+        return list(dict.fromkeys(['pk', self.label, *self.keys, *self.detail]))
+
+
+SOURCES = {
+    source.type: source for source in (
+        SearchSource(
+            'asset', Asset, 'asset-detail', 'asset_name',
+            text=('asset_name', 'current_holder_name'), keys=('serial_number',),
+            detail=('serial_number', 'current_holder_name'),
+        ),
+        SearchSource(
+            'user', User, 'user-detail', 'name',
+            text=('name',), keys=('email', 'nin'), detail=('email', 'department'),
+        ),
+        SearchSource('supplier', Supplier, 'supplier-detail', 'name', text=('name',), detail=('email',)),
+        SearchSource('buyer', Buyer, 'buyer-detail', 'name', text=('name',), keys=('tin',), detail=('tin',)),
+        SearchSource('category', Category, 'category-detail', 'category_name', text=('category_name',)),
+    )
+}
+
+
+def _any(fields, lookup, value):
+    match = Q()
+    for field in fields:
+        match |= Q(**{f'{field}__{lookup}': value})
+    return match
+
+
+def _key_matches(source, query, limit):
+    if not source.keys:
+        return []
+    score = Case(
+        When(_any(source.keys, 'iexact', query), then=Value(EXACT_KEY_SCORE)),
+        default=Value(KEY_PREFIX_SCORE), output_field=FloatField(),
+    )
+    return list(
+        source.model._default_manager.filter(_any(source.keys, 'istartswith', query))
+        .annotate(search_score=score).values(*source.columns(), 'search_score')
+        .order_by('-search_score', 'pk')[:limit]
+    )
+
+
+def _fulltext_score(source, words):
+    columns = ', '.join(connection.ops.quote_name(field) for field in source.text)
+    boolean_query = ' '.join(f'+{word}*' for word in words)
+    return RawSQL(f'MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)', [boolean_query], output_field=FloatField())
+
+
+def _text_matches(source, query, words, limit):
+    if not source.text or not words:
+        return []
+    qs = source.model._default_manager.all()
+    indexed = [word for word in words if len(word) >= FULLTEXT_MIN_WORD]
+    if connection.vendor == 'mysql' and indexed:
+        qs = qs.annotate(search_score=_fulltext_score(source, indexed)).filter(search_score__gt=0)
+    else:
+        qs = qs.filter(_any(source.text, 'istartswith', query)).annotate(search_score=Case(
+            When(_any(source.text, 'iexact', query), then=Value(3.0)),
+            default=Value(2.0), output_field=FloatField(),
+        ))
+    return list(qs.values(*source.columns(), 'search_score').order_by('-search_score', 'pk')[:limit])
+
+
+def _result(source, row):
+    detail = [str(row[field]) for field in source.detail if row.get(field) not in (None, '')]
+    return {
+        'type': source.type,
+        'id': row['pk'],
+        'label': row[source.label],
+        'detail': ' · '.join(dict.fromkeys(detail)),
+        'url': reverse(source.route, args=[row['pk']]),
+        'score': round(row['search_score'], 3),
+    }
+
+
+def search(query, types=None, limit=SEARCH_DEFAULT_LIMIT):
+    """Return up to `limit` results for `query`, best first, each
+    {"type", "id", "label", "detail", "url", "score"}.
+
+    `types` restricts the search to those SOURCES keys.
+    """
+    query = query.strip()
+    if len(query) < SEARCH_MIN_LENGTH:
+        return []
+    words = [word.lower() for word in WORD_RE.findall(query)]
+    best = {}
+    for source in SOURCES.values():
+        if types and source.type not in types:
+            continue
+        for row in _key_matches(source, query, limit) + _text_matches(source, query, words, limit):
+            key = (source.type, row['pk'])
+            if key not in best or row['search_score'] > best[key][1]['search_score']:
+                best[key] = (source, row)
+    ranked = sorted(best.values(), key=lambda match: (-match[1]['search_score'], str(match[1][match[0].label]).lower()))
+    return [_result(source, row) for source, row in ranked[:limit]]
@@ -1,17 +1,81 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import (
     Asset, User, Category, Supplier, Location, Buyer, Disposal,
     MaintenanceStaff, Maintenance, Assignment, AssetValuation
 )
+from .resolvers import context_resolver
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class ResolvedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField that looks ids up through the request's
+    ForeignKeyResolver (see api/resolvers.py), so every referenced row is
+    fetched once per request instead of once per lookup."""
+
+    def to_internal_value(self, data):
+        resolver = context_resolver(self.context)
+        if resolver is None or self.pk_field is not None:
+            return super().to_internal_value(data)
+        model = self.get_queryset().model
+        if resolver.to_pk(model, data) is None:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = resolver.get(model, data)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+def split_field_names(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """Serialize only the fields named in `?fields=a,b`, or all but `?omit=c,d`.
+
+    Applies to read requests only, so write responses stay complete. The
+    viewsets pair this with SparseQuerysetMixin, which loads only the
+    matching columns from the database.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        params = getattr(request, 'query_params', request.GET)
+        wanted = split_field_names(params.get('fields'))
+        omitted = split_field_names(params.get('omit'))
+        for name in list(self.fields):
+            if (wanted and name not in wanted) or name in omitted:
+                self.fields.pop(name)
+
+
+class ApiModelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Base serializer for the API models."""
+    serializer_related_field = ResolvedPrimaryKeyRelatedField
+
+    def prepare_write_data(self, validated_data):
+        """Turn validated data into model attribute values.
+
+        Used by create()/update() and by the bulk endpoints, which build
+        model instances without calling create().
+        """
+        return validated_data
+
+    def create(self, validated_data):
+        return super().create(self.prepare_write_data(validated_data))
+
+    def update(self, instance, validated_data):
+        return super().update(instance, self.prepare_write_data(validated_data))
+
+
+class CategorySerializer(ApiModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(ApiModelSerializer):
     role = serializers.ChoiceField(choices=[('admin','Admin'),('staff','Staff')], required=False, default='staff')
 
     class Meta:
@@ -20,135 +84,117 @@ class UserSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class AssetSerializer(serializers.ModelSerializer):
+class AssetSerializer(ApiModelSerializer):
     # Use PrimaryKeyRelatedField for proper FK validation at the serializer
     # layer. The frontend sends `category_id`; we expose a write-only
     # `category_id` field that maps to the `category` relation. This will
     # produce validation errors when an invalid category id is supplied.
-    category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), required=False, allow_null=True)
+    # All three lookups (category, validate_category_id, prepare_write_data)
+    # go through the request's resolver, so the Category row is read once.
+    category = ResolvedPrimaryKeyRelatedField(queryset=Category.objects.all(), required=False, allow_null=True)
     category_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
 
     def to_internal_value(self, data):
         # Allow incoming `category_id` to be treated as `category` for
         # PrimaryKeyRelatedField validation.
-        if 'category_id' in data and 'category' not in data:
-            data = data.copy()
-            data['category'] = data.get('category_id')
-        return super().to_internal_value(data)
-
-    def validate(self, attrs):
-        # Provide a clear validation error when frontend sends a category_id
-        # that does not exist. `category` will be present if `category_id`
-        # was supplied in the input and mapped by to_internal_value.
-        from django.core.exceptions import ObjectDoesNotExist
-        category_val = None
-        # attrs may include the resolved category object (if valid) or the
-        # raw id in case validation hasn't run; check initial_data for clarity.
-        if hasattr(self, 'initial_data') and isinstance(self.initial_data, dict):
-            category_val = self.initial_data.get('category_id', None)
-        if category_val is not None:
-            if category_val == '' or category_val is None:
-                return attrs
-            # If provided and not null, ensure object exists
-            from .models import Category
-            if not Category.objects.filter(pk=category_val).exists():
-                raise serializers.ValidationError({'category_id': [f'Invalid pk "{category_val}" - object does not exist.']})
-        return attrs
-
-    def create(self, validated_data):
-        # Pop any write-only category_id and resolve to category instance
-        category_id = validated_data.pop('category_id', None)
-        if category_id is not None and category_id != '':
-            from .models import Category
-            try:
-                validated_data['category'] = Category.objects.get(pk=category_id)
-            except Category.DoesNotExist:
-                raise serializers.ValidationError({'category_id': [f'Invalid pk "{category_id}" - object does not exist.']})
-
-        return super().create(validated_data)
-
-    def update(self, instance, validated_data):
-        # Handle category_id for updates similarly
-        category_id = validated_data.pop('category_id', None)
-        if category_id is not None:
-            from .models import Category
-            if category_id == '' or category_id is None:
-                validated_data['category'] = None
-            else:
-                try:
-                    validated_data['category'] = Category.objects.get(pk=category_id)
-                except Category.DoesNotExist:
-                    raise serializers.ValidationError({'category_id': [f'Invalid pk "{category_id}" - object does not exist.']})
-
-        return super().update(instance, validated_data)
+        if 'category_id' not in data or 'category' in data:
+            return super().to_internal_value(data)
+        data = data.copy()
+        data['category'] = data.get('category_id')
+        try:
+            return super().to_internal_value(data)
+        except serializers.ValidationError as exc:
+            # Report an invalid id only under `category_id`, the key the
+            # client sent, not once more under the copied `category`
+            errors = dict(exc.detail)
+            category_errors = errors.pop('category', None)
+            if category_errors and 'category_id' not in errors:
+                errors['category_id'] = category_errors
+            raise serializers.ValidationError(errors)
+
+    def _get_category(self, pk):
+        resolver = context_resolver(self.context)
+        if resolver is not None:
+            return resolver.get(Category, pk)
+        return Category.objects.filter(pk=pk).first()
+
+    def prepare_write_data(self, validated_data):
+        # Pop the write-only category_id and resolve it to the category
+        # instance. An explicit null clears the category.
+        if 'category_id' not in validated_data:
+            return validated_data
+        category_id = validated_data.pop('category_id')
+        if category_id is None or category_id == '':
+            validated_data['category'] = None
+            return validated_data
+        category = self._get_category(category_id)
+        if category is None:
+            raise serializers.ValidationError({'category_id': [f'Invalid pk "{category_id}" - object does not exist.']})
+        validated_data['category'] = category
+        return validated_data
 
     def validate_category_id(self, value):
         # Field-level validator called before create/update; ensures the
         # provided category id exists.
         if value is None or value == '':
             return value
-        from .models import Category
-        if not Category.objects.filter(pk=value).exists():
+        if self._get_category(value) is None:
             raise serializers.ValidationError([f'Invalid pk "{value}" - object does not exist.'])
         return value
 
     class Meta:
         model = Asset
-        # Expose annotated read-only fields for the frontend to display
         fields = '__all__'
-        read_only_fields = ('current_holder_name', 'current_assignment_status', 'current_assignment_date')
+        # Denormalized from the latest Assignment; maintained server-side
+        read_only_fields = Asset.CURRENT_HOLDER_FIELDS
 
-    # Read-only serializer fields mapped to annotated queryset attributes
-    current_holder_name = serializers.CharField(read_only=True)
-    current_assignment_status = serializers.CharField(read_only=True, allow_null=True)
-    current_assignment_date = serializers.DateField(read_only=True, allow_null=True)
     # Expose the related category name to make frontend rendering simpler
     category_name = serializers.CharField(source='category.category_name', read_only=True)
 
 
-class SupplierSerializer(serializers.ModelSerializer):
+class SupplierSerializer(ApiModelSerializer):
     class Meta:
         model = Supplier
         fields = '__all__'
 
 
-class LocationSerializer(serializers.ModelSerializer):
+class LocationSerializer(ApiModelSerializer):
     class Meta:
         model = Location
         fields = '__all__'
 
 
-class BuyerSerializer(serializers.ModelSerializer):
+class BuyerSerializer(ApiModelSerializer):
     class Meta:
         model = Buyer
         fields = '__all__'
 
 
-class DisposalSerializer(serializers.ModelSerializer):
+class DisposalSerializer(ApiModelSerializer):
     class Meta:
         model = Disposal
         fields = '__all__'
 
 
-class MaintenanceStaffSerializer(serializers.ModelSerializer):
+class MaintenanceStaffSerializer(ApiModelSerializer):
     class Meta:
         model = MaintenanceStaff
         fields = '__all__'
 
 
-class MaintenanceSerializer(serializers.ModelSerializer):
+class MaintenanceSerializer(ApiModelSerializer):
     class Meta:
         model = Maintenance
         fields = '__all__'
 
 
-class AssignmentSerializer(serializers.ModelSerializer):
+class AssignmentSerializer(ApiModelSerializer):
     class Meta:
         model = Assignment
         fields = '__all__'
 
 
-class AssetValuationSerializer(serializers.ModelSerializer):
+class AssetValuationSerializer(ApiModelSerializer):
     class Meta:
         model = AssetValuation
         fields = '__all__'
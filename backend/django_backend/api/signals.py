@@ -0,0 +1,128 @@
+"""Side effects of writes to the tracked models.
+
+`rows_saved` and `rows_deleted` hold everything that has to happen when
+rows change (change log + version bump, denormalized columns, ...). The
+ORM signal receivers below call them for single-row saves and deletes;
+bulk write paths that bypass signals (bulk_create/bulk_update) call them
+directly with the affected instances.
+"""
+import contextlib
+import threading
+
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .changes import TRACKED_MODELS, record_changes
+from .holders import refresh_current_holders
+from .kpis import CONTRIBUTIONS as KPI_CONTRIBUTIONS, apply_deltas, deleted_deltas, saved_deltas
+from .models import Asset, Assignment, ChangeLog, Disposal, Maintenance, User
+from .rollups import apply_changes, contributions, previous_contributions
+
+
+_state = threading.local()
+
+# Columns whose value before an update the side effects need, per model.
+PREVIOUS_FIELDS = {
+    Asset: ('status', 'purchase_cost'),
+    Assignment: ('asset_id', 'return_date', 'status'),
+    Disposal: ('disposal_date', 'disposal_value'),
+    Maintenance: ('cost',),
+    User: ('status',),
+}
+
+
+def snapshot(model, instances):
+    """Return {pk: {field: value}} of PREVIOUS_FIELDS for saved instances."""
+    fields = PREVIOUS_FIELDS.get(model)
+    if not fields:
+        return {}
+    return {i.pk: {f: getattr(i, f) for f in fields} for i in instances if i.pk is not None}
+
+
+def rows_saved(model, instances, created=False, previous=None):
+    """Apply the side effects of creating/updating `instances` of `model`.
+
+    `previous` maps pk -> PREVIOUS_FIELDS values before an update.
+    """
+    previous = previous or {}
+    record_changes(model, [i.pk for i in instances], ChangeLog.UPSERT)
+    if model is Assignment:
+        asset_ids = {i.asset_id for i in instances}
+        asset_ids.update(p['asset_id'] for p in previous.values())
+        refresh_current_holders(asset_ids)
+    elif model is User and not created:
+        rename_holders(instances)
+    elif model is Disposal:
+        apply_changes(added=contributions(instances), removed=previous_contributions(previous))
+    if model in KPI_CONTRIBUTIONS:
+        apply_deltas(saved_deltas(model, instances, created, previous))
+
+
+def rows_deleted(model, instances):
+    record_changes(model, [i.pk for i in instances], ChangeLog.DELETE)
+    if model is Assignment:
+        refresh_current_holders({i.asset_id for i in instances})
+    elif model is Disposal:
+        apply_changes(removed=contributions(instances))
+    if model in KPI_CONTRIBUTIONS:
+        apply_deltas(deleted_deltas(model, instances))
+
+
+def rename_holders(users):
+    names = {user.pk: user.name for user in users}
+    if not names:
+        return
+    stale = {}
+    rows = Asset.objects.filter(current_holder_id__in=names).values_list('asset_id', 'current_holder_id', 'current_holder_name')
+    for asset_id, holder_id, holder_name in rows:
+        if holder_name != names[holder_id]:
+            stale.setdefault(holder_id, []).append(asset_id)
+    for holder_id, asset_ids in stale.items():
+        Asset.objects.filter(asset_id__in=asset_ids).update(current_holder_name=names[holder_id])
+    if stale:
+        record_changes(Asset, [asset_id for asset_ids in stale.values() for asset_id in asset_ids])
+
+
+@contextlib.contextmanager
+def muted():
+    """Skip the per-row receivers in this thread; the caller applies the
+    side effects for the whole batch with rows_saved() afterwards."""
+    previous, _state.muted = getattr(_state, 'muted', False), True
+    try:
+        yield
+    finally:
+        _state.muted = previous
+
+
+def _is_muted():
+    return getattr(_state, 'muted', False)
+
+
+def remember_previous(sender, instance, **kwargs):
+    instance._previous = None
+    if _is_muted():
+        return
+    fields = PREVIOUS_FIELDS.get(sender)
+    if fields and instance.pk is not None:
+        instance._previous = sender._base_manager.filter(pk=instance.pk).values(*fields).first()
+
+
+def row_saved(sender, instance, created, **kwargs):
+    if _is_muted():
+        return
+    previous = getattr(instance, '_previous', None)
+    rows_saved(sender, [instance], created=created, previous={instance.pk: previous} if previous else None)
+
+
+def row_deleted(sender, instance, **kwargs):
+    if _is_muted():
+        return
+    rows_deleted(sender, [instance])
+
+
+# Connected per model rather than for every sender so models without
+# listeners (e.g. ChangeLog itself) keep Django's fast-delete path.
+for model in TRACKED_MODELS:
+    uid = model._meta.model_name
+    pre_save.connect(remember_previous, sender=model, dispatch_uid=f'remember_previous_{uid}')
+    post_save.connect(row_saved, sender=model, dispatch_uid=f'row_saved_{uid}')
+    post_delete.connect(row_deleted, sender=model, dispatch_uid=f'row_deleted_{uid}')
@@ -0,0 +1,437 @@
+"""Snapshot export and import of the API tables (see the export_snapshot
+and load_snapshot commands).
+
+A snapshot is a directory:
+
+    manifest.json              written last: tables, columns, row counts,
+                               chunk files and their checksums
+    <table>/00000.ndjson.gz    one JSON object per row, primary-key order
+    <table>/chunks.jsonl       progress log: one line per finished chunk,
+                               then a final `{"done": true}` line
+
+Tables are exported by worker processes, each reading its tables in
+PK-keyed chunks. On MySQL every worker opens
+`START TRANSACTION WITH CONSISTENT SNAPSHOT` while the coordinator holds
+`FLUSH TABLES WITH READ LOCK`, so all workers read the same point in time
+and writes are blocked only until the last worker has started. A chunk is
+logged in chunks.jsonl only after its file is complete, so a failed export
+can be resumed from the last logged chunk.
+
+Loading reads the chunks table by table in SNAPSHOT_MODELS order, checks
+each chunk's checksum and writes it with one multi-row INSERT per batch
+(an upsert by primary key unless told otherwise), with foreign-key checks
+off until every table is in.
+"""
+import contextlib
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, IntegrityError, connection, models as db_models, transaction
+from django.utils import timezone
+
+from .changes import record_changes
+from .exports import table_chunks
+from .models import (
+    Asset, AssetValuation, Assignment, Buyer, Category, ChangeLog, Disposal,
+    Location, Maintenance, MaintenanceStaff, Supplier, User,
+)
+from .workers import spawn_worker
+
+
+# Parents before children, so loading in this order satisfies foreign keys
+SNAPSHOT_MODELS = (
+    Category, User, Supplier, Location, Buyer, MaintenanceStaff,
+    Asset, Maintenance, Assignment, AssetValuation, Disposal,
+)
+SNAPSHOT_FORMAT = 1
+MANIFEST = 'manifest.json'
+PROGRESS = 'chunks.jsonl'
+
+# Seconds to wait for every worker to open its snapshot
+WORKER_START_TIMEOUT = 60
+
+
+def table_name(model):
+    return model._meta.model_name
+
+
+def snapshot_models(names=None):
+    """Return SNAPSHOT_MODELS, restricted to `names` (model names) if given."""
+    if not names:
+        return list(SNAPSHOT_MODELS)
+    by_name = {table_name(m): m for m in SNAPSHOT_MODELS}
+    unknown = set(names) - set(by_name)
+    if unknown:
+        raise ValueError(f"Unknown tables: {', '.join(sorted(unknown))}")
+    return [m for m in SNAPSHOT_MODELS if table_name(m) in names]
+
+
+def snapshot_columns(model):
+    """Columns stored in a snapshot: every concrete column except generated
+    ones, which the database recomputes on load. The pk comes first."""
+    pk = model._meta.pk
+    return [pk.attname] + [
+        f.attname for f in model._meta.concrete_fields
+        if f is not pk and not f.generated
+    ]
+
+
+def read_progress(directory, model):
+    """Return (finished chunk records, done?) from a table's progress log."""
+    path = os.path.join(directory, table_name(model), PROGRESS)
+    chunks, done = [], False
+    if not os.path.exists(path):
+        return chunks, done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Torn last line from a crash: everything before it is valid
+                break
+            if record.get('done'):
+                done = True
+            elif os.path.exists(os.path.join(directory, table_name(model), record['file'])):
+                chunks.append(record)
+            else:
+                break
+    return chunks, done
+
+
+def _log_progress(path, record):
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def export_table(model, directory, chunk_size, compress_level=6):
+    """Export `model` into `directory`/<table>/, continuing after the last
+    finished chunk. Returns the table's manifest entry."""
+    table_dir = os.path.join(directory, table_name(model))
+    os.makedirs(table_dir, exist_ok=True)
+    progress = os.path.join(table_dir, PROGRESS)
+    chunks, done = read_progress(directory, model)
+    if not done:
+        # Rewrite the log without anything after the last usable record
+        with open(progress, 'w') as f:
+            f.writelines(json.dumps(c) + '\n' for c in chunks)
+
+        columns = snapshot_columns(model)
+        encoder = DjangoJSONEncoder(separators=(',', ':'))
+        after = chunks[-1]['last_pk'] if chunks else None
+        for rows in table_chunks(model._default_manager.all(), columns, chunk_size, after=after):
+            name = f'{len(chunks):05d}.ndjson.gz'
+            path = os.path.join(table_dir, name)
+            digest = hashlib.sha256()
+            with gzip.open(f'{path}.part', 'wt', encoding='utf-8', compresslevel=compress_level) as f:
+                for row in rows:
+                    line = encoder.encode(dict(zip(columns, row))) + '\n'
+                    digest.update(line.encode('utf-8'))
+                    f.write(line)
+            os.replace(f'{path}.part', path)
+            record = {
+                'file': name, 'rows': len(rows), 'first_pk': rows[0][0], 'last_pk': rows[-1][0],
+                'sha256': digest.hexdigest(),
+            }
+            _log_progress(progress, record)
+            chunks.append(record)
+        _log_progress(progress, {'done': True})
+
+    return {
+        'model': model._meta.label,
+        'columns': snapshot_columns(model),
+        'rows': sum(c['rows'] for c in chunks),
+        'chunks': chunks,
+    }
+
+
+@contextlib.contextmanager
+def snapshot_transaction():
+    """Run the enclosed reads in one read-only snapshot transaction.
+
+    Inside another transaction (where START TRANSACTION would commit it)
+    the reads just share that transaction's view.
+    """
+    if connection.vendor != 'mysql' or connection.in_atomic_block:
+        with transaction.atomic():
+            yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+    try:
+        with transaction.atomic():
+            # Takes the snapshot now rather than at the first read
+            with connection.cursor() as cursor:
+                cursor.execute('START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY')
+            yield
+    finally:
+        # Web requests reuse the connection; give it back its own level
+        if connection.isolation_level and connection.connection is not None:
+            with connection.cursor() as cursor:
+                cursor.execute(f'SET SESSION TRANSACTION ISOLATION LEVEL {connection.isolation_level.upper()}')
+
+
+def export_worker(directory, chunk_size, compress_level, tasks, events):
+    """Worker process: export the tables named on `tasks` until None."""
+    label = None
+    try:
+        with snapshot_transaction():
+            events.put(('ready', os.getpid(), None))
+            while True:
+                label = tasks.get()
+                if label is None:
+                    break
+                model = next(m for m in SNAPSHOT_MODELS if table_name(m) == label)
+                entry = export_table(model, directory, chunk_size, compress_level)
+                events.put(('table', label, entry))
+                label = None
+    except Exception:
+        events.put(('error', label, traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def export_snapshot(directory, models, workers=1, chunk_size=5000, compress_level=6, log=print):
+    """Export `models` into `directory` and write its manifest.
+
+    Already finished tables/chunks in `directory` are kept (resume).
+    Returns the manifest. Raises SnapshotError if a worker failed; the
+    chunks written so far stay and a rerun resumes after them.
+    """
+    os.makedirs(directory, exist_ok=True)
+    progress = {table_name(m): read_progress(directory, m) for m in models}
+    pending = [m for m in models if not progress[table_name(m)][1]]
+    resumed = any(chunks for chunks, _ in progress.values())
+    workers = max(1, min(workers, len(pending) or 1))
+
+    # One transaction per worker; all of them only share a point in time on
+    # MySQL, where the global read lock lets them open their snapshots
+    # before any further write commits.
+    locked = False
+    if workers > 1 and connection.vendor == 'mysql':
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('FLUSH TABLES WITH READ LOCK')
+            locked = True
+        except DatabaseError as e:
+            log(f'FLUSH TABLES WITH READ LOCK failed ({e}); exporting with one worker to keep one snapshot.')
+            workers = 1
+    consistent = workers == 1 or locked
+    if not consistent:
+        log(f'{connection.vendor} cannot share a snapshot between workers; tables are each consistent but not with each other.')
+
+    started = timezone.now()
+    entries = {}
+    ctx = multiprocessing.get_context('spawn')
+    tasks, events = ctx.Queue(), ctx.Queue()
+    for model in pending:
+        tasks.put(table_name(model))
+    for _ in range(workers):
+        tasks.put(None)
+    procs = [
+        spawn_worker(ctx, 'api.snapshots.export_worker', directory, chunk_size, compress_level, tasks, events)
+        for _ in range(workers)
+    ]
+    try:
+        for proc in procs:
+            proc.start()
+        ready = 0
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while len(entries) < len(pending):
+            try:
+                kind, label, payload = events.get(timeout=1)
+            except queue.Empty:
+                if ready < workers and time.monotonic() > deadline:
+                    raise SnapshotError('Workers did not start in time')
+                if not any(p.is_alive() for p in procs):
+                    raise SnapshotError('All workers exited before the export finished')
+                continue
+            if kind == 'ready':
+                ready += 1
+                if ready == workers and locked:
+                    with connection.cursor() as cursor:
+                        cursor.execute('UNLOCK TABLES')
+                    locked = False
+            elif kind == 'table':
+                entries[label] = payload
+                log(f"{label}: {payload['rows']} rows in {len(payload['chunks'])} chunks")
+            elif kind == 'error':
+                raise SnapshotError(f'Exporting {label or "(startup)"} failed:\n{payload}')
+        for proc in procs:
+            proc.join(timeout=10)
+    finally:
+        if locked:
+            with connection.cursor() as cursor:
+                cursor.execute('UNLOCK TABLES')
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+
+    for model in models:
+        if table_name(model) not in entries:
+            # Finished in an earlier run
+            chunks, _ = progress[table_name(model)]
+            entries[table_name(model)] = {
+                'model': model._meta.label, 'columns': snapshot_columns(model),
+                'rows': sum(c['rows'] for c in chunks), 'chunks': chunks,
+            }
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'created_at': started.isoformat(),
+        'vendor': connection.vendor,
+        # False when tables were read in separate snapshots (resumed export,
+        # or several workers without MySQL's global read lock)
+        'consistent': consistent and not resumed,
+        'resumed': resumed,
+        'tables': {table_name(m): entries[table_name(m)] for m in models},
+    }
+    tmp = os.path.join(directory, f'{MANIFEST}.part')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, cls=DjangoJSONEncoder)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+    return manifest
+
+
+def reset_sequences(models):
+    """Move the PK sequences of `models` past their highest pk after rows
+    were inserted with explicit keys. A no-op on MySQL, where
+    AUTO_INCREMENT follows explicit inserts by itself."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def read_manifest(directory):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        raise SnapshotError(f'{path} not found; is the export complete?')
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"Unsupported snapshot format {manifest.get('format')!r}")
+    return manifest
+
+
+def read_chunk(directory, table, chunk, verify=True):
+    """Return the rows (dicts) of one chunk file, checking its checksum."""
+    path = os.path.join(directory, table, chunk['file'])
+    digest = hashlib.sha256()
+    rows = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if verify:
+                digest.update(line.encode('utf-8'))
+            rows.append(json.loads(line))
+    if len(rows) != chunk['rows'] or (verify and digest.hexdigest() != chunk['sha256']):
+        raise SnapshotError(f'{path} does not match the manifest (row count or checksum)')
+    return rows
+
+
+def _converters(model, columns):
+    """Return {column: to_python} for columns whose JSON form is a string
+    standing for another type (dates, times, decimals)."""
+    fields = {f.attname: f for f in model._meta.concrete_fields}
+    typed = (db_models.DateField, db_models.TimeField, db_models.DecimalField, db_models.UUIDField)
+    return {c: fields[c].to_python for c in columns if isinstance(fields[c], typed)}
+
+
+def delete_all(model, batch_size):
+    """Delete every row of `model` in PK batches, recording the deletions."""
+    deleted = 0
+    while True:
+        pks = list(model._default_manager.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            # Raw delete: no cascades or per-row signals (FK checks are off
+            # and every table in the snapshot is cleared anyway)
+            model._default_manager.filter(pk__in=pks)._raw_delete(model._default_manager.db)
+            record_changes(model, pks, ChangeLog.DELETE)
+        deleted += len(pks)
+
+
+def load_table(model, directory, entry, batch_size, upsert=True, verify=True):
+    """Load one table's chunks; returns the number of rows written."""
+    fields = {f.attname: f for f in model._meta.concrete_fields}
+    unknown = [c for c in entry['columns'] if c not in fields]
+    if unknown:
+        raise SnapshotError(f"{model._meta.label}: columns {unknown} are not in the current schema")
+    columns = entry['columns']
+    convert = _converters(model, columns)
+
+    options = {}
+    if upsert:
+        options['update_conflicts'] = True
+        options['update_fields'] = [fields[c].name for c in columns if not fields[c].primary_key]
+        if connection.features.supports_update_conflicts_with_target:
+            options['unique_fields'] = [model._meta.pk.name]
+
+    loaded = 0
+    for chunk in entry['chunks']:
+        instances = []
+        for row in read_chunk(directory, table_name(model), chunk, verify=verify):
+            for column, to_python in convert.items():
+                row[column] = to_python(row[column])
+            instances.append(model(**row))
+        try:
+            with transaction.atomic():
+                # On MySQL this is INSERT ... ON DUPLICATE KEY UPDATE
+                model._default_manager.bulk_create(instances, batch_size=batch_size, **options)
+                record_changes(model, [i.pk for i in instances])
+        except IntegrityError as e:
+            raise SnapshotError(f"{model._meta.label}, {chunk['file']}: {e}")
+        loaded += len(instances)
+    return loaded
+
+
+def load_snapshot(directory, models, batch_size=2000, upsert=True, replace=False, verify=True, check=True, log=print):
+    """Load `models` from the snapshot in `directory`.
+
+    With `replace`, existing rows of those tables are deleted first.
+    Foreign keys are checked once at the end (unless `check` is false)
+    rather than per row. Returns {table: rows loaded}.
+    """
+    manifest = read_manifest(directory)
+    missing = [table_name(m) for m in models if table_name(m) not in manifest['tables']]
+    if missing:
+        raise SnapshotError(f"Tables not in the snapshot: {', '.join(missing)}")
+    if not manifest.get('consistent', True):
+        log('Note: this snapshot was not taken as one consistent snapshot (see manifest.json).')
+
+    loaded = {}
+    with connection.constraint_checks_disabled():
+        if replace:
+            for model in reversed(models):
+                deleted = delete_all(model, batch_size)
+                log(f'{table_name(model)}: deleted {deleted} existing rows')
+        for model in models:
+            started = time.monotonic()
+            rows = load_table(model, directory, manifest['tables'][table_name(model)], batch_size, upsert, verify)
+            elapsed = time.monotonic() - started
+            loaded[table_name(model)] = rows
+            log(f'{table_name(model)}: {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)')
+
+    # Rows were inserted with their original primary keys
+    reset_sequences(models)
+
+    if check:
+        try:
+            connection.check_constraints(table_names=[m._meta.db_table for m in models])
+        except Exception as e:
+            raise SnapshotError(f'Foreign key check failed after loading: {e}')
+    return loaded
@@ -0,0 +1,333 @@
+"""Deterministic synthetic datasets for load tests and benchmarks (see the
+generate_dataset command).
+
+Everything is derived from one seeded random.Random, so the same seed,
+size and `as_of` date produce the same rows. Primary keys are assigned
+here, continuing after the current maximum of each table, so rows can be
+bulk inserted without reading ids back (MySQL cannot return them) and
+children can point at parents that were written moments before.
+
+Assets are generated and written in batches together with their history
+(assignments, valuations, maintenance, a disposal for some), so memory is
+bounded by the batch size whatever the total. Reference tables scale with
+the asset count, and assets pick categories, locations, suppliers, holders,
+buyers and staff with a power-law skew: a few categories and sites hold
+most assets, as in real inventories.
+"""
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max
+
+from .caching import bump_table_versions
+from .changes import record_changes
+from .kpis import CONTRIBUTIONS as KPI_CONTRIBUTIONS, apply_deltas, saved_deltas
+from .models import (
+    Asset, AssetValuation, Assignment, Buyer, Category, Disposal, Location,
+    Maintenance, MaintenanceStaff, Supplier, User,
+)
+from .rollups import apply_changes, contributions
+from .snapshots import reset_sequences
+
+
+SIZES = {'k': 1_000, 'm': 1_000_000}
+
+# (category, description, typical cost, asset name stems)
+CATEGORY_TYPES = (
+    ('Computers & Laptops', 'Desktop computers, laptops, and workstations', 1200,
+     ('Dell Latitude', 'HP EliteBook', 'Lenovo ThinkPad', 'MacBook Pro', 'Dell OptiPlex')),
+    ('Mobile Devices', 'Smartphones, tablets, and mobile accessories', 700,
+     ('iPhone', 'Samsung Galaxy S', 'Google Pixel', 'iPad Pro', 'Xiaomi Redmi')),
+    ('Office Furniture', 'Desks, chairs, filing cabinets, and office equipment', 400,
+     ('Herman Miller Aeron Chair', 'IKEA Bekant Desk', 'Steelcase Think Chair', 'Filing Cabinet')),
+    ('Network Equipment', 'Routers, switches, servers, and networking devices', 2500,
+     ('Cisco Catalyst Switch', 'Dell PowerEdge Server', 'HP ProLiant Server', 'Ubiquiti Access Point')),
+    ('Printers & Scanners', 'Printing and scanning equipment', 450,
+     ('HP LaserJet Pro', 'Canon imageRUNNER', 'Epson WorkForce', 'Brother MFC')),
+    ('Vehicles', 'Company cars, trucks, and transportation vehicles', 28000,
+     ('Toyota Hilux', 'Ford Transit Van', 'Toyota Land Cruiser', 'Nissan Navara')),
+    ('Tools & Equipment', 'Maintenance tools and specialized equipment', 300,
+     ('Bosch Drill', 'Makita Grinder', 'Fluke Multimeter', 'Honda Generator')),
+    ('Software Licenses', 'Software applications and licenses', 250,
+     ('Microsoft 365 License', 'Adobe Creative Cloud', 'AutoCAD License', 'Antivirus Suite')),
+)
+FIRST_NAMES = (
+    'John', 'Sarah', 'Mike', 'Lisa', 'David', 'Emma', 'James', 'Anna', 'Robert', 'Jennifer',
+    'Peter', 'Grace', 'Joseph', 'Ruth', 'Brian', 'Esther', 'Moses', 'Irene', 'Samuel', 'Doreen',
+)
+LAST_NAMES = (
+    'Smith', 'Johnson', 'Davis', 'Wilson', 'Brown', 'Taylor', 'Miller', 'Garcia', 'Okello', 'Namutebi',
+    'Mugisha', 'Nakato', 'Ssempala', 'Achieng', 'Kato', 'Atim', 'Byaruhanga', 'Nansubuga', 'Opio', 'Tumusiime',
+)
+DEPARTMENTS = ('IT', 'Finance', 'HR', 'Operations', 'Sales', 'Marketing', 'Maintenance')
+OCCUPATIONS = ('Engineer', 'Analyst', 'Manager', 'Technician', 'Clerk', 'Officer', 'Developer')
+BUILDINGS = ('Main Office', 'Warehouse', 'Branch Office', 'Data Center', 'Depot', 'Field Office')
+CITIES = ('Kampala', 'Entebbe', 'Jinja', 'Mbarara', 'Gulu', 'Mbale', 'Fort Portal', 'Arua', 'Masaka', 'Lira')
+SPECIALIZATIONS = ('IT Hardware', 'Networking', 'Electrical', 'Mechanical', 'Furniture', 'Vehicles')
+MAINTENANCE_WORK = (
+    'Routine inspection', 'Hard drive replacement', 'Battery replacement', 'Screen repair',
+    'Firmware update', 'Toner cartridge replacement', 'Engine service', 'Upholstery repair',
+)
+DISPOSAL_REASONS = (
+    'End of life, replaced with newer model', 'Frequent maintenance issues',
+    'Damaged beyond repair', 'Obsolete', 'Sold at auction',
+)
+
+
+def parse_count(value):
+    """Parse `10k`, `1.5m`, `250000` into an int."""
+    value = str(value).strip().lower().replace('_', '')
+    multiplier = SIZES.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    count = int(float(value) * multiplier)
+    if count < 1:
+        raise ValueError('count must be at least 1')
+    return count
+
+
+def _full_name(index):
+    # Derived from the index alone, so assignments can denormalize the
+    # holder's name without looking the user up
+    first = FIRST_NAMES[index % len(FIRST_NAMES)]
+    last = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    return f'{first} {last}'
+
+
+def _money(value):
+    return Decimal(value).quantize(Decimal('0.01'))
+
+
+class DatasetGenerator:
+    """Generate `assets` assets plus reference data and history.
+
+    `skew` is the power-law exponent used to pick related rows: 1 is
+    uniform, larger values concentrate on the first few ids.
+    """
+
+    def __init__(self, assets, seed=0, as_of=None, batch_size=5000, skew=3.0, record=True, log=print):
+        self.assets = assets
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.as_of = as_of or datetime.date.today()
+        self.batch_size = batch_size
+        self.skew = skew
+        self.record = record
+        self.log = log
+        self.counts = {}
+        # Reference table sizes grow with the square root of the asset
+        # count; users grow linearly (about four assets per user)
+        root = assets ** 0.5
+        self.sizes = {
+            Category: max(len(CATEGORY_TYPES), int(root / 4)),
+            Supplier: max(5, int(root / 3)),
+            Location: max(5, int(root / 2)),
+            Buyer: max(5, int(root / 2)),
+            MaintenanceStaff: max(3, int(root / 5)),
+            User: max(10, assets // 4),
+        }
+        self.next_pk = {}
+
+    # -- helpers ----------------------------------------------------------
+
+    def _pick(self, model):
+        """Return the pk of a skewed random row of `model`."""
+        n = self.sizes[model]
+        return self.first_pk[model] + min(n - 1, int(n * self.rng.random() ** self.skew))
+
+    def _date_between(self, start, end):
+        days = (end - start).days
+        return start + datetime.timedelta(days=self.rng.randint(0, max(0, days)))
+
+    def _allocate(self, model, n):
+        start = self.next_pk[model]
+        self.next_pk[model] = start + n
+        return range(start, start + n)
+
+    def _write(self, model, instances):
+        if not instances:
+            return
+        model._default_manager.bulk_create(instances, batch_size=self.batch_size)
+        if self.record:
+            record_changes(model, [i.pk for i in instances])
+        # The signals are bypassed; fold the new rows into the rollup and
+        # the KPI counters
+        if model is Disposal:
+            apply_changes(added=contributions(instances))
+        if model in KPI_CONTRIBUTIONS:
+            apply_deltas(saved_deltas(model, instances, created=True))
+        self.counts[model._meta.model_name] = self.counts.get(model._meta.model_name, 0) + len(instances)
+
+    # -- reference tables -------------------------------------------------
+
+    def _category(self, pk, i):
+        name, description, _cost, _stems = CATEGORY_TYPES[i % len(CATEGORY_TYPES)]
+        if i >= len(CATEGORY_TYPES):
+            name = f'{name} {i // len(CATEGORY_TYPES) + 1}'
+        return Category(category_id=pk, category_name=name, description=description)
+
+    def _user(self, pk, i):
+        name = _full_name(i)
+        return User(
+            user_id=pk, name=name,
+            department=self.rng.choice(DEPARTMENTS), occupation=self.rng.choice(OCCUPATIONS),
+            email=f"{name.lower().replace(' ', '.')}.{pk}@example.com",
+            phone=f'+2567{self.rng.randint(0, 99999999):08d}', nin=f'CM{self.seed:02d}{pk:010d}',
+            status='Active' if self.rng.random() < 0.9 else 'Inactive',
+            role='admin' if self.rng.random() < 0.02 else 'staff',
+        )
+
+    def _supplier(self, pk, i):
+        return Supplier(
+            supplier_id=pk, name=f'{LAST_NAMES[i % len(LAST_NAMES)]} Supplies {i + 1}',
+            phone=f'+2564{self.rng.randint(0, 99999999):08d}', email=f'sales{pk}@supplier.example.com',
+            address=f'Plot {self.rng.randint(1, 999)}, {self.rng.choice(CITIES)}',
+        )
+
+    def _location(self, pk, i):
+        city = CITIES[i % len(CITIES)]
+        return Location(
+            location_id=pk, building=f'{BUILDINGS[i % len(BUILDINGS)]} {city} {i // len(CITIES) + 1}',
+            postal_address=f'P.O. Box {self.rng.randint(100, 99999)}, {city}', geographical_location=city,
+        )
+
+    def _buyer(self, pk, i):
+        return Buyer(
+            buyer_id=pk, name=f'{LAST_NAMES[i % len(LAST_NAMES)]} Traders {i + 1}',
+            phone=f'+2563{self.rng.randint(0, 99999999):08d}', email=f'buyer{pk}@example.com',
+            address=self.rng.choice(CITIES), tin=f'{self.rng.randint(1000000000, 9999999999)}',
+        )
+
+    def _staff(self, pk, i):
+        return MaintenanceStaff(
+            m_staff_id=pk, name=_full_name(i * 7 + 3), phone=f'+2567{self.rng.randint(0, 99999999):08d}',
+            email=f'tech{pk}@example.com', specialization=SPECIALIZATIONS[i % len(SPECIALIZATIONS)],
+        )
+
+    def _reference_tables(self):
+        builders = (
+            (Category, self._category), (Supplier, self._supplier), (Location, self._location),
+            (Buyer, self._buyer), (MaintenanceStaff, self._staff), (User, self._user),
+        )
+        for model, build in builders:
+            pks = self._allocate(model, self.sizes[model])
+            for offset in range(0, len(pks), self.batch_size):
+                with transaction.atomic():
+                    self._write(model, [
+                        build(pk, offset + i) for i, pk in enumerate(pks[offset:offset + self.batch_size])
+                    ])
+
+    # -- assets and their history ----------------------------------------
+
+    def _asset_batch(self, n):
+        rng = self.rng
+        rows = {model: [] for model in (Asset, Assignment, AssetValuation, Maintenance, Disposal)}
+        for asset_id in self._allocate(Asset, n):
+            category_id = self._pick(Category)
+            type_index = (category_id - self.first_pk[Category]) % len(CATEGORY_TYPES)
+            _name, _description, typical_cost, stems = CATEGORY_TYPES[type_index]
+            purchase_date = self.as_of - datetime.timedelta(days=int(rng.triangular(0, 8 * 365, 0)))
+            cost = typical_cost * rng.lognormvariate(0, 0.4)
+            age_years = (self.as_of - purchase_date).days / 365.0
+            disposed = rng.random() < min(0.6, age_years * 0.06)
+            end = self.as_of
+            if disposed:
+                end = self._date_between(purchase_date + datetime.timedelta(days=180), self.as_of)
+                end = min(end, self.as_of)
+
+            asset = Asset(
+                asset_id=asset_id, asset_name=f'{rng.choice(stems)} {rng.randint(10, 99)}',
+                category_id=category_id, purchase_date=purchase_date, purchase_cost=_money(cost),
+                status='Disposed' if disposed else rng.choices(('Active', 'Maintenance', 'Inactive'), (90, 5, 5))[0],
+                location_id=self._pick(Location), supplier_id=self._pick(Supplier),
+                warranty_expiry=purchase_date + datetime.timedelta(days=365 * rng.choice((1, 2, 3))),
+                serial_number=f'SYN{self.seed:02d}{asset_id:010d}',
+            )
+            rows[Asset].append(asset)
+
+            # Assignments follow each other from purchase to now (or disposal);
+            # about one asset in seven was never handed out
+            count = 0 if rng.random() < 0.15 else min(12, 1 + int(rng.expovariate(1 / 1.5)))
+            start = purchase_date + datetime.timedelta(days=rng.randint(0, 30))
+            span = max(1, (end - start).days)
+            dates = sorted(start + datetime.timedelta(days=rng.randint(0, span)) for _ in range(count))
+            pks = self._allocate(Assignment, count)
+            for i, (pk, assigned) in enumerate(zip(pks, dates)):
+                last = i == count - 1
+                returned = dates[i + 1] if not last else (end if disposed else None)
+                user_index = self._pick(User) - self.first_pk[User]
+                assignment = Assignment(
+                    assignment_id=pk, asset_id=asset_id, user_id=self.first_pk[User] + user_index,
+                    assigned_date=assigned, return_date=returned,
+                    status='Returned' if returned else 'Active',
+                    description=f'Assigned to {_full_name(user_index)}', approved_by=_full_name(user_index + 11),
+                )
+                rows[Assignment].append(assignment)
+                if last:
+                    asset.current_holder_id = assignment.user_id
+                    asset.current_holder_name = _full_name(user_index)
+                    asset.current_assignment_status = assignment.status
+                    asset.current_assignment_date = assigned
+
+            # Yearly valuations with 15-30% declining-balance depreciation
+            value = cost
+            years = min(8, int((end - purchase_date).days / 365)) + 1
+            for year, pk in enumerate(self._allocate(AssetValuation, years)):
+                if year:
+                    value *= 1 - rng.uniform(0.15, 0.30)
+                rows[AssetValuation].append(AssetValuation(
+                    valuation_id=pk, asset_id=asset_id,
+                    valuation_date=purchase_date + datetime.timedelta(days=365 * year),
+                    method='Purchase Price' if not year else 'Depreciation',
+                    initial_value=_money(cost), current_value=_money(value),
+                ))
+
+            for pk in self._allocate(Maintenance, int(rng.expovariate(1.0) * age_years / 2)):
+                staff_id = self._pick(MaintenanceStaff)
+                rows[Maintenance].append(Maintenance(
+                    maintenance_id=pk, asset_id=asset_id, maintenance_date=self._date_between(purchase_date, end),
+                    description=rng.choice(MAINTENANCE_WORK), cost=_money(typical_cost * rng.uniform(0.01, 0.15)),
+                    staff_id=staff_id, performed_by=_full_name((staff_id - self.first_pk[MaintenanceStaff]) * 7 + 3),
+                ))
+
+            if disposed:
+                rows[Disposal].append(Disposal(
+                    disposal_id=self._allocate(Disposal, 1)[0], asset_id=asset_id, disposal_date=end,
+                    disposal_value=_money(value * rng.uniform(0.2, 0.6)), buyer_id=self._pick(Buyer),
+                    reason=rng.choice(DISPOSAL_REASONS),
+                ))
+        return rows
+
+    def run(self):
+        """Write the dataset; returns {table: rows written}."""
+        models = (Category, User, Supplier, Location, Buyer, MaintenanceStaff,
+                  Asset, Maintenance, Assignment, AssetValuation, Disposal)
+        for model in models:
+            current = model._default_manager.aggregate(top=Max('pk'))['top'] or 0
+            self.next_pk[model] = current + 1
+        self.first_pk = {model: self.next_pk[model] for model in self.sizes}
+
+        started = time.monotonic()
+        self._reference_tables()
+        self.log('Reference tables: ' + ', '.join(f'{n} {name}' for name, n in self.counts.items()))
+
+        done = 0
+        while done < self.assets:
+            n = min(self.batch_size, self.assets - done)
+            rows = self._asset_batch(n)
+            with transaction.atomic():
+                for model, instances in rows.items():
+                    self._write(model, instances)
+            done += n
+            elapsed = time.monotonic() - started
+            total = sum(self.counts.values())
+            self.log(f'{done}/{self.assets} assets, {total} rows, {total / elapsed if elapsed else 0:.0f} rows/s')
+
+        reset_sequences(models)
+        if not self.record:
+            # No ChangeLog rows, but cached reports must still be invalidated
+            bump_table_versions(*models)
+        return self.counts
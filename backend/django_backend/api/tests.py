@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase
+
+from api.classifier import KeywordClassifier
+
+
+class KeywordClassifierTests(SimpleTestCase):
+    CATEGORIES = {
+        1: 'Mobile Devices',
+        2: 'Computers & Laptops',
+        3: 'Monitors',
+        4: 'Printers & Scanners',
+        5: 'Office Furniture',
+        6: 'Network Equipment',
+    }
+    # (asset name, expected category); a product type beats a brand
+    CASES = (
+        ('HP LaserJet Printer', 'Printers & Scanners'),
+        ('HP Monitor 24', 'Monitors'),
+        ('Dell UltraSharp Monitor', 'Monitors'),
+        ('Dell UltraSharp 27', 'Monitors'),
+        ('Samsung Curved Monitor', 'Monitors'),
+        ('Samsung Curved 32', 'Monitors'),
+        ('LG UltraWide 34', 'Monitors'),
+        ('Canon Document Scanner', 'Printers & Scanners'),
+        ('HP Office Chair', 'Office Furniture'),
+        ('Dell PowerEdge Server', 'Network Equipment'),
+        ('Samsung Galaxy S21', 'Mobile Devices'),
+        ('iPhone 14', 'Mobile Devices'),
+        ('HP Pavilion 15', 'Computers & Laptops'),
+        ('Dell 5520', 'Computers & Laptops'),
+        ('Epson WorkForce', 'Printers & Scanners'),
+        ('Stapler', None),
+    )
+
+    def test_product_type_outranks_brand(self):
+        classifier = KeywordClassifier()
+        targets = classifier.targets(self.CATEGORIES)
+        for name, expected in self.CASES:
+            with self.subTest(name=name):
+                index = classifier.rule_index(name)
+                category = self.CATEGORIES[targets[index]] if index is not None else None
+                self.assertEqual(category, expected)
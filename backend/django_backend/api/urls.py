@@ -5,8 +5,8 @@ from .views import (
     SupplierViewSet, LocationViewSet, MaintenanceStaffViewSet,
     MaintenanceViewSet, BuyerViewSet, DisposalViewSet,
     AssignmentViewSet, AssetValuationViewSet,
-    assets_by_category, valuation_histogram,
-    sales_report,
+    assets_by_category, valuation_histogram, histogram_report,
+    sales_report, dashboard, kpis_report, report_cache_status, report_export, search, events, metrics, query_findings,
 )
 
 router = DefaultRouter()
@@ -28,4 +28,13 @@ urlpatterns = [
     path('reports/assets-by-category/', assets_by_category, name='assets-by-category'),
     path('reports/valuation-histogram/', valuation_histogram, name='valuation-histogram'),
     path('reports/sales/', sales_report, name='reports-sales'),
+    path('reports/dashboard/', dashboard, name='reports-dashboard'),
+    path('reports/kpis/', kpis_report, name='reports-kpis'),
+    path('reports/histogram/<str:field>/', histogram_report, name='reports-histogram'),
+    path('reports/cache-stats/', report_cache_status, name='report-cache-stats'),
+    path('reports/<str:name>/export/', report_export, name='report-export'),
+    path('search/', search, name='search'),
+    path('events/', events, name='events'),
+    path('metrics/', metrics, name='metrics'),
+    path('metrics/queries/', query_findings, name='query-findings'),
 ]
@@ -1,5 +1,12 @@
+import functools
+
 from rest_framework import viewsets
-from django.db.models import OuterRef, Subquery
+from django.db import transaction
+from django.conf import settings
+from django.http import (
+    Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotModified, JsonResponse, StreamingHttpResponse,
+)
+from django.views.decorators.http import require_GET
 from .models import (
     Asset, User, Category, Supplier, Location, Buyer, Disposal,
     MaintenanceStaff, Maintenance, Assignment, AssetValuation
@@ -14,139 +21,146 @@ from rest_framework import status
 from .models import Category
 from rest_framework.decorators import api_view
 from django.db.models import Count
-from django.db import connection
-from django.db.models import Sum
-from django.db.models.functions import TruncYear
-from django.db.models.functions import ExtractYear, ExtractMonth
+from .caching import DATED_REPORTS, REPORTS, cached_report, get_validators, not_modified, report_cache_stats, set_validators
+from .exports import export_format, export_response
+from .mixins import BulkMixin, ConditionalGetMixin, DeltaSyncMixin, ExportMixin, SparseQuerysetMixin
+from .events import event_stream
+from .histograms import FIELDS, histogram
+from .kpis import kpi_values
+from .rollups import period_totals
+from .search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, SOURCES as SEARCH_SOURCES, search as search_results
+from .snapshots import snapshot_transaction
+from backend_django.utils.metrics import metrics as request_metrics
+from backend_django.utils.query_inspector import finding_log
+
+
+class AssetViewSet(BulkMixin, ExportMixin, ConditionalGetMixin, DeltaSyncMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
+    serializer_class = AssetSerializer
+    # category_name is read from the Category table
+    etag_models = (Asset, Category)
 
+    # The latest assignment is denormalized onto Asset.current_* columns
+    # (see api/holders.py); select_related eager-loads the category name.
+    queryset = Asset.objects.select_related('category').all()
 
-class AssetViewSet(viewsets.ModelViewSet):
-    serializer_class = AssetSerializer
 
-    def get_queryset(self):
-        # Annotate assets with their latest assignment (by assigned_date then id)
-        latest = Assignment.objects.filter(asset=OuterRef('pk')).order_by('-assigned_date', '-assignment_id')
-        # select_related to eager-load the category relation for serializers
-        qs = Asset.objects.select_related('category').all().annotate(
-            current_holder_name=Subquery(latest.values('user__name')[:1]),
-            current_assignment_status=Subquery(latest.values('status')[:1]),
-            current_assignment_date=Subquery(latest.values('assigned_date')[:1])
-        )
-        return qs
-
-    def create(self, request, *args, **kwargs):
-        # Validate category_id from the incoming payload before attempting
-        # to create. This ensures we return a 400 when the frontend sends an
-        # invalid FK id instead of silently creating a null relationship.
-        cat_id = request.data.get('category_id', None)
-        if cat_id not in (None, '', 'null'):
-            try:
-                cid = int(cat_id)
-            except (TypeError, ValueError):
-                return Response({'category_id': ['Invalid pk format']}, status=status.HTTP_400_BAD_REQUEST)
-            if not Category.objects.filter(pk=cid).exists():
-                return Response({'category_id': [f'Invalid pk "{cid}" - object does not exist.']}, status=status.HTTP_400_BAD_REQUEST)
-        return super().create(request, *args, **kwargs)
-
-    def update(self, request, *args, **kwargs):
-        cat_id = request.data.get('category_id', None)
-        if cat_id not in (None, '', 'null'):
-            try:
-                cid = int(cat_id)
-            except (TypeError, ValueError):
-                return Response({'category_id': ['Invalid pk format']}, status=status.HTTP_400_BAD_REQUEST)
-            if not Category.objects.filter(pk=cid).exists():
-                return Response({'category_id': [f'Invalid pk "{cid}" - object does not exist.']}, status=status.HTTP_400_BAD_REQUEST)
-        return super().update(request, *args, **kwargs)
-
-
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(BulkMixin, ExportMixin, ConditionalGetMixin, DeltaSyncMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(BulkMixin, ExportMixin, ConditionalGetMixin, DeltaSyncMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
 
-class SupplierViewSet(viewsets.ModelViewSet):
+class SupplierViewSet(BulkMixin, ExportMixin, ConditionalGetMixin, DeltaSyncMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
 
 
-class LocationViewSet(viewsets.ModelViewSet):
+class LocationViewSet(BulkMixin, ExportMixin, ConditionalGetMixin, DeltaSyncMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
 
 
-class BuyerViewSet(viewsets.ModelViewSet):
+class BuyerViewSet(BulkMixin, ExportMixin, ConditionalGetMixin, DeltaSyncMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Buyer.objects.all()
     serializer_class = BuyerSerializer
 
 
-class DisposalViewSet(viewsets.ModelViewSet):
+class DisposalViewSet(BulkMixin, ExportMixin, ConditionalGetMixin, DeltaSyncMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Disposal.objects.all()
     serializer_class = DisposalSerializer
 
 
-class MaintenanceStaffViewSet(viewsets.ModelViewSet):
+class MaintenanceStaffViewSet(BulkMixin, ExportMixin, ConditionalGetMixin, DeltaSyncMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = MaintenanceStaff.objects.all()
     serializer_class = MaintenanceStaffSerializer
 
 
-class MaintenanceViewSet(viewsets.ModelViewSet):
+class MaintenanceViewSet(BulkMixin, ExportMixin, ConditionalGetMixin, DeltaSyncMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Maintenance.objects.all()
     serializer_class = MaintenanceSerializer
 
 
-class AssignmentViewSet(viewsets.ModelViewSet):
+class AssignmentViewSet(BulkMixin, ExportMixin, ConditionalGetMixin, DeltaSyncMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Assignment.objects.all()
     serializer_class = AssignmentSerializer
 
 
-class AssetValuationViewSet(viewsets.ModelViewSet):
+class AssetValuationViewSet(BulkMixin, ExportMixin, ConditionalGetMixin, DeltaSyncMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = AssetValuation.objects.all()
     serializer_class = AssetValuationSerializer
 
 
-@api_view(['GET'])
-def assets_by_category(request):
-    """Return counts of assets grouped by category_name."""
+def assets_by_category_data(params):
     qs = Asset.objects.values('category__category_name').annotate(count=Count('asset_id')).order_by('-count')
     data = []
     for item in qs:
         name = item.get('category__category_name') or 'Uncategorized'
         data.append({'category': name, 'count': item.get('count', 0)})
-    return Response(data)
+    return data
+
+
+@transaction.non_atomic_requests
+@api_view(['GET'])
+@cached_report('assets-by-category', Asset, Category)
+def assets_by_category(request):
+    """Return counts of assets grouped by category_name."""
+    return Response(assets_by_category_data(request.GET))
+
+
+def valuation_histogram_data(params):
+    return histogram('valuation', params)
 
 
+@transaction.non_atomic_requests
 @api_view(['GET'])
+@cached_report('valuation-histogram', AssetValuation)
 def valuation_histogram(request):
-    """Return a simple histogram of AssetValuation.current_value bucketed by `bucket` query param."""
-    try:
-        bucket = int(request.GET.get('bucket', 1000))
-        if bucket <= 0:
-            bucket = 1000
-    except Exception:
-        bucket = 1000
-
-    # table name for AssetValuation in this app is 'api_assetvaluation'
-    sql = f"""
-        SELECT FLOOR(current_value / %s) * %s AS bucket, COUNT(*) AS cnt
-        FROM api_assetvaluation
-        WHERE current_value IS NOT NULL
-        GROUP BY bucket
-        ORDER BY bucket
+    """Return a bounded histogram of AssetValuation.current_value.
+
+    Takes `buckets`, `scale`, `bucket` (a fixed width) and `latest=1`; see
+    api/histograms.py.
     """
-    with connection.cursor() as c:
-        c.execute(sql, [bucket, bucket])
-        rows = [{'bucket': int(r[0]) if r[0] is not None else 0, 'count': int(r[1])} for r in c.fetchall()]
+    return Response(valuation_histogram_data(request.GET))
+
+
+def _histogram_view(name):
+    @api_view(['GET'])
+    @cached_report(f'histogram-{name}', FIELDS[name].model, dated=FIELDS[name].dated)
+    def view(request):
+        return Response(histogram(name, request.GET))
+    return view
 
-    return Response(rows)
 
+HISTOGRAM_VIEWS = {name: _histogram_view(name) for name in FIELDS}
 
+
+@transaction.non_atomic_requests
+def histogram_report(request, field):
+    """`GET /api/reports/histogram/<field>/`, one cached report per field."""
+    if field not in HISTOGRAM_VIEWS:
+        raise Http404('Unknown histogram field')
+    return HISTOGRAM_VIEWS[field](request)
+
+
+def sales_data(params):
+    # Summed from the monthly rollup (api/rollups.py), a few rows per year,
+    # so the cost does not grow with the disposal history.
+    yearly, quarterly = period_totals()
+    yrows = [{'year': year, 'total': float(total)} for year, total in yearly.items()]
+    qrows = [
+        {'year': year, 'quarter': quarter, 'total': float(total)}
+        for (year, quarter), total in quarterly.items()
+    ]
+    return {'yearly': yrows, 'quarterly': qrows}
+
+
+@transaction.non_atomic_requests
 @api_view(['GET'])
+@cached_report('sales', Disposal)
 def sales_report(request):
     """Return aggregated disposal sales by year and quarter.
 
@@ -157,32 +171,191 @@ def sales_report(request):
     }
     """
     try:
-        qs = Disposal.objects.filter(disposal_value__isnull=False)
-        yearly_qs = qs.annotate(year=TruncYear('disposal_date')).values('year').annotate(total=Sum('disposal_value')).order_by('year')
-        # quarterly: use ORM to extract year and month (DB-agnostic), then collapse months into quarters in Python
-        month_qs = qs.annotate(year=ExtractYear('disposal_date'), month=ExtractMonth('disposal_date')).values('year', 'month').annotate(total=Sum('disposal_value')).order_by('year', 'month')
-        # build quarterly rows from month aggregates
-        qmap = {}
-        for item in month_qs:
-            yr = item.get('year')
-            mo = item.get('month') or 0
-            total = float(item.get('total') or 0)
-            quarter = ((int(mo) - 1) // 3) + 1 if mo and int(mo) >= 1 else 1
-            key = (int(yr), int(quarter))
-            qmap[key] = qmap.get(key, 0) + total
-        qrows = []
-        for (yr, qtr), tot in sorted(qmap.items()):
-            qrows.append({'year': int(yr), 'quarter': int(qtr), 'total': float(tot)})
-        yrows = []
-        for item in yearly_qs:
-            yr = item.get('year')
-            total = float(item.get('total') or 0)
-            # TruncYear returns a date; use year attribute if present
-            if hasattr(yr, 'year'):
-                yrows.append({'year': int(yr.year), 'total': total})
-            else:
-                yrows.append({'year': int(yr), 'total': total})
-
-        return Response({'yearly': yrows, 'quarterly': qrows})
+        return Response(sales_data(request.GET))
     except Exception as e:
         return Response({'error': str(e)}, status=500)
+
+
+def kpis_data(params):
+    return kpi_values()
+
+
+@transaction.non_atomic_requests
+@api_view(['GET'])
+@cached_report('kpis', Asset, Maintenance, Disposal, Assignment, User)
+def kpis_report(request):
+    """Return the overall system KPIs, read from the KPI counters
+    (api/kpis.py) rather than counted from the tables:
+
+    {"total_assets": 1200, "active_assets": 950, ..., "disposal_revenue": 81234.5}
+    """
+    return Response(kpis_data(request.GET))
+
+
+# KPI counters (api/kpis.py) behind the dashboard cards
+DASHBOARD_KPIS = ('total_assets', 'active_users', 'open_assignments', 'overdue_assignments', 'maintenance_records')
+
+
+def dashboard_kpis():
+    """Return the headline counts of the dashboard cards."""
+    return kpi_values(DASHBOARD_KPIS)
+
+
+def dashboard_data(params):
+    # All parts are read in one snapshot, so they agree with each other
+    with snapshot_transaction():
+        return {
+            'kpis': dashboard_kpis(),
+            'assets_by_category': assets_by_category_data(params),
+            'valuation_histogram': valuation_histogram_data(params),
+            'sales': sales_data(params),
+        }
+
+
+DASHBOARD_MODELS = (Asset, Category, AssetValuation, Disposal, User, Assignment, Maintenance)
+
+
+@transaction.non_atomic_requests
+@api_view(['GET'])
+@cached_report('dashboard', *DASHBOARD_MODELS)
+def dashboard(request):
+    """Return everything the dashboard and statistics pages show, in one
+    response read from one consistent snapshot:
+
+    {"kpis": {...}, "assets_by_category": [...], "valuation_histogram": [...],
+     "sales": {"yearly": [...], "quarterly": [...]}}
+
+    Takes the valuation histogram's query params.
+    """
+    return Response(dashboard_data(request.GET))
+
+
+# Report data functions by report name, for the exports and for
+# precomputing (warm_reports): name -> function(params) -> response data.
+REPORT_DATA = {
+    'assets-by-category': assets_by_category_data,
+    'valuation-histogram': valuation_histogram_data,
+    'sales': sales_data,
+    'dashboard': dashboard_data,
+    'kpis': kpis_data,
+    **{f'histogram-{name}': functools.partial(histogram, name) for name in FIELDS},
+}
+
+# Report exports: name -> (columns, function(params) -> list of row dicts).
+# Sales rows are quarterly unless `?period=yearly`.
+HISTOGRAM_COLUMNS = ('bucket', 'upper', 'count')
+REPORT_EXPORTS = {
+    'assets-by-category': (('category', 'count'), assets_by_category_data),
+    'valuation-histogram': (HISTOGRAM_COLUMNS, valuation_histogram_data),
+    'sales': (
+        ('year', 'quarter', 'total'),
+        lambda params: sales_data(params)['yearly' if params.get('period') == 'yearly' else 'quarterly'],
+    ),
+    **{f'histogram-{name}': (HISTOGRAM_COLUMNS, REPORT_DATA[f'histogram-{name}']) for name in FIELDS},
+}
+
+
+@require_GET
+def report_export(request, name):
+    """`GET /api/reports/<name>/export/?format=csv|ndjson` (`?gzip=1`).
+
+    Takes the same query params as the report itself.
+    """
+    if name not in REPORT_EXPORTS:
+        raise Http404('Unknown report')
+    fmt = export_format(request.GET)
+    if fmt is None:
+        return JsonResponse({'format': ['Expected "csv" or "ndjson".']}, status=400)
+    _, etag, last_modified = get_validators(request, REPORTS[name], name in DATED_REPORTS)
+    if not_modified(request, etag, last_modified):
+        return set_validators(HttpResponseNotModified(), etag, last_modified)
+    columns, rows = REPORT_EXPORTS[name]
+    chunks = ([tuple(row.get(c) for c in columns) for row in rows(request.GET)],)
+    return set_validators(export_response(request, name, fmt, columns, chunks), etag, last_modified)
+
+
+@api_view(['GET'])
+def search(request):
+    """`GET /api/search/?q=` across assets, users, suppliers, buyers and
+    categories, best matches first (see api/search.py).
+
+    `?types=asset,user` restricts the types, `?limit=` caps the results.
+    Identifiers match when they start with `q`. On MySQL, names match when
+    every word of `q` of at least SEARCH_FULLTEXT_MIN_WORD (3) characters
+    starts a word of the name; shorter words are ignored ("john ka" finds
+    every John). A query of only short words, and any query on other
+    databases, matches names that start with the whole query, so a
+    surname shorter than 3 characters ("ka" for "John Kato") is not
+    autocompleted.
+    """
+    types = [t for t in request.GET.get('types', '').split(',') if t]
+    unknown = [t for t in types if t not in SEARCH_SOURCES]
+    if unknown:
+        return Response({'types': [f'Unknown types: {", ".join(unknown)}; expected {", ".join(SEARCH_SOURCES)}.']}, status=400)
+    try:
+        limit = int(request.GET.get('limit', SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return Response({'limit': ['Expected an integer.']}, status=400)
+    limit = min(max(limit, 1), SEARCH_MAX_LIMIT)
+    query = request.GET.get('q', '')
+    return Response({'query': query, 'results': search_results(query, types, limit)})
+
+
+@api_view(['GET'])
+def report_cache_status(request):
+    """Return hit/miss/wait counters of the report cache, per report."""
+    return Response(report_cache_stats())
+
+
+@require_GET
+@transaction.non_atomic_requests
+def events(request):
+    """Server-Sent Events stream of `table`, `report` and `reset` events.
+
+    Send `Last-Event-ID` (or `?last_event_id=`) to resume after a disconnect.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    response = StreamingHttpResponse(event_stream(last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx and similar proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _metrics_allowed(request):
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+
+
+@require_GET
+def metrics(request):
+    """Per-route request and DB query metrics in Prometheus text format.
+
+    Only served to METRICS_ALLOWED_IPS (local addresses by default).
+    """
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@require_GET
+def query_findings(request):
+    """Most recent repeated (N+1) and slow query findings, newest first.
+
+    `?kind=repeated|slow` filters, `?limit=` caps the list. Only served to
+    METRICS_ALLOWED_IPS.
+    """
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    try:
+        limit = int(request.GET.get('limit', 0)) or None
+    except ValueError:
+        limit = None
+    findings = finding_log.recent()
+    kind = request.GET.get('kind')
+    if kind:
+        findings = [f for f in findings if f['kind'] == kind]
+    return JsonResponse({'findings': findings[:limit]})
@@ -0,0 +1,20 @@
+"""Entry point for worker processes started with the `spawn` method.
+
+A spawned interpreter unpickles its target by importing the target's
+module, and importing most of api/ imports the models before Django is
+set up. Worker processes therefore start in `run()`, which sets Django up
+first and then calls the real target, given by dotted path.
+"""
+
+
+def run(target, *args):
+    import django
+    django.setup()
+
+    from django.utils.module_loading import import_string
+    import_string(target)(*args)
+
+
+def spawn_worker(ctx, target, *args):
+    """Return an unstarted daemon Process of `ctx` running `target(*args)`."""
+    return ctx.Process(target=run, args=(target, *args), daemon=True)
@@ -106,6 +106,51 @@ else:
     if 'mysql' not in engine.lower() and 'mariadb' not in engine.lower():
         raise RuntimeError(f"DB_ENGINE must be MySQL/MariaDB for this project; got '{engine}'.")
 
+# Run each request in one transaction so a row write, its ChangeLog entry and
+# any denormalized updates commit (or roll back) together.
+DATABASES['default']['ATOMIC_REQUESTS'] = True
+
+# Cache shared by all gunicorn workers (report results, table version tokens).
+# Set REDIS_URL to use Redis; otherwise a table in the database is used (created
+# by a migration). Both give the atomic add()/incr() that the report cache's
+# single-flight lock and hit/miss counters rely on across worker processes.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'backend_django.utils.cache.AtomicDatabaseCache',
+            'LOCATION': 'django_cache',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# Seconds a cached /api/reports/* result may be served before recomputing,
+# even without writes
+REPORT_CACHE_TTL = int(os.getenv('REPORT_CACHE_TTL', '300'))
+
+# Per-route request metrics (backend_django/utils/metrics.py). Every worker
+# process writes its aggregates to its own file in METRICS_DIR; clear the
+# directory when redeploying to reset the counters.
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(BASE_DIR, '.metrics'))
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '1.0'))
+# Client addresses allowed to read /api/metrics/
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()]
+
+# N+1 / slow-query detection (backend_django/utils/query_inspector.py).
+# Slow queries are checked on every request; repeated-query fingerprinting
+# runs on a sample of requests.
+QUERY_INSPECTOR_ENABLED = os.getenv('QUERY_INSPECTOR_ENABLED', '1') == '1'
+QUERY_INSPECTOR_SAMPLE_RATE = float(os.getenv('QUERY_INSPECTOR_SAMPLE_RATE', '0.05'))
+QUERY_INSPECTOR_REPEAT_THRESHOLD = int(os.getenv('QUERY_INSPECTOR_REPEAT_THRESHOLD', '10'))
+QUERY_INSPECTOR_SLOW_MS = float(os.getenv('QUERY_INSPECTOR_SLOW_MS', '200'))
+
 AUTH_PASSWORD_VALIDATORS = []
 
 LANGUAGE_CODE = 'en-us'
@@ -126,8 +171,15 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.JSONRenderer',
     ),
+    # Pagination is opt-in: list endpoints only paginate when the client sends
+    # `?page_size=` or `?cursor=` (see api/pagination.py).
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', '100')),
 }
 
+# Hard upper bound for a client-requested `?page_size=`
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '1000'))
+
 # CORS Configuration
 # For production, set CORS_ALLOWED_ORIGINS env var as comma-separated list
 CORS_ALLOWED_ORIGINS_ENV = os.getenv('CORS_ALLOWED_ORIGINS', '')
@@ -0,0 +1,97 @@
+"""Database cache backend whose add() and incr() are atomic across processes.
+
+Django's DatabaseCache reads a key before writing it: add() over an expired
+entry can be won by two callers at once, and incr() is a get() followed by a
+set(), so concurrent increments are lost. Here add() is an INSERT that falls
+back to one UPDATE matching only while the old entry is expired, and incr()
+locks the row (SELECT ... FOR UPDATE) while it reads and writes it.
+"""
+import base64
+import pickle
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.db import DatabaseCache
+from django.db import IntegrityError, connections, models, router, transaction
+from django.utils.timezone import now as tz_now
+
+
+class AtomicDatabaseCache(DatabaseCache):
+    def _connection(self):
+        db = router.db_for_write(self.cache_model_class)
+        return db, connections[db]
+
+    def _encode(self, value):
+        return base64.b64encode(pickle.dumps(value, self.pickle_protocol)).decode('latin1')
+
+    def _decode(self, connection, value):
+        return pickle.loads(base64.b64decode(connection.ops.process_clob(value).encode()))
+
+    def _convert_expires(self, connection, value):
+        expression = models.Expression(output_field=models.DateTimeField())
+        for converter in connection.ops.get_db_converters(expression) + expression.get_db_converters(connection):
+            value = converter(value, expression, connection)
+        return value
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        db, connection = self._connection()
+        quote_name = connection.ops.quote_name
+        table = quote_name(self._table)
+        now = tz_now().replace(microsecond=0)
+        if timeout is None:
+            expires = datetime.max
+        else:
+            expires = datetime.fromtimestamp(timeout, tz=timezone.utc if settings.USE_TZ else None)
+        expires = connection.ops.adapt_datetimefield_value(expires.replace(microsecond=0))
+        encoded = self._encode(value)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {table}')
+            num = cursor.fetchone()[0]
+            if num > self._max_entries:
+                self._cull(db, cursor, now, num)
+            try:
+                with transaction.atomic(using=db):
+                    cursor.execute(
+                        f'INSERT INTO {table} ({quote_name("cache_key")}, {quote_name("value")}, '
+                        f'{quote_name("expires")}) VALUES (%s, %s, %s)',
+                        [key, encoded, expires],
+                    )
+                return True
+            except IntegrityError:
+                pass
+            # The key exists: take it over only if it has expired, so that
+            # of several callers racing for a stale key exactly one wins.
+            with transaction.atomic(using=db):
+                cursor.execute(
+                    f'UPDATE {table} SET {quote_name("value")} = %s, {quote_name("expires")} = %s '
+                    f'WHERE {quote_name("cache_key")} = %s AND {quote_name("expires")} < %s',
+                    [encoded, expires, key, connection.ops.adapt_datetimefield_value(now)],
+                )
+                return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db, connection = self._connection()
+        quote_name = connection.ops.quote_name
+        table = quote_name(self._table)
+        lock = ' FOR UPDATE' if connection.features.has_select_for_update else ''
+
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {quote_name("value")}, {quote_name("expires")} FROM {table} '
+                f'WHERE {quote_name("cache_key")} = %s{lock}',
+                [key],
+            )
+            row = cursor.fetchone()
+            if row is None or self._convert_expires(connection, row[1]) < tz_now():
+                raise ValueError(f"Key '{key}' not found")
+            value = self._decode(connection, row[0]) + delta
+            cursor.execute(
+                f'UPDATE {table} SET {quote_name("value")} = %s WHERE {quote_name("cache_key")} = %s',
+                [self._encode(value), key],
+            )
+        return value
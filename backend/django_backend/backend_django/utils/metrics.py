@@ -0,0 +1,245 @@
+"""Per-route request and database metrics shared by all worker processes.
+
+Each process aggregates requests in memory, keyed by resolved URL pattern
+and method, and writes a snapshot to its own file in METRICS_DIR at most
+every METRICS_FLUSH_INTERVAL seconds. `render()` merges the files of all
+processes (the gunicorn workers) into Prometheus text format,
+so the totals are the same whichever worker serves the scrape.
+
+Files are pruned when a scrape merges them: a file whose process has exited
+(so its counts stop there) is deleted. The counters then drop by that
+process's counts, which Prometheus treats as a counter reset. A live but
+idle worker keeps its file however old it is; METRICS_FILE_TTL only
+applies to files whose name holds no pid.
+"""
+import bisect
+import glob
+import json
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+
+
+# Upper bounds (seconds) of the latency histogram buckets; a final +Inf
+# bucket is implied.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+METRICS_DIR = getattr(settings, 'METRICS_DIR', os.path.join(settings.BASE_DIR, '.metrics'))
+METRICS_FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+METRICS_FILE_TTL = getattr(settings, 'METRICS_FILE_TTL', 24 * 3600)
+
+UNMATCHED_ROUTE = '<unmatched>'
+_GROUP = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+_FILE_PID = re.compile(r'metrics-(\d+)-\d+\.json$')
+
+
+def route_label(request):
+    """Return the URL pattern that served `request`, e.g. `api/assets/<pk>/`."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.route:
+        return UNMATCHED_ROUTE
+    return _GROUP.sub(r'<\1>', match.route).replace('^', '').replace('$', '')
+
+
+class QueryCounter:
+    """connection.execute_wrapper() that counts queries and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.monotonic() - start
+
+
+def _new_entry():
+    return {
+        'count': 0,
+        'statuses': {},
+        # per-bucket (not cumulative) counts; the last one is +Inf
+        'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+        'seconds': 0.0,
+        'db_queries': 0,
+        'db_seconds': 0.0,
+    }
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but belongs to another user
+        return True
+    return True
+
+
+class Metrics:
+    def __init__(self, directory=METRICS_DIR, flush_interval=METRICS_FLUSH_INTERVAL, file_ttl=METRICS_FILE_TTL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.file_ttl = file_ttl
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        # pid plus start time, so a recycled pid never overwrites the file
+        # of an earlier process
+        self._path = os.path.join(self.directory, f'metrics-{self._pid}-{time.time_ns()}.json')
+        self._routes = {}
+        self._flushed_at = 0.0
+
+    def observe(self, route, method, status_code, seconds, db_queries=0, db_seconds=0.0):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked from a process that already recorded requests
+                self._reset()
+            entry = self._routes.get((route, method))
+            if entry is None:
+                entry = self._routes[(route, method)] = _new_entry()
+            entry['count'] += 1
+            status_class = f'{status_code // 100}xx'
+            entry['statuses'][status_class] = entry['statuses'].get(status_class, 0) + 1
+            entry['buckets'][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            entry['seconds'] += seconds
+            entry['db_queries'] += db_queries
+            entry['db_seconds'] += db_seconds
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._routes:
+                return
+            data = [[route, method, entry] for (route, method), entry in self._routes.items()]
+            self._flushed_at = time.monotonic()
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f'{self._path}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self._path)
+
+    def _stale(self, path):
+        if path == self._path:
+            return False
+        match = _FILE_PID.search(os.path.basename(path))
+        if match is not None:
+            return not _pid_alive(int(match.group(1)))
+        try:
+            return time.time() - os.path.getmtime(path) > self.file_ttl
+        except OSError:
+            return False
+
+    def prune(self):
+        """Delete the files of exited processes, and files without a pid
+        not written for longer than `file_ttl`."""
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            if self._stale(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def collect(self):
+        """Return {(route, method): entry} merged across all processes."""
+        self.flush()
+        self.prune()
+        merged = {}
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    rows = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for route, method, entry in rows:
+                total = merged.setdefault((route, method), _new_entry())
+                total['count'] += entry['count']
+                for status_class, n in entry['statuses'].items():
+                    total['statuses'][status_class] = total['statuses'].get(status_class, 0) + n
+                total['buckets'] = [a + b for a, b in zip(total['buckets'], entry['buckets'])]
+                for key in ('seconds', 'db_queries', 'db_seconds'):
+                    total[key] += entry[key]
+        return merged
+
+    def render(self):
+        """Return all metrics in Prometheus text exposition format."""
+        merged = sorted(self.collect().items())
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        family('api_requests_total', 'counter', 'Requests by URL pattern, method and status class.')
+        for (route, method), entry in merged:
+            for status_class, n in sorted(entry['statuses'].items()):
+                lines.append(f'api_requests_total{_labels(route, method, status=status_class)} {n}')
+
+        family('api_request_duration_seconds', 'histogram', 'Request latency.')
+        for (route, method), entry in merged:
+            cumulative = 0
+            for bound, n in zip((*LATENCY_BUCKETS, '+Inf'), entry['buckets']):
+                cumulative += n
+                lines.append(f'api_request_duration_seconds_bucket{_labels(route, method, le=bound)} {cumulative}')
+            lines.append(f'api_request_duration_seconds_sum{_labels(route, method)} {entry["seconds"]:.6f}')
+            lines.append(f'api_request_duration_seconds_count{_labels(route, method)} {entry["count"]}')
+
+        family('api_request_latency_seconds', 'summary', 'Request latency quantiles estimated from the histogram.')
+        for (route, method), entry in merged:
+            for q in QUANTILES:
+                value = estimate_quantile(q, entry['buckets'])
+                lines.append(f'api_request_latency_seconds{_labels(route, method, quantile=q)} {value:.6f}')
+            lines.append(f'api_request_latency_seconds_sum{_labels(route, method)} {entry["seconds"]:.6f}')
+            lines.append(f'api_request_latency_seconds_count{_labels(route, method)} {entry["count"]}')
+
+        family('api_db_queries_total', 'counter', 'Database queries run while serving requests.')
+        for (route, method), entry in merged:
+            lines.append(f'api_db_queries_total{_labels(route, method)} {entry["db_queries"]}')
+
+        family('api_db_query_seconds_total', 'counter', 'Time spent in database queries while serving requests.')
+        for (route, method), entry in merged:
+            lines.append(f'api_db_query_seconds_total{_labels(route, method)} {entry["db_seconds"]:.6f}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def estimate_quantile(q, buckets):
+    """Estimate quantile `q` from per-bucket counts by linear interpolation
+    within the bucket, as Prometheus' histogram_quantile() does."""
+    total = sum(buckets)
+    if not total:
+        return 0.0
+    rank = q * total
+    cumulative = 0
+    for i, n in enumerate(buckets):
+        if cumulative + n >= rank and n:
+            if i == len(LATENCY_BUCKETS):
+                # +Inf bucket: the largest finite bound is the best we know
+                return LATENCY_BUCKETS[-1]
+            lower = LATENCY_BUCKETS[i - 1] if i else 0.0
+            return lower + (LATENCY_BUCKETS[i] - lower) * (rank - cumulative) / n
+        cumulative += n
+    return LATENCY_BUCKETS[-1]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(route, method, **extra):
+    pairs = [('route', route), ('method', method), *extra.items()]
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+metrics = Metrics()
@@ -0,0 +1,189 @@
+"""N+1 and slow-query detection, run from RequestTimingMiddleware.
+
+Every request's queries go through a QueryInspector. Slow statements (at
+least QUERY_INSPECTOR_SLOW_MS) are caught on every request, since their
+time is measured anyway. A sampled fraction of requests
+(QUERY_INSPECTOR_SAMPLE_RATE) also fingerprints each statement and flags
+one that ran QUERY_INSPECTOR_REPEAT_THRESHOLD or more times: the usual sign
+of an N+1 loop over a relation.
+
+Findings are logged and kept in a bounded per-process ring buffer that is
+mirrored to a file in METRICS_DIR, so /api/metrics/queries/ shows the
+findings of every worker. Slow SELECTs are EXPLAINed on MySQL, at most once
+per fingerprint every QUERY_INSPECTOR_EXPLAIN_INTERVAL seconds.
+
+Findings hold only normalized SQL, never a statement's bound parameters:
+those may be personal data, so they are passed to the EXPLAIN and dropped.
+"""
+import collections
+import functools
+import glob
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+from .metrics import METRICS_DIR, QueryCounter
+
+logger = logging.getLogger(__name__)
+
+QUERY_INSPECTOR_ENABLED = getattr(settings, 'QUERY_INSPECTOR_ENABLED', True)
+QUERY_INSPECTOR_SAMPLE_RATE = getattr(settings, 'QUERY_INSPECTOR_SAMPLE_RATE', 0.05)
+QUERY_INSPECTOR_REPEAT_THRESHOLD = getattr(settings, 'QUERY_INSPECTOR_REPEAT_THRESHOLD', 10)
+QUERY_INSPECTOR_SLOW_MS = getattr(settings, 'QUERY_INSPECTOR_SLOW_MS', 200)
+QUERY_INSPECTOR_BUFFER = getattr(settings, 'QUERY_INSPECTOR_BUFFER', 200)
+QUERY_INSPECTOR_EXPLAIN_INTERVAL = getattr(settings, 'QUERY_INSPECTOR_EXPLAIN_INTERVAL', 300)
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=2048)
+def normalize(sql):
+    """Return `sql` with literals and placeholders replaced by `?` and
+    IN lists collapsed, so the same query shape always looks the same."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql.replace('%s', '?'))
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode('utf-8')).hexdigest()[:12]
+
+
+class QueryInspector(QueryCounter):
+    """QueryCounter that also keeps slow statements and, when `sampled`,
+    per-fingerprint counts."""
+
+    def __init__(self, sampled=False):
+        super().__init__()
+        self.sampled = sampled
+        self.slow = []
+        # normalized sql -> [count, seconds]
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.monotonic() - start
+            self.count += 1
+            self.seconds += elapsed
+            if elapsed * 1000.0 >= QUERY_INSPECTOR_SLOW_MS:
+                self.slow.append((sql, None if many else params, elapsed))
+            if self.sampled:
+                entry = self.statements.setdefault(normalize(sql), [0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+
+
+def new_inspector():
+    sampled = QUERY_INSPECTOR_ENABLED and random.random() < QUERY_INSPECTOR_SAMPLE_RATE
+    return QueryInspector(sampled=sampled)
+
+
+class FindingLog:
+    """Bounded ring buffer of findings, mirrored to a per-process file."""
+
+    def __init__(self, directory=METRICS_DIR, size=QUERY_INSPECTOR_BUFFER):
+        self.directory = directory
+        self.size = size
+        self._lock = threading.Lock()
+        self._explained = {}
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._path = os.path.join(self.directory, f'findings-{self._pid}-{time.time_ns()}.json')
+        self._findings = collections.deque(maxlen=self.size)
+
+    def record(self, inspector, method, route, path):
+        """Turn what `inspector` saw during one request into findings."""
+        if not QUERY_INSPECTOR_ENABLED:
+            return []
+        now = timezone.now().isoformat()
+        base = {'time': now, 'method': method, 'route': route, 'path': path}
+        findings = []
+        for sql, (count, seconds) in inspector.statements.items():
+            if count >= QUERY_INSPECTOR_REPEAT_THRESHOLD:
+                findings.append({
+                    **base, 'kind': 'repeated', 'fingerprint': fingerprint(sql),
+                    'sql': sql, 'count': count, 'seconds': round(seconds, 6),
+                })
+        for sql, params, seconds in inspector.slow:
+            normalized = normalize(sql)
+            findings.append({
+                **base, 'kind': 'slow', 'fingerprint': fingerprint(normalized),
+                'sql': normalized, 'seconds': round(seconds, 6),
+                'explain': self._explain(normalized, sql, params),
+            })
+        for finding in findings:
+            if finding['kind'] == 'repeated':
+                logger.warning(
+                    'Repeated query (%d times, %.2fms) in %s %s: %s',
+                    finding['count'], finding['seconds'] * 1000.0, method, route, finding['sql'],
+                )
+            else:
+                logger.warning(
+                    'Slow query (%.2fms) in %s %s: %s; explain: %s',
+                    finding['seconds'] * 1000.0, method, route, finding['sql'], finding['explain'],
+                )
+        if findings:
+            self._add(findings)
+        return findings
+
+    def _explain(self, normalized, sql, params):
+        """Return the MySQL EXPLAIN rows of a slow SELECT, or None."""
+        if connection.vendor != 'mysql' or params is None or sql.lstrip()[:6].upper() != 'SELECT':
+            return None
+        key = fingerprint(normalized)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained.get(key, -QUERY_INSPECTOR_EXPLAIN_INTERVAL) < QUERY_INSPECTOR_EXPLAIN_INTERVAL:
+                return None
+            self._explained[key] = now
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN {sql}', params)
+                columns = [col[0] for col in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except DatabaseError as e:
+            return {'error': str(e)}
+
+    def _add(self, findings):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            self._findings.extend(findings)
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f'{self._path}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(list(self._findings), f, default=str)
+            os.replace(tmp, self._path)
+
+    def recent(self, limit=None):
+        """Return the findings of all processes, newest first."""
+        findings = []
+        for path in glob.glob(os.path.join(self.directory, 'findings-*.json')):
+            try:
+                with open(path) as f:
+                    findings.extend(json.load(f))
+            except (OSError, ValueError):
+                continue
+        findings.sort(key=lambda f: f['time'], reverse=True)
+        return findings[:limit or self.size]
+
+
+finding_log = FindingLog()
@@ -1,15 +1,37 @@
 import time
 import logging
 
+from django.db import connection
+
+from .metrics import metrics, route_label
+from .query_inspector import finding_log, new_inspector
+
 logger = logging.getLogger(__name__)
 
 class RequestTimingMiddleware:
+    """Time each request and record it in the per-route metrics
+    (see metrics.py), along with the database queries it ran. Repeated
+    and slow queries are reported by query_inspector.py."""
+
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        start = time.time()
-        response = self.get_response(request)
-        duration = (time.time() - start) * 1000.0
-        logger.info(f"Request {request.method} {request.path} took {duration:.2f}ms")
+        queries = new_inspector()
+        start = time.monotonic()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        # Streaming responses (SSE, exports) are timed up to the first byte
+        duration = time.monotonic() - start
+        route = route_label(request)
+        metrics.observe(route, request.method, response.status_code, duration, queries.count, queries.seconds)
+        finding_log.record(queries, request.method, route, request.path)
+
+        summary = f"Request {request.method} {request.path} took {duration * 1000.0:.2f}ms ({queries.count} queries, {queries.seconds * 1000.0:.2f}ms)"
+        # Set by api.resolvers.resolver_for() when the request resolved
+        # foreign keys
+        resolver = getattr(request, 'fk_resolver', None)
+        if resolver is not None:
+            summary += f" (fk resolver: {resolver.hits} hits, {resolver.misses} misses, {resolver.queries} queries)"
+        logger.info(summary)
         return response
@@ -2,6 +2,7 @@
 """
 Sample Data Population Script for Asset Management System
 This script creates realistic sample data for testing and demonstration purposes.
+For load tests and benchmarks use `python manage.py generate_dataset` instead.
 """
 import os
 import sys
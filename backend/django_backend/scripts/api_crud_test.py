@@ -1,5 +1,15 @@
+"""
+Functional CRUD smoke test: GET/POST/PATCH/DELETE once against every
+resource of a running server, printing each status and timing.
+
+Usage:
+  python scripts/api_crud_test.py [BASE_URL]
+
+Needs `requests`. `resources` (the create payloads) is also used by
+scripts/load_test.py, so importing this module must not need it.
+"""
+import sys
 import time
-import requests
 
 BASE = 'http://127.0.0.1:8000'
 
@@ -47,86 +57,92 @@ resources = {
     }
 }
 
-session = requests.Session()
-
-results = {}
-created_ids = {}
 
-for name, spec in resources.items():
-    url = f"{BASE}/api/{name}/"
-    print(f"Testing {name} -> {url}")
-    # GET
-    t0 = time.time()
-    r_get = session.get(url, timeout=5)
-    t_get = time.time() - t0
-    print(f"  GET {r_get.status_code} ({t_get*1000:.0f} ms)")
+def run(base=BASE):
+    import requests
 
-    # CREATE if payload provided
-    created_id = None
-    if spec.get('create'):
-        payload = dict(spec['create'])
-        # substitute dependent ids from created_ids if placeholders present
-        for k, v in payload.items():
-            if v is None and k in ('asset', 'user', 'buyer', 'staff'):
-                # pick up ids from created resources if available
-                if k == 'asset' and 'assets' in created_ids:
-                    payload[k] = created_ids['assets']
-                if k == 'user' and 'users' in created_ids:
-                    payload[k] = created_ids['users']
-                if k == 'buyer' and 'buyers' in created_ids:
-                    payload[k] = created_ids['buyers']
-                if k == 'staff' and 'maintenance-staff' in created_ids:
-                    payload[k] = created_ids['maintenance-staff']
+    session = requests.Session()
+    created_ids = {}
 
+    for name, spec in resources.items():
+        url = f"{base}/api/{name}/"
+        print(f"Testing {name} -> {url}")
+        # GET
         t0 = time.time()
-        r_post = session.post(url, json=payload, timeout=5)
-        t_post = time.time() - t0
-        print(f"  POST {r_post.status_code} ({t_post*1000:.0f} ms)")
-        if not r_post.ok:
-            try:
-                print('    POST error body:', r_post.json())
-            except Exception:
-                print('    POST error body (text):', r_post.text[:500])
-        if r_post.ok:
-            try:
-                data = r_post.json()
-                created_id = data.get(spec['patch_key']) or data.get('id')
-                print(f"    created id: {created_id}")
-                # store created id by resource name for dependencies
-                created_ids[name] = created_id
-            except Exception as e:
-                print("    post response not json", e)
+        r_get = session.get(url, timeout=5)
+        t_get = time.time() - t0
+        print(f"  GET {r_get.status_code} ({t_get*1000:.0f} ms)")
 
-    # UPDATE if created (use PATCH to avoid full-object requirements)
-    if created_id:
-        put_url = f"{url}{created_id}/"
-        patch_payload = {}
+        # CREATE if payload provided
+        created_id = None
         if spec.get('create'):
-            # pick one field to patch (if any strings present)
-            for k, v in spec['create'].items():
-                if isinstance(v, str) and v:
-                    patch_payload[k] = v + ' (edited)'
-                    break
-        if patch_payload:
+            payload = dict(spec['create'])
+            # substitute dependent ids from created_ids if placeholders present
+            for k, v in payload.items():
+                if v is None and k in ('asset', 'user', 'buyer', 'staff'):
+                    # pick up ids from created resources if available
+                    if k == 'asset' and 'assets' in created_ids:
+                        payload[k] = created_ids['assets']
+                    if k == 'user' and 'users' in created_ids:
+                        payload[k] = created_ids['users']
+                    if k == 'buyer' and 'buyers' in created_ids:
+                        payload[k] = created_ids['buyers']
+                    if k == 'staff' and 'maintenance-staff' in created_ids:
+                        payload[k] = created_ids['maintenance-staff']
+
             t0 = time.time()
-            r_patch = session.patch(put_url, json=patch_payload, timeout=5)
-            t_patch = time.time() - t0
-            print(f"  PATCH {r_patch.status_code} ({t_patch*1000:.0f} ms)")
-            if not r_patch.ok:
+            r_post = session.post(url, json=payload, timeout=5)
+            t_post = time.time() - t0
+            print(f"  POST {r_post.status_code} ({t_post*1000:.0f} ms)")
+            if not r_post.ok:
                 try:
-                    print('    PATCH error body:', r_patch.json())
+                    print('    POST error body:', r_post.json())
                 except Exception:
-                    print('    PATCH error body (text):', r_patch.text[:500])
+                    print('    POST error body (text):', r_post.text[:500])
+            if r_post.ok:
+                try:
+                    data = r_post.json()
+                    created_id = data.get(spec['patch_key']) or data.get('id')
+                    print(f"    created id: {created_id}")
+                    # store created id by resource name for dependencies
+                    created_ids[name] = created_id
+                except Exception as e:
+                    print("    post response not json", e)
+
+        # UPDATE if created (use PATCH to avoid full-object requirements)
+        if created_id:
+            put_url = f"{url}{created_id}/"
+            patch_payload = {}
+            if spec.get('create'):
+                # pick one field to patch (if any strings present)
+                for k, v in spec['create'].items():
+                    if isinstance(v, str) and v:
+                        patch_payload[k] = v + ' (edited)'
+                        break
+            if patch_payload:
+                t0 = time.time()
+                r_patch = session.patch(put_url, json=patch_payload, timeout=5)
+                t_patch = time.time() - t0
+                print(f"  PATCH {r_patch.status_code} ({t_patch*1000:.0f} ms)")
+                if not r_patch.ok:
+                    try:
+                        print('    PATCH error body:', r_patch.json())
+                    except Exception:
+                        print('    PATCH error body (text):', r_patch.text[:500])
+
+            # DELETE
+            t0 = time.time()
+            r_del = session.delete(put_url, timeout=5)
+            t_del = time.time() - t0
+            print(f"  DELETE {r_del.status_code} ({t_del*1000:.0f} ms)")
+            if not r_del.ok and r_del.status_code != 204:
+                try:
+                    print('    DELETE error body:', r_del.json())
+                except Exception:
+                    print('    DELETE error body (text):', r_del.text[:500])
+
+    print('\nAll tests completed')
 
-        # DELETE
-        t0 = time.time()
-        r_del = session.delete(put_url, timeout=5)
-        t_del = time.time() - t0
-        print(f"  DELETE {r_del.status_code} ({t_del*1000:.0f} ms)")
-        if not r_del.ok and r_del.status_code != 204:
-            try:
-                print('    DELETE error body:', r_del.json())
-            except Exception:
-                print('    DELETE error body (text):', r_del.text[:500])
 
-print('\nAll tests completed')
+if __name__ == '__main__':
+    run(sys.argv[1] if len(sys.argv) > 1 else BASE)
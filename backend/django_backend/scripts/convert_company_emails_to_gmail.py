@@ -2,7 +2,9 @@
 """
 Convert remaining users with @company.com emails to @gmail.com.
 Idempotent: skips users already using @gmail.com and ensures uniqueness.
+Runs as a resumable batch job (see api/batch.py); --dry-run only reports.
 """
+import argparse
 import os
 import sys
 import django
@@ -11,40 +13,51 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_django.settings')
 django.setup()
 
+from api.batch import BatchError, BatchJob, add_batch_arguments, batch_options, unique_values
 from api.models import User
 
-changed = 0
-skipped = 0
-collisions = []
-
-users = list(User.objects.filter(email__iendswith='@company.com'))
-print(f'Found {len(users)} users with @company.com')
-
-for u in users:
-    local = u.email.split('@')[0]
-    candidate = f'{local}@gmail.com'
-    # if candidate exists and not same user, append suffix to make unique
-    if User.objects.filter(email__iexact=candidate).exclude(pk=u.pk).exists():
-        # try local.N pattern
-        suffix = 1
-        new_candidate = f'{local}.{suffix}@gmail.com'
-        while User.objects.filter(email__iexact=new_candidate).exclude(pk=u.pk).exists():
-            suffix += 1
-            new_candidate = f'{local}.{suffix}@gmail.com'
-        candidate = new_candidate
-        collisions.append((u.email, candidate))
-    # apply update
-    if u.email != candidate:
-        u.email = candidate
-        u.save()
-        changed += 1
-    else:
-        skipped += 1
-
-print(f'Emails changed: {changed}')
-if collisions:
-    print('Collisions resolved:')
-    for old, new in collisions[:20]:
-        print(f'  {old} -> {new}')
-print(f'Skipped (already matching): {skipped}')
-print('Done')
+
+class GmailJob(BatchJob):
+    name = 'convert_company_emails_to_gmail'
+    model = User
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.claimed = {}
+        self.collisions = []
+
+    def get_queryset(self):
+        return User.objects.filter(email__iendswith='@company.com')
+
+    def prepare(self, users):
+        # if a candidate exists for another user, try the local.N pattern
+        wanted = {u.pk: f"{u.email.split('@')[0]}@gmail.com" for u in users}
+        self.emails = unique_values(
+            User, 'email', wanted, lambda email, n: email.replace('@', f'.{n}@', 1), self.claimed, key=str.lower,
+        )
+        self.collisions += [(u.email, self.emails[u.pk]) for u in users if self.emails[u.pk] != wanted[u.pk]]
+
+    def change(self, user):
+        candidate = self.emails[user.pk]
+        return {'email': candidate} if user.email != candidate else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert @company.com emails to @gmail.com')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+
+    job = GmailJob(commit=not args.dry_run, **batch_options(vars(args)))
+    try:
+        job.run()
+    except BatchError as e:
+        sys.exit(str(e))
+
+    print(f'Emails changed: {job.changed}')
+    if job.collisions:
+        print('Collisions resolved:')
+        for old, new in job.collisions[:20]:
+            print(f'  {old} -> {new}')
+    print(f'Skipped (already matching): {job.scanned - job.changed}')
+    print('Done')
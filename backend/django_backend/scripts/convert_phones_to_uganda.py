@@ -5,7 +5,9 @@ Convert stored phone numbers to Uganda format (+256...).
 - If phone starts with '0' and looks like a local number (e.g., 0780597659), convert to +2567... by replacing leading 0 with +256.
 - If phone is in other formats (e.g., +1-555-1001), generate a deterministic Ugandan number based on user id.
 Idempotent: only writes when a change is necessary.
+Runs as a resumable batch job (see api/batch.py); --dry-run only reports.
 """
+import argparse
 import os
 import sys
 import django
@@ -15,45 +17,59 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_django.settings')
 django.setup()
 
+from api.batch import BatchError, BatchJob, add_batch_arguments, batch_options
 from api.models import User
 
-changed = 0
-sample_updates = []
-
-users = list(User.objects.all())
-for u in users:
-    orig = (u.phone or '').strip()
-    if not orig:
-        continue
-    new = orig
-    # if already +256, normalized
-    if orig.startswith('+256'):
-        continue
+
+def uganda_phone(user):
+    orig = (user.phone or '').strip()
+    # empty, or already +256: leave it
+    if not orig or orig.startswith('+256'):
+        return None
     # if starts with 0 and looks like local UG number (10 digits)
     digits = re.sub(r'[^0-9]', '', orig)
     if orig.startswith('0') and len(digits) in (10, 9, 7):
         # drop leading 0 and prepend +256
-        if digits.startswith('0'):
-            digits_no0 = digits[1:]
-        else:
-            digits_no0 = digits
-        new = f'+256{digits_no0}'
-    else:
-        # generate deterministic ug number based on user id to avoid collisions
-        # pattern: +2567PPNNNNN where PP from user id and NNNNN from mod
-        uid = u.pk or 0
-        pp = f"{uid%10}{(uid//10)%10}"
-        nnnnn = f"{(uid*997) % 100000:05d}"
-        new = f'+2567{pp}{nnnnn}'
-
-    if new != orig:
-        u.phone = new
-        u.save()
-        changed += 1
-        if len(sample_updates) < 20:
-            sample_updates.append((u.email, orig, new))
-
-print(f'Phones updated: {changed}')
-for e, o, n in sample_updates:
-    print(f' - {e}: {o} -> {n}')
-print('Done')
+        digits_no0 = digits[1:] if digits.startswith('0') else digits
+        return f'+256{digits_no0}'
+    # generate deterministic ug number based on user id to avoid collisions
+    # pattern: +2567PPNNNNN where PP from user id and NNNNN from mod
+    uid = user.pk or 0
+    pp = f"{uid%10}{(uid//10)%10}"
+    nnnnn = f"{(uid*997) % 100000:05d}"
+    return f'+2567{pp}{nnnnn}'
+
+
+class UgandaPhoneJob(BatchJob):
+    name = 'convert_phones_to_uganda'
+    model = User
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sample_updates = []
+
+    def change(self, user):
+        new = uganda_phone(user)
+        if new is None or new == (user.phone or '').strip():
+            return None
+        if len(self.sample_updates) < 20:
+            self.sample_updates.append((user.email, user.phone, new))
+        return {'phone': new}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert phone numbers to +256 format')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+
+    job = UgandaPhoneJob(commit=not args.dry_run, **batch_options(vars(args)))
+    try:
+        job.run()
+    except BatchError as e:
+        sys.exit(str(e))
+
+    print(f'Phones updated: {job.changed}')
+    for e, o, n in job.sample_updates:
+        print(f' - {e}: {o} -> {n}')
+    print('Done')
@@ -0,0 +1,468 @@
+#!/usr/bin/env python
+"""
+Concurrent HTTP load generator for a running API server (standard library
+only: asyncio plus a small keep-alive HTTP/1.1 client).
+
+Drives a weighted mix of scenarios, each one "user action" made of one or
+more requests:
+
+  dashboard  poll the three reports (with If-None-Match, as the dashboard
+             does) and the latest assets page
+  browse     page through assets with the keyset cursor, open one asset
+  assign     create an assignment for a random asset/user; sometimes
+             mark an earlier one returned
+  crud       create, edit and delete a category (payloads from
+             api_crud_test.py)
+
+Load is either closed (`--concurrency N` virtual users, each starting its
+next action when the last one finishes) or open (`--rate R` actions per
+second, Poisson arrivals, at most `--max-in-flight` at once; arrivals
+beyond that are counted as dropped, which means the client, not the
+server, is the bottleneck).
+
+Prints a line per `--interval` seconds and a per-request summary with
+throughput, error rate and latency percentiles. `--csv` writes the time
+series, `--json` the summary. Writes go to the target database; point it at
+a test or staging copy. `--cleanup` deletes the assignments it created.
+
+Usage:
+  python scripts/load_test.py --concurrency 20 --duration 60
+  python scripts/load_test.py --rate 50 --mix dashboard=6,browse=3,assign=1 --csv series.csv
+"""
+import argparse
+import asyncio
+import csv
+import datetime
+import json
+import math
+import os
+import random
+import sys
+import time
+import urllib.parse
+from collections import deque
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from api_crud_test import BASE, resources
+
+DEFAULT_MIX = 'dashboard=4,browse=4,assign=2'
+REPORTS = ('assets-by-category', 'valuation-histogram', 'sales')
+PERCENTILES = (50, 90, 95, 99)
+SERIES_FIELDS = ('elapsed_s', 'requests', 'rps', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'in_flight', 'dropped')
+
+
+class HttpError(Exception):
+    pass
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection."""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        """Return (status, headers, body bytes). Reconnects once if a
+        reused connection turns out to have been closed by the server."""
+        reused = self.writer is not None
+        try:
+            return await asyncio.wait_for(self._request(method, path, body, headers), self.timeout)
+        except (ConnectionError, asyncio.IncompleteReadError, HttpError):
+            await self.close()
+            if not reused:
+                raise
+        return await asyncio.wait_for(self._request(method, path, body, headers), self.timeout)
+
+    async def _request(self, method, path, body, headers):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = b'' if body is None else json.dumps(body).encode('utf-8')
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Accept: application/json']
+        if body is not None:
+            lines += ['Content-Type: application/json']
+        if body is not None or method in ('POST', 'PUT', 'PATCH'):
+            lines += [f'Content-Length: {len(payload)}']
+        lines += [f'{k}: {v}' for k, v in (headers or {}).items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise HttpError('connection closed before the response')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            data = b''
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            parts = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if not size:
+                    await self.reader.readline()
+                    break
+                parts.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            data = b''.join(parts)
+        elif 'content-length' in response_headers:
+            data = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            data = await self.reader.read()
+            await self.close()
+            return status, response_headers, data
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, data
+
+
+class Recorder:
+    """Per-request-label results, overall and per time-series interval."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.started = time.monotonic()
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+        self.dropped = 0
+        self.in_flight = 0
+        self.series = []
+        self._window = []
+        self._window_errors = 0
+
+    def record(self, label, seconds, status):
+        self.latencies.setdefault(label, []).append(seconds)
+        error = status is None or status >= 400
+        if error:
+            self.errors[label] = self.errors.get(label, 0) + 1
+            self._window_errors += 1
+        key = 'error' if status is None else f'{status // 100}xx'
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        self._window.append(seconds)
+
+    def tick(self):
+        """Close the current interval and return its time-series row."""
+        window, self._window = sorted(self._window), []
+        errors, self._window_errors = self._window_errors, 0
+        row = {
+            'elapsed_s': round(time.monotonic() - self.started, 1),
+            'requests': len(window),
+            'rps': round(len(window) / self.interval, 1),
+            'errors': errors,
+            'p50_ms': round(percentile(window, 50) * 1000, 1),
+            'p95_ms': round(percentile(window, 95) * 1000, 1),
+            'p99_ms': round(percentile(window, 99) * 1000, 1),
+            'in_flight': self.in_flight,
+            'dropped': self.dropped,
+        }
+        self.series.append(row)
+        return row
+
+    def summary(self, elapsed):
+        rows = {}
+        everything = []
+        for label, values in sorted(self.latencies.items()):
+            everything += values
+            rows[label] = _stats(sorted(values), self.errors.get(label, 0), elapsed)
+        rows['TOTAL'] = _stats(sorted(everything), sum(self.errors.values()), elapsed)
+        return rows
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of a sorted list (0 when empty)."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(p / 100.0 * len(ordered)) - 1)]
+
+
+def _stats(ordered, errors, elapsed):
+    stats = {
+        'requests': len(ordered),
+        'rps': round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        'error_rate': round(errors / len(ordered), 4) if ordered else 0.0,
+    }
+    for p in PERCENTILES:
+        stats[f'p{p}_ms'] = round(percentile(ordered, p) * 1000, 1)
+    stats['max_ms'] = round(ordered[-1] * 1000, 1) if ordered else 0.0
+    return stats
+
+
+class Session:
+    """What a scenario sees: timed requests on one connection, plus state
+    shared by all virtual users (known ids, cursors, ETags)."""
+
+    def __init__(self, connection, recorder, shared, rng):
+        self.connection = connection
+        self.recorder = recorder
+        self.shared = shared
+        self.rng = rng
+
+    async def request(self, label, method, path, body=None, headers=None):
+        started = time.monotonic()
+        status = None
+        try:
+            status, response_headers, data = await self.connection.request(method, path, body, headers)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, HttpError, ValueError):
+            await self.connection.close()
+            return None, {}, None
+        finally:
+            self.recorder.record(label, time.monotonic() - started, status)
+        return status, response_headers, data
+
+
+def _json(data):
+    try:
+        return json.loads(data)
+    except (TypeError, ValueError):
+        return None
+
+
+async def dashboard(session):
+    etags = session.shared['etags']
+    for name in REPORTS:
+        path = f'/api/reports/{name}/'
+        headers = {'If-None-Match': etags[path]} if path in etags else None
+        status, response_headers, _data = await session.request(f'GET report {name}', 'GET', path, headers=headers)
+        if status == 200 and 'etag' in response_headers:
+            etags[path] = response_headers['etag']
+    await session.request('GET assets latest', 'GET', '/api/assets/?page_size=20')
+
+
+async def browse(session):
+    cursors = session.shared['cursors']
+    path = '/api/assets/?page_size=50'
+    if cursors and session.rng.random() < 0.6:
+        path = session.rng.choice(cursors)
+    status, _headers, data = await session.request('GET assets page', 'GET', path)
+    page = _json(data) if status == 200 else None
+    if page and page.get('next'):
+        parts = urllib.parse.urlsplit(page['next'])
+        cursors.append(f'{parts.path}?{parts.query}')
+    asset_ids = session.shared['assets']
+    if asset_ids:
+        await session.request('GET asset detail', 'GET', f'/api/assets/{session.rng.choice(asset_ids)}/')
+
+
+async def assign(session):
+    shared, rng = session.shared, session.rng
+    if not shared['assets'] or not shared['users']:
+        return
+    today = datetime.date.today().isoformat()
+    body = {
+        'asset': rng.choice(shared['assets']), 'user': rng.choice(shared['users']),
+        'assigned_date': today, 'status': 'Active', 'description': 'load test',
+    }
+    status, _headers, data = await session.request('POST assignment', 'POST', '/api/assignments/', body)
+    created = _json(data) if status == 201 else None
+    if created:
+        shared['assignments'].append(created['assignment_id'])
+        shared['created'].append(created['assignment_id'])
+    if shared['assignments'] and rng.random() < 0.3:
+        pk = rng.choice(shared['assignments'])
+        await session.request(
+            'PATCH assignment', 'PATCH', f'/api/assignments/{pk}/', {'status': 'Returned', 'return_date': today},
+        )
+
+
+async def crud(session):
+    spec = resources['categories']
+    status, _headers, data = await session.request('POST category', 'POST', '/api/categories/', spec['create'])
+    created = _json(data) if status == 201 else None
+    if not created:
+        return
+    path = f"/api/categories/{created[spec['patch_key']]}/"
+    await session.request('PATCH category', 'PATCH', path, {'description': 'edited by load test'})
+    await session.request('DELETE category', 'DELETE', path)
+
+
+SCENARIOS = {'dashboard': dashboard, 'browse': browse, 'assign': assign, 'crud': crud}
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r} (choose from {', '.join(SCENARIOS)})")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'invalid weight in {part!r}')
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError('the mix needs a positive weight')
+    return mix
+
+
+async def discover(connection, shared):
+    """Fetch sample asset and user ids for the scenarios."""
+    for key, path, pk in (
+        ('assets', '/api/assets/?page_size=1000&fields=asset_id', 'asset_id'),
+        ('users', '/api/users/?page_size=1000&fields=user_id', 'user_id'),
+    ):
+        status, _headers, data = await connection.request('GET', path)
+        if status != 200:
+            raise HttpError(f'GET {path} returned {status}')
+        shared[key] = [row[pk] for row in _json(data)['results']]
+
+
+async def main(args):
+    target = urllib.parse.urlsplit(args.base)
+    host, port = target.hostname, target.port or 80
+    rng = random.Random(args.seed)
+    recorder = Recorder(args.interval)
+    shared = {
+        'etags': {}, 'cursors': deque(maxlen=200), 'assignments': deque(maxlen=1000),
+        'created': [], 'assets': [], 'users': [],
+    }
+    setup = Connection(host, port, args.timeout)
+    try:
+        await discover(setup, shared)
+    except (OSError, HttpError, asyncio.TimeoutError) as e:
+        print(f'Cannot reach {args.base}: {e}', file=sys.stderr)
+        return 1
+    print(f"{len(shared['assets'])} asset ids, {len(shared['users'])} user ids sampled; "
+          f"{'rate %s/s' % args.rate if args.rate else 'concurrency %d' % args.concurrency}, "
+          f"mix {', '.join(f'{k}={v:g}' for k, v in args.mix.items())}, {args.duration}s")
+
+    names = list(args.mix)
+    weights = [args.mix[n] for n in names]
+    idle = []
+    recorder.started = time.monotonic()
+    deadline = recorder.started + args.duration
+
+    async def action(connection=None):
+        own = connection is None
+        connection = connection or (idle.pop() if idle else Connection(host, port, args.timeout))
+        recorder.in_flight += 1
+        try:
+            scenario = SCENARIOS[rng.choices(names, weights)[0]]
+            await scenario(Session(connection, recorder, shared, rng))
+        finally:
+            recorder.in_flight -= 1
+            if own:
+                idle.append(connection)
+
+    async def virtual_user():
+        connection = Connection(host, port, args.timeout)
+        while time.monotonic() < deadline:
+            await action(connection)
+            if args.think:
+                await asyncio.sleep(rng.expovariate(1.0 / args.think))
+        await connection.close()
+
+    async def arrivals():
+        pending = set()
+        next_at = time.monotonic()
+        while True:
+            next_at += rng.expovariate(args.rate)
+            if next_at >= deadline:
+                break
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+            if len(pending) >= args.max_in_flight:
+                recorder.dropped += 1
+                continue
+            task = asyncio.ensure_future(action())
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending)
+
+    async def reporter():
+        writer = None
+        if args.csv:
+            handle = open(args.csv, 'w', newline='')
+            writer = csv.DictWriter(handle, fieldnames=SERIES_FIELDS)
+            writer.writeheader()
+        try:
+            while True:
+                await asyncio.sleep(args.interval)
+                row = recorder.tick()
+                print(f"[{row['elapsed_s']:>6.1f}s] {row['rps']:>8.1f} req/s  p50 {row['p50_ms']:>7.1f} ms  "
+                      f"p95 {row['p95_ms']:>7.1f} ms  p99 {row['p99_ms']:>7.1f} ms  errors {row['errors']:>4}  "
+                      f"in flight {row['in_flight']:>3}  dropped {row['dropped']}")
+                if writer:
+                    writer.writerow(row)
+                    handle.flush()
+        finally:
+            if writer:
+                handle.close()
+
+    report_task = asyncio.ensure_future(reporter())
+    if args.rate:
+        await arrivals()
+    else:
+        await asyncio.gather(*(virtual_user() for _ in range(args.concurrency)))
+    elapsed = time.monotonic() - recorder.started
+    report_task.cancel()
+    for connection in idle:
+        await connection.close()
+
+    summary = recorder.summary(elapsed)
+    print(f"\n{'request':<32} {'count':>8} {'req/s':>8} {'err %':>6} "
+          + ' '.join(f"{'p%d ms' % p:>8}" for p in PERCENTILES) + f" {'max ms':>8}")
+    for label, stats in summary.items():
+        print(f"{label:<32} {stats['requests']:>8} {stats['rps']:>8.1f} {stats['error_rate'] * 100:>6.2f} "
+              + ' '.join(f"{stats['p%d_ms' % p]:>8.1f}" for p in PERCENTILES) + f" {stats['max_ms']:>8.1f}")
+    print(f"Statuses: {', '.join(f'{k}: {v}' for k, v in sorted(recorder.statuses.items()))}; dropped arrivals: {recorder.dropped}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'base': args.base, 'duration_s': round(elapsed, 2), 'rate': args.rate,
+                'concurrency': None if args.rate else args.concurrency, 'mix': args.mix,
+                'statuses': recorder.statuses, 'dropped': recorder.dropped,
+                'requests': summary, 'series': recorder.series,
+            }, f, indent=2)
+
+    if args.cleanup and shared['created']:
+        for pk in shared['created']:
+            try:
+                await setup.request('DELETE', f'/api/assignments/{pk}/')
+            except (OSError, HttpError, asyncio.TimeoutError):
+                pass
+        print(f"Deleted {len(shared['created'])} assignments created by the run")
+    await setup.close()
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent HTTP load generator for the asset API.')
+    parser.add_argument('--base', default=BASE, help=f'Server base URL (default: {BASE})')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Scenario weights, e.g. {DEFAULT_MIX} (scenarios: {', '.join(SCENARIOS)})")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument('--concurrency', type=int, default=10, help='Virtual users in closed-loop mode (default: 10)')
+    load.add_argument('--rate', type=float, help='Actions per second in open-loop mode (Poisson arrivals)')
+    parser.add_argument('--max-in-flight', type=int, default=200, help='Open-loop cap on concurrent actions (default: 200)')
+    parser.add_argument('--think', type=float, default=0.0, help='Mean think time between actions of a virtual user, seconds')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run (default: 30)')
+    parser.add_argument('--interval', type=float, default=5.0, help='Seconds per time-series line (default: 5)')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Per-request timeout, seconds (default: 10)')
+    parser.add_argument('--seed', type=int, help='Random seed, for a repeatable sequence of actions')
+    parser.add_argument('--csv', help='Write the time series to this CSV file')
+    parser.add_argument('--json', help='Write the summary and time series to this JSON file')
+    parser.add_argument('--cleanup', action='store_true', help='Delete the assignments created by the run afterwards')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main(parse_args())))
@@ -3,7 +3,9 @@
 Update specific user NINs to Ugandan-style pattern (UGM/UGF + zero-padded number).
 This script targets an explicit list of existing NINs and replaces them deterministically.
 Idempotent: it only updates users whose current nin matches the listed old_nins.
+Runs as a resumable batch job (see api/batch.py); --dry-run only reports.
 """
+import argparse
 import os
 import sys
 import django
@@ -12,6 +14,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_django.settings')
 django.setup()
 
+from api.batch import BatchError, BatchJob, add_batch_arguments, batch_options, unique_values
 from api.models import User
 
 # The exact old NIN values to replace (in the order shown)
@@ -20,51 +23,73 @@ OLD_NINS = [
     'EMP001', 'EMP002', 'EMP003', 'EMP004', 'EMP005', 'EMP006', 'EMP007', 'EMP008', 'EMP009', 'EMP010'
 ]
 
-print('Target old NINs:', OLD_NINS)
 
-updated = []
-missing = []
-conflicts = []
-
-for idx, old in enumerate(OLD_NINS, start=1):
+def new_nin_for(idx):
     # Decide gender: odd index -> male (M), even -> female (F)
-    gender = 'M' if (idx % 2) == 1 else 'F'
-    prefix = f'UGM' if gender == 'M' else f'UGF'
-    new_nin = f"{prefix}{idx:07d}"
-
-    user = User.objects.filter(nin=old).first()
-    if not user:
-        missing.append(old)
-        continue
-
-    # if new_nin already assigned to someone else (conflict), record and append suffix
-    if User.objects.filter(nin=new_nin).exclude(pk=user.pk).exists():
-        suffix = 1
-        candidate = f"{new_nin}_{suffix}"
-        while User.objects.filter(nin=candidate).exclude(pk=user.pk).exists():
-            suffix += 1
-            candidate = f"{new_nin}_{suffix}"
-        conflicts.append((old, new_nin, candidate))
-        new_nin = candidate
-
-    if user.nin != new_nin:
-        old_val = user.nin
-        user.nin = new_nin
-        user.save()
-        updated.append((user.email, old_val, new_nin))
-
-print('\nUpdated records:')
-for e, old, new in updated:
-    print(f' - {e}: {old} -> {new}')
-
-if missing:
-    print('\nMissing (old NINs not found):')
-    for m in missing:
-        print(' -', m)
-
-if conflicts:
-    print('\nConflicts resolved:')
-    for old, intended, resolved in conflicts:
-        print(f' - {old}: intended {intended}, used {resolved}')
-
-print('\nDone')
+    prefix = 'UGM' if (idx % 2) == 1 else 'UGF'
+    return f"{prefix}{idx:07d}"
+
+
+class NinJob(BatchJob):
+    name = 'update_specific_nins'
+    model = User
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.claimed = {}
+        self.seen = set()
+        self.updated = []
+        self.conflicts = []
+
+    def get_queryset(self):
+        return User.objects.filter(nin__in=OLD_NINS)
+
+    def prepare(self, users):
+        # One user per old NIN: the first by id
+        self.targets = {}
+        for user in users:
+            if user.nin not in self.seen:
+                self.seen.add(user.nin)
+                self.targets[user.pk] = new_nin_for(OLD_NINS.index(user.nin) + 1)
+        # if the new nin is already assigned to someone else (conflict), append a suffix
+        self.nins = unique_values(User, 'nin', self.targets, lambda nin, n: f'{nin}_{n}', self.claimed)
+        self.conflicts += [(u.nin, self.targets[u.pk], self.nins[u.pk]) for u in users
+                           if u.pk in self.nins and self.nins[u.pk] != self.targets[u.pk]]
+
+    def change(self, user):
+        new_nin = self.nins.get(user.pk)
+        if new_nin is None or user.nin == new_nin:
+            return None
+        self.updated.append((user.email, user.nin, new_nin))
+        return {'nin': new_nin}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replace the listed placeholder NINs')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+
+    print('Target old NINs:', OLD_NINS)
+    job = NinJob(commit=not args.dry_run, **batch_options(vars(args)))
+    try:
+        job.run()
+    except BatchError as e:
+        sys.exit(str(e))
+
+    print('\nUpdated records:')
+    for e, old, new in job.updated:
+        print(f' - {e}: {old} -> {new}')
+
+    missing = [old for old in OLD_NINS if old not in job.seen]
+    if missing:
+        print('\nMissing (old NINs not found):')
+        for m in missing:
+            print(' -', m)
+
+    if job.conflicts:
+        print('\nConflicts resolved:')
+        for old, intended, resolved in job.conflicts:
+            print(f' - {old}: intended {intended}, used {resolved}')
+
+    print('\nDone')
@@ -2,10 +2,12 @@
 """
 Update 'test.userN@example.com' users to have realistic full names.
 Idempotent: will update only users that exist and report counts.
+Runs as a resumable batch job (see api/batch.py); --dry-run only reports.
 
 Usage:
-  python scripts/update_test_user_names.py
+  python scripts/update_test_user_names.py [--dry-run]
 """
+import argparse
 import os
 import sys
 import django
@@ -14,9 +16,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_django.settings')
 django.setup()
 
+from api.batch import BatchError, BatchJob, add_batch_arguments, batch_options, unique_values
 from api.models import User
 import re
 from django.db.models import Q
+from django.db.models.functions import Lower
 
 REAL_NAMES = [
     # A list of 50 (local) Ugandan-style full names (mixed genders)
@@ -35,98 +39,121 @@ REAL_NAMES = [
 if len(REAL_NAMES) < 50:
     raise SystemExit('REAL_NAMES must contain at least 50 names')
 
-updated = 0
-missing = []
-
-for i in range(1, 51):
-    new_name = REAL_NAMES[i-1]
-    # helper to slugify names (kept inside file scope)
-    def slugify_name_local(n: str) -> str:
-        s = n.lower()
-        s = re.sub(r"[^a-z0-9\s]", "", s)
-        s = re.sub(r"\s+", ".", s.strip())
-        return s
-
-    # Try a few ways to locate the user record (idempotent & robust):
-    # 1) exact test.user{i}@example.com
-    # 2) test.user{i}@gmail.com
-    # 3) slugified-name@example.com or @gmail.com
-    # 4) name exact match
-    # 5) any email containing 'test.user{i}'
-    try:
-        user = None
-        candidates = [
-            f'test.user{i}@example.com',
-            f'test.user{i}@gmail.com',
-        ]
-        base_local = slugify_name_local(new_name)
-        candidates += [f'{base_local}@example.com', f'{base_local}@gmail.com']
-
-        for c in candidates:
-            user = User.objects.filter(email__iexact=c).first()
-            if user:
-                break
-
-        if not user:
-            user = User.objects.filter(name__iexact=new_name).first()
-        if not user:
-            user = User.objects.filter(email__icontains=f'test.user{i}').first()
-        if user:
-            changed = False
-            if user.name != new_name:
-                user.name = new_name
-                changed = True
-            # Set a Ugandan mobile number pattern: +2567PP###### (common provider prefixes 70-79)
-            ug_prefixes = ['70','71','72','73','74','75','76','77','78','79']
-            prefix = ug_prefixes[(i-1) % len(ug_prefixes)]
-            # Deterministic unique suffix per user
-            rest = f"{100000 + i:06d}"[-6:]
-            ug_number = f'+2567{prefix}{rest}'
-            if (not user.phone) or (user.phone != ug_number):
-                user.phone = ug_number
-                changed = True
-
-            # Generate a simple Ugandan NIN-style identifier with gendered prefix
-            # Note: This is a sample/test identifier, not a real government NIN format.
-            gender = 'M' if (i % 2) == 1 else 'F'  # odd -> male, even -> female
-            nin_prefix = f'UG{ "M" if gender == "M" else "F" }'
-            nin_number = f"{i:07d}"  # zero-padded numeric suffix
-            new_nin = f"{nin_prefix}{nin_number}"
-            if (not user.nin) or (user.nin != new_nin):
-                user.nin = new_nin
-                changed = True
-
-            # Generate an email from the name (slugified). Ensure uniqueness.
-            def slugify_name(n: str) -> str:
-                s = n.lower()
-                s = re.sub(r"[^a-z0-9\s]", "", s)
-                s = re.sub(r"\s+", ".", s.strip())
-                return s
+# Set a Ugandan mobile number pattern: +2567PP###### (common provider prefixes 70-79)
+ug_prefixes = ['70','71','72','73','74','75','76','77','78','79']
+
+
+def slugify_name(n: str) -> str:
+    s = n.lower()
+    s = re.sub(r"[^a-z0-9\s]", "", s)
+    s = re.sub(r"\s+", ".", s.strip())
+    return s
+
 
+def target_values(i):
+    """The name, phone and NIN test user i (1-50) should have."""
+    prefix = ug_prefixes[(i-1) % len(ug_prefixes)]
+    # Deterministic unique suffix per user
+    rest = f"{100000 + i:06d}"[-6:]
+    # Generate a simple Ugandan NIN-style identifier with gendered prefix
+    # Note: This is a sample/test identifier, not a real government NIN format.
+    gender = 'M' if (i % 2) == 1 else 'F'  # odd -> male, even -> female
+    return {'name': REAL_NAMES[i-1], 'phone': f'+2567{prefix}{rest}', 'nin': f'UG{gender}{i:07d}'}
+
+
+class TestUserJob(BatchJob):
+    """Locates the test users in one scan of the candidates (idempotent &
+    robust): by test.user{i}@example.com / @gmail.com or the slugified
+    name at either domain, then by exact name, then by an email containing
+    test.user{i}. Each index updates at most one user, the first found."""
+    name = 'update_test_user_names'
+    model = User
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.by_email = {}
+        for i, new_name in enumerate(REAL_NAMES[:50], start=1):
             base_local = slugify_name(new_name)
-            candidate = f"{base_local}@gmail.com"
-            # If candidate email is used by a different user, append the index to make unique
-            if User.objects.filter(email=candidate).exclude(pk=user.pk).exists():
-                candidate = f"{base_local}.{i}@gmail.com"
-
-            if user.email != candidate:
-                user.email = candidate
-                changed = True
-
-            if changed:
-                user.save()
-                updated += 1
-        else:
-                orig_identifier = f'test.user{i}@example.com'
-                missing.append(orig_identifier)
-    except Exception as e:
-            print(f'Error updating {orig_identifier}: {e}')
-
-print('Update complete')
-print(f'Users updated: {updated}')
-if missing:
-    print(f'Missing (not present in DB): {len(missing)}')
-    for m in missing:
-        print(' -', m)
-else:
-    print('All test users found (or none were missing).')
+            for c in (f'test.user{i}@example.com', f'test.user{i}@gmail.com', f'{base_local}@example.com', f'{base_local}@gmail.com'):
+                self.by_email.setdefault(c, i)
+        self.by_name = {}
+        self.by_slug = {}
+        for i, new_name in enumerate(REAL_NAMES[:50], start=1):
+            self.by_name.setdefault(new_name.lower(), i)
+            self.by_slug.setdefault(slugify_name(new_name), i)
+        self.claimed = {}
+        self.found = set()
+
+    def setup(self):
+        # A resumed run skips the users the earlier run already did: rebuild
+        # the indexes they took and the emails they were given, so they are
+        # neither reported missing nor handed out again
+        if not self.last_pk:
+            return
+        done = self.get_queryset().filter(pk__lte=self.last_pk).only('email', 'name').order_by('pk')
+        for user in done:
+            i = self.index_of(user)
+            if i is not None and i not in self.found:
+                self.found.add(i)
+                self.claimed[user.email] = user.pk
+
+    def get_queryset(self):
+        return User.objects.alias(email_lower=Lower('email'), name_lower=Lower('name')).filter(
+            Q(email_lower__in=list(self.by_email)) | Q(name_lower__in=list(self.by_name)) | Q(email__icontains='test.user')
+        )
+
+    def index_of(self, user):
+        i = self.by_email.get((user.email or '').lower()) or self.by_name.get((user.name or '').lower())
+        if i is None:
+            match = re.search(r'test\.user(\d+)', user.email or '', re.IGNORECASE)
+            i = int(match.group(1)) if match and 1 <= int(match.group(1)) <= 50 else None
+        return i
+
+    def prepare(self, users):
+        self.targets = {}
+        for user in users:
+            i = self.index_of(user)
+            if i is not None and i not in self.found:
+                self.found.add(i)
+                self.targets[user.pk] = i
+        # Generate an email from the name (slugified). If it is used by a
+        # different user, append the index to make it unique.
+        wanted = {pk: f"{slugify_name(REAL_NAMES[i-1])}@gmail.com" for pk, i in self.targets.items()}
+
+        def variant(email, n):
+            local = email.split('@')[0]
+            i = self.by_slug[local]
+            return f"{local}.{i}@gmail.com" if n == 1 else f"{local}.{i}.{n}@gmail.com"
+
+        self.emails = unique_values(User, 'email', wanted, variant, self.claimed)
+
+    def change(self, user):
+        i = self.targets.get(user.pk)
+        if i is None:
+            return None
+        values = dict(target_values(i), email=self.emails[user.pk])
+        values = {field: value for field, value in values.items() if getattr(user, field) != value}
+        return values or None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Give the test users realistic names, phones, NINs and emails')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+
+    job = TestUserJob(commit=not args.dry_run, **batch_options(vars(args)))
+    try:
+        job.run()
+    except BatchError as e:
+        sys.exit(str(e))
+
+    missing = [f'test.user{i}@example.com' for i in range(1, 51) if i not in job.found]
+    print('Update complete')
+    print(f'Users updated: {job.changed}')
+    if missing:
+        print(f'Missing (not present in DB): {len(missing)}')
+        for m in missing:
+            print(' -', m)
+    else:
+        print('All test users found (or none were missing).')
@@ -3,6 +3,7 @@
 Mark a subset of test users inactive.
 Default behavior: mark every 5th test user (test.user5@example.com, test.user10@..., ..., test.user50@...) as Inactive.
 Idempotent: only updates users that exist and reports counts.
+Runs as a resumable batch job (see api/batch.py); --dry-run only reports.
 
 Usage:
   python scripts/update_test_user_statuses.py
@@ -20,11 +21,35 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_django.settings')
 django.setup()
 
+from api.batch import BatchError, BatchJob, add_batch_arguments, batch_options
 from api.models import User
 
+
+class InactiveJob(BatchJob):
+    name = 'update_test_user_statuses'
+    model = User
+
+    def __init__(self, indices, **kwargs):
+        super().__init__(**kwargs)
+        self.emails = [f'test.user{i}@example.com' for i in indices]
+        self.found = set()
+
+    def options(self):
+        return {'emails': self.emails}
+
+    def get_queryset(self):
+        return User.objects.filter(email__in=self.emails)
+
+    def change(self, user):
+        self.found.add(user.email)
+        return {'status': 'Inactive'} if user.status != 'Inactive' else None
+
+
 parser = argparse.ArgumentParser()
 parser.add_argument('--every', type=int, default=5, help='Mark every Nth user inactive (default 5)')
 parser.add_argument('--list', type=str, default='', help='Comma-separated list of indices to mark inactive (overrides --every)')
+parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+add_batch_arguments(parser)
 args = parser.parse_args()
 
 indices = []
@@ -42,22 +67,15 @@ else:
 
 print('Will mark these test user indices inactive:', indices)
 
-updated = 0
-missing = []
-
-for i in indices:
-    email = f'test.user{i}@example.com'
-    user = User.objects.filter(email=email).first()
-    if not user:
-        missing.append(email)
-        continue
-    if user.status != 'Inactive':
-        user.status = 'Inactive'
-        user.save()
-        updated += 1
+job = InactiveJob(indices, commit=not args.dry_run, **batch_options(vars(args)))
+try:
+    job.run()
+except BatchError as e:
+    sys.exit(str(e))
 
+missing = [email for email in job.emails if email not in job.found]
 print('Operation complete')
-print(f'Users updated to Inactive: {updated}')
+print(f'Users updated to Inactive: {job.changed}')
 if missing:
     print(f'Missing (not present in DB): {len(missing)}')
     for m in missing:
@@ -39,6 +39,7 @@ import {
 } from "lucide-react";
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:8000";
+const DASHBOARD_REPORT_URL = `${API_BASE_URL}/api/reports/dashboard/?bucket=1000`;
 
 const COLORS = ["#10b981", "#06b6d4", "#f97316", "#8b5cf6", "#ef4444", "#f59e0b", "#ec4899", "#6366f1"];
 const CHART_COLORS = {
@@ -66,10 +67,11 @@ export default function DashboardPage() {
   const { data: polledMaintenance } = usePolling<any[]>(`${API_BASE_URL}/api/maintenance/`, 15000, true);
   const { data: polledDisposals } = usePolling<any[]>(`${API_BASE_URL}/api/disposals/`, 15000, true);
   const { data: polledValuations } = usePolling<any[]>(`${API_BASE_URL}/api/valuations/`, 15000, true);
-  const { data: polledSales } = usePolling<any>(`${API_BASE_URL}/api/reports/sales/`, 15000, true);
-  // Reports polling
-  const { data: assetsByCategory } = usePolling<any[]>(`${API_BASE_URL}/api/reports/assets-by-category/`, 15000, true);
-  const { data: valuationHistogram } = usePolling<any[]>(`${API_BASE_URL}/api/reports/valuation-histogram/?bucket=1000`, 15000, true);
+  // Reports polling: one request for all report data (see /api/reports/dashboard/)
+  const { data: dashboardReport } = usePolling<any>(DASHBOARD_REPORT_URL, 15000, true);
+  const polledSales = dashboardReport ? dashboardReport.sales : null;
+  const assetsByCategory = dashboardReport ? dashboardReport.assets_by_category : null;
+  const valuationHistogram = dashboardReport ? dashboardReport.valuation_histogram : null;
   // Local fallback state for cases when polling is disabled or delayed
   const [assetsByCategoryFallback, setAssetsByCategoryFallback] = useState<any[] | null>(null);
   const [valuationHistogramFallback, setValuationHistogramFallback] = useState<any[] | null>(null);
@@ -90,23 +92,13 @@ export default function DashboardPage() {
     let mounted = true;
     async function fetchFallback() {
       try {
-        if (assetsByCategory === null && assetsByCategoryFallback === null) {
-          const r = await fetch(`${API_BASE_URL}/api/reports/assets-by-category/`);
+        if (dashboardReport === null && salesReportFallback === null) {
+          const r = await fetch(DASHBOARD_REPORT_URL);
           const j = await r.json();
           if (!mounted) return;
-          setAssetsByCategoryFallback(Array.isArray(j) ? j : (j && Array.isArray(j.value) ? j.value : []));
-        }
-        if (valuationHistogram === null && valuationHistogramFallback === null) {
-          const r2 = await fetch(`${API_BASE_URL}/api/reports/valuation-histogram/?bucket=1000`);
-          const j2 = await r2.json();
-          if (!mounted) return;
-          setValuationHistogramFallback(Array.isArray(j2) ? j2 : (j2 && Array.isArray(j2.value) ? j2.value : []));
-        }
-        if (polledSales === null && salesReportFallback === null) {
-          const r3 = await fetch(`${API_BASE_URL}/api/reports/sales/`);
-          const j3 = await r3.json();
-          if (!mounted) return;
-          setSalesReportFallback(j3);
+          setAssetsByCategoryFallback(Array.isArray(j.assets_by_category) ? j.assets_by_category : []);
+          setValuationHistogramFallback(Array.isArray(j.valuation_histogram) ? j.valuation_histogram : []);
+          setSalesReportFallback(j.sales ?? null);
         }
       } catch (e) {
         // ignore fetch errors here; polling will surface them via hook
@@ -114,34 +106,31 @@ export default function DashboardPage() {
     }
     fetchFallback();
     return () => { mounted = false };
-  }, [assetsByCategory, valuationHistogram, polledSales]);
+  }, [dashboardReport]);
 
   // manual refresh helper for the debug panel
   async function refreshReports() {
     try {
-      const r = await fetch(`${API_BASE_URL}/api/reports/assets-by-category/`);
+      const r = await fetch(DASHBOARD_REPORT_URL);
       const j = await r.json();
-      setAssetsByCategoryFallback(Array.isArray(j) ? j : (j && Array.isArray(j.value) ? j.value : []));
-    } catch (e) {
-      // ignore
-    }
-    try {
-      const r2 = await fetch(`${API_BASE_URL}/api/reports/valuation-histogram/?bucket=1000`);
-      const j2 = await r2.json();
-      setValuationHistogramFallback(Array.isArray(j2) ? j2 : (j2 && Array.isArray(j2.value) ? j2.value : []));
+      setAssetsByCategoryFallback(Array.isArray(j.assets_by_category) ? j.assets_by_category : []);
+      setValuationHistogramFallback(Array.isArray(j.valuation_histogram) ? j.valuation_histogram : []);
+      setSalesReportFallback(j.sales ?? null);
     } catch (e) {
       // ignore
     }
   }
   const { data: polledAssignments } = usePolling<any[]>(`${API_BASE_URL}/api/assignments/`, 15000, true);
 
-  const totalAssets = Array.isArray(polledAssets) ? polledAssets.length : "-";
-  const activeUsers = Array.isArray(polledUsers) ? polledUsers.filter((u:any) => (u.status||"").toLowerCase() === "active").length : "-";
-  const openAssignments = Array.isArray(polledAssignments) ? polledAssignments.filter(a => { const s = (a.status||"").toLowerCase(); return s !== 'returned' && s !== 'returned_on' && s !== 'completed' }).length : "-";
+  // Headline counts come from the dashboard report; the lists are the fallback
+  const kpis = dashboardReport ? dashboardReport.kpis : null;
+  const totalAssets = kpis ? kpis.total_assets : Array.isArray(polledAssets) ? polledAssets.length : "-";
+  const activeUsers = kpis ? kpis.active_users : Array.isArray(polledUsers) ? polledUsers.filter((u:any) => (u.status||"").toLowerCase() === "active").length : "-";
+  const openAssignments = kpis ? kpis.open_assignments : Array.isArray(polledAssignments) ? polledAssignments.filter(a => { const s = (a.status||"").toLowerCase(); return s !== 'returned' && s !== 'returned_on' && s !== 'completed' }).length : "-";
   // prefer explicit 'Overdue' status for the main count; compute date-based overdue for context
-  const overdueByStatus = Array.isArray(polledAssignments) ? polledAssignments.filter(a => (a.status||"").toLowerCase() === 'overdue').length : '-'
+  const overdueByStatus = kpis ? kpis.overdue_assignments : Array.isArray(polledAssignments) ? polledAssignments.filter(a => (a.status||"").toLowerCase() === 'overdue').length : '-'
   const overdueByDate = Array.isArray(polledAssignments) ? polledAssignments.filter(a => a.return_date && new Date(a.return_date) < new Date() && ((a.status||"").toLowerCase() !== 'returned')).length : '-'
-  const openMaintenance = Array.isArray(polledMaintenance) ? polledMaintenance.length : "-";
+  const openMaintenance = kpis ? kpis.maintenance_records : Array.isArray(polledMaintenance) ? polledMaintenance.length : "-";
 
   useEffect(() => { if (Array.isArray(polledAssets)) setRecentAssets(polledAssets.slice(-3).reverse()) }, [polledAssets]);
 
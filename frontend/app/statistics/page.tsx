@@ -33,6 +33,7 @@ import {
 } from "lucide-react";
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:8000";
+const DASHBOARD_REPORT_URL = `${API_BASE_URL}/api/reports/dashboard/?bucket=1000`;
 const COLORS = ["#10b981", "#06b6d4", "#f97316", "#8b5cf6", "#ef4444", "#f59e0b", "#ec4899", "#6366f1"];
 const CHART_COLORS = {
   primary: "#10b981",
@@ -49,11 +50,12 @@ export default function StatisticsPage() {
   const { data: polledMaintenance } = usePolling<any[]>(`${API_BASE_URL}/api/maintenance/`, 15000, true);
   const { data: polledDisposals } = usePolling<any[]>(`${API_BASE_URL}/api/disposals/`, 15000, true);
   const { data: polledValuations } = usePolling<any[]>(`${API_BASE_URL}/api/valuations/`, 15000, true);
-  const { data: polledSales } = usePolling<any>(`${API_BASE_URL}/api/reports/sales/`, 15000, true);
   const { data: polledAssignments } = usePolling<any[]>(`${API_BASE_URL}/api/assignments/`, 15000, true);
-  // Reports polling
-  const { data: assetsByCategory } = usePolling<any[]>(`${API_BASE_URL}/api/reports/assets-by-category/`, 15000, true);
-  const { data: valuationHistogram } = usePolling<any[]>(`${API_BASE_URL}/api/reports/valuation-histogram/?bucket=1000`, 15000, true);
+  // Reports polling: one request for all report data (see /api/reports/dashboard/)
+  const { data: dashboardReport } = usePolling<any>(DASHBOARD_REPORT_URL, 15000, true);
+  const polledSales = dashboardReport ? dashboardReport.sales : null;
+  const assetsByCategory = dashboardReport ? dashboardReport.assets_by_category : null;
+  const valuationHistogram = dashboardReport ? dashboardReport.valuation_histogram : null;
   // Local fallback state for cases when polling is disabled or delayed
   const [assetsByCategoryFallback, setAssetsByCategoryFallback] = useState<any[] | null>(null);
   const [valuationHistogramFallback, setValuationHistogramFallback] = useState<any[] | null>(null);
@@ -74,23 +76,13 @@ export default function StatisticsPage() {
     let mounted = true;
     async function fetchFallback() {
       try {
-        if (assetsByCategory === null && assetsByCategoryFallback === null) {
-          const r = await fetch(`${API_BASE_URL}/api/reports/assets-by-category/`);
+        if (dashboardReport === null && salesReportFallback === null) {
+          const r = await fetch(DASHBOARD_REPORT_URL);
           const j = await r.json();
           if (!mounted) return;
-          setAssetsByCategoryFallback(Array.isArray(j) ? j : (j && Array.isArray(j.value) ? j.value : []));
-        }
-        if (valuationHistogram === null && valuationHistogramFallback === null) {
-          const r2 = await fetch(`${API_BASE_URL}/api/reports/valuation-histogram/?bucket=1000`);
-          const j2 = await r2.json();
-          if (!mounted) return;
-          setValuationHistogramFallback(Array.isArray(j2) ? j2 : (j2 && Array.isArray(j2.value) ? j2.value : []));
-        }
-        if (polledSales === null && salesReportFallback === null) {
-          const r3 = await fetch(`${API_BASE_URL}/api/reports/sales/`);
-          const j3 = await r3.json();
-          if (!mounted) return;
-          setSalesReportFallback(j3);
+          setAssetsByCategoryFallback(Array.isArray(j.assets_by_category) ? j.assets_by_category : []);
+          setValuationHistogramFallback(Array.isArray(j.valuation_histogram) ? j.valuation_histogram : []);
+          setSalesReportFallback(j.sales ?? null);
         }
       } catch (e) {
         // ignore fetch errors here; polling will surface them via hook
@@ -98,7 +90,7 @@ export default function StatisticsPage() {
     }
     fetchFallback();
     return () => { mounted = false };
-  }, [assetsByCategory, valuationHistogram, polledSales]);
+  }, [dashboardReport]);
 
   // --- Additional charts data
   function getLastNMonths(n = 12) {